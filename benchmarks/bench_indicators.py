@@ -0,0 +1,80 @@
+"""Benchmark the NumPy indicator engine against the cufflinks studies.
+
+Run with `python benchmarks/bench_indicators.py`. The script first checks that both
+implementations produce the same values and then reports timings on synthetic daily
+bars covering more than 20 years.
+"""
+import sys
+import timeit
+from pathlib import Path
+
+import cufflinks as cf
+import numpy as np
+import pandas as pd
+
+from fixtures import SETTINGS, synthetic_ohlc
+
+# fin is imported from the repository root, whichever folder the script runs from
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fin.domain.logic import indicators  # noqa: E402
+from fin.domain.logic.stocks import stocks_chart  # noqa: E402
+
+
+def cufflinks_studies(data: pd.DataFrame) -> dict:
+    """Compute the studies with cufflinks.ta like cf.QuantFig does at render time."""
+    boll = cf.ta.boll(data, periods=20, boll_std=2, column="Close", include=False)
+    macd = cf.ta.macd(data, 12, 26, 9, column="Close", include=False)
+    return {
+        "bollinger": boll.to_numpy().T,
+        "macd": macd.to_numpy().T,
+        "rsi": cf.ta.rsi(data, periods=20, column="Close", include=False).to_numpy().T,
+        "sma": cf.ta.sma(data, periods=20, column="Close", include=False).to_numpy().T,
+    }
+
+
+def numpy_studies(data: pd.DataFrame) -> dict:
+    """Compute the studies with fin.domain.logic.indicators."""
+    studies = indicators.compute_indicators(data["Close"].to_numpy(), SETTINGS)
+    return {
+        "bollinger": [studies["bollinger"][key] for key in ("sma", "upper", "lower")],
+        "macd": [studies["macd"][key] for key in ("macd", "signal")],
+        "rsi": [studies["rsi"]["rsi"]],
+        "sma": [studies["sma"]["sma"]],
+    }
+
+
+def cufflinks_chart(data: pd.DataFrame):
+    """Build the chart the way stocks_chart did before using cf.QuantFig."""
+    qf = cf.QuantFig(data, title="SYNTH", legend="right")
+    qf.add_bollinger_bands(periods=20, boll_std=2)
+    qf.add_macd(fast_period=12, slow_period=26, signal_period=9)
+    qf.add_rsi(periods=20, rsi_lower=70, rsi_upper=30)
+    qf.add_sma(periods=20)
+    return qf.figure()
+
+
+def check_equivalence(data: pd.DataFrame):
+    """Raise an AssertionError if both implementations disagree."""
+    expected, actual = cufflinks_studies(data), numpy_studies(data)
+    for study, expected_values in expected.items():
+        for expected_line, actual_line in zip(expected_values, actual[study]):
+            np.testing.assert_allclose(
+                actual_line, expected_line.astype(float), rtol=1e-7, atol=1e-8
+            )
+    print(f"equivalence check passed on {len(data)} bars")
+
+
+def report(name: str, func, number: int):
+    """Print the best time of several runs in milliseconds."""
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{name:<32}{best * 1000:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    data = synthetic_ohlc()
+    check_equivalence(data)
+    report("cufflinks studies", lambda: cufflinks_studies(data), number=3)
+    report("numpy studies", lambda: numpy_studies(data), number=20)
+    report("cf.QuantFig chart", lambda: cufflinks_chart(data), number=1)
+    report("stocks_chart", lambda: stocks_chart(data, SETTINGS), number=3)
@@ -0,0 +1,76 @@
+"""Benchmark application startup: import time and time to the first response.
+
+Run with `python benchmarks/bench_startup.py [--runs N] [--budget SECONDS]`. Every
+run starts a fresh interpreter, imports fin.io.run_app and requests the initial page
+including the Dash layout and callback dependencies through the Flask test client.
+The script exits with status 1 if the median import time exceeds the budget.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# modules which are expected to be imported on first use only
+LAZY_MODULES = ["cufflinks", "matplotlib", "yfinance", "IPython"]
+
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from fin.io.run_app import app
+imported = time.perf_counter()
+client = app.server.test_client()
+for route in ("/", "/_dash-layout", "/_dash-dependencies"):
+    assert client.get(route).status_code == 200, route
+responded = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "first_response_s": responded - imported,
+    "eager_modules": [m for m in %r if m in sys.modules],
+}))
+""" % (
+    LAZY_MODULES,
+)
+
+
+def measure_startup() -> dict:
+    """Import the app in a fresh interpreter and return its timings."""
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).resolve().parents[1],
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs: int = 5) -> dict:
+    """Measure startup several times and return median timings."""
+    results = [measure_startup() for _ in range(runs)]
+    return {
+        "import_s": statistics.median(result["import_s"] for result in results),
+        "first_response_s": statistics.median(
+            result["first_response_s"] for result in results
+        ),
+        "eager_modules": sorted(
+            {module for result in results for module in result["eager_modules"]}
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None, help="import seconds")
+    args = parser.parse_args()
+
+    summary = run(args.runs)
+    print(f"{'import fin.io.run_app':<32}{summary['import_s'] * 1000:>10.1f} ms")
+    print(f"{'first response':<32}{summary['first_response_s'] * 1000:>10.1f} ms")
+    if summary["eager_modules"]:
+        print(f"imported eagerly: {', '.join(summary['eager_modules'])}")
+    if args.budget is not None and summary["import_s"] > args.budget:
+        print(f"import time exceeds the budget of {args.budget:.2f} s")
+        sys.exit(1)
@@ -0,0 +1,96 @@
+"""Offline fixtures shared by the benchmarks: chart settings and synthetic OHLC bars."""
+import zlib
+
+import numpy as np
+import pandas as pd
+
+SETTINGS = {
+    "ticker_dropdown_state": "SYNTH",
+    "bollinger_check_state": ["bollinger_bands"],
+    "macd_check_state": ["macd_check"],
+    "rsi_check_state": ["rsi_check"],
+    "sma_check_state": ["sma_check"],
+    "bollinger_periods_state": 20,
+    "boll_std_state": 2,
+    "macd_fast_period_state": 12,
+    "macd_slow_period_state": 26,
+    "macd_signal_period_state": 9,
+    "rsi_periods_state": 20,
+    "rsi_lower_state": 70,
+    "rsi_upper_state": 30,
+    "sma_periods_state": 20,
+}
+
+# study checklists enabled per indicator combination
+STUDY_COMBINATIONS = {
+    "none": [],
+    "bollinger+sma": ["bollinger_check_state", "sma_check_state"],
+    "all": [
+        "bollinger_check_state",
+        "macd_check_state",
+        "rsi_check_state",
+        "sma_check_state",
+    ],
+}
+
+
+def settings_with(studies: list, **overrides) -> dict:
+    """Return SETTINGS with only the given study checklists enabled."""
+    settings = dict(SETTINGS, **overrides)
+    for key in STUDY_COMBINATIONS["all"]:
+        if key not in studies:
+            settings[key] = []
+    return settings
+
+
+def callback_payload(settings: dict, trigger: str, chart_request: dict = None) -> dict:
+    """Build the request the browser sends for store_chart_settings."""
+    outputs = [
+        ("figure_store", "data"),
+        ("chart_store", "data"),
+        ("job_store", "data"),
+        ("chart_interval", "disabled"),
+        ("chart_progress", "value"),
+        ("chart_status", "children"),
+    ]
+    return {
+        "output": "..{}..".format("...".join(f"{id_}.{prop}" for id_, prop in outputs)),
+        "outputs": [{"id": id_, "property": prop} for id_, prop in outputs],
+        "inputs": [
+            {"id": "generate_button", "property": "n_clicks", "value": 1},
+            {"id": "stock-graph", "property": "relayoutData", "value": None},
+            {"id": "chart_interval", "property": "n_intervals", "value": 1},
+        ],
+        "state": [
+            {"id": "data_store", "property": "data", "value": settings},
+            {"id": "chart_store", "property": "data", "value": None},
+            {"id": "job_store", "property": "data", "value": chart_request},
+            {"id": "user_id", "property": "data", "value": "benchmark"},
+        ],
+        "changedPropIds": [trigger],
+    }
+
+
+def synthetic_ohlc(n_days: int = 21 * 252, seed: int = 0) -> pd.DataFrame:
+    """Generate daily OHLC bars following a geometric random walk."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days)))
+    open_ = close * np.exp(rng.normal(0, 0.005, n_days))
+    spread = np.abs(rng.normal(0, 0.01, n_days)) * close
+    return pd.DataFrame(
+        {
+            "Open": open_,
+            "High": np.maximum(open_, close) + spread,
+            "Low": np.minimum(open_, close) - spread,
+            "Close": close,
+        },
+        index=pd.bdate_range("2000-01-03", periods=n_days, name="Date"),
+    )
+
+
+def synthetic_fetch(ticker_symbol: str, date_start, date_end) -> pd.DataFrame:
+    """Stand in for request_stocks_data, returning bars in [date_start, date_end)."""
+    index = pd.bdate_range(date_start, date_end, name="Date")
+    index = index[index < pd.Timestamp(date_end)]
+    bars = synthetic_ohlc(len(index), seed=zlib.crc32(ticker_symbol.encode()))
+    return bars.set_index(index)
@@ -0,0 +1,165 @@
+"""Fire concurrent chart requests at the Dash app and report throughput and latency.
+
+Run with `python benchmarks/load.py [--requests N] [--concurrency C] [--url URL]`.
+Every chart request clicks "Generate chart" for a random symbol and date range and
+polls the background job until the figure arrives, like the browser does.
+
+Without --url the app is imported in-process with MARKET_DATA_PROVIDER=synthetic and
+served through the Flask test client. With --url the requests go over HTTP to a
+running server, which should be started with MARKET_DATA_PROVIDER=synthetic.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+
+from fixtures import STUDY_COMBINATIONS, callback_payload, settings_with
+
+# fin is imported from the repository root, whichever folder the script runs from
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+CALLBACK_PATH = "/_dash-update-component"
+
+
+def http_poster(url: str) -> Callable[[Dict], Dict]:
+    """Return a function posting callback payloads to a running server."""
+
+    def post(payload: Dict) -> Dict:
+        request = urllib.request.Request(
+            url.rstrip("/") + CALLBACK_PATH,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:
+            body = response.read()
+        return json.loads(body)["response"] if body else {}
+
+    return post
+
+
+def in_process_poster() -> Callable[[Dict], Dict]:
+    """Import the app with the synthetic provider and post through test clients."""
+    os.environ["MARKET_DATA_PROVIDER"] = "synthetic"
+    from fin.domain.logic import stocks
+    from fin.io import run_app
+
+    # keep the synthetic partitions out of the data folder
+    stocks.ohlc_store.folder = Path(tempfile.mkdtemp(prefix="fin-load-"))
+    local = threading.local()
+
+    def post(payload: Dict) -> Dict:
+        if not hasattr(local, "client"):
+            local.client = run_app.app.server.test_client()
+        response = local.client.post(CALLBACK_PATH, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"callback failed with status {response.status_code}")
+        return json.loads(response.data)["response"] if response.data else {}
+
+    return post
+
+
+def random_settings(rng: random.Random, n_symbols: int) -> Dict:
+    """Return chart settings of a random synthetic symbol and date range."""
+    start_year = rng.randint(2000, 2018)
+    return settings_with(
+        STUDY_COMBINATIONS["all"],
+        ticker_dropdown_state=f"SYN{rng.randrange(n_symbols):04d}",
+        ticker_date_range_start_state=f"{start_year}-01-01",
+        ticker_date_range_end_state=f"{rng.randint(start_year + 1, 2021)}-01-01",
+    )
+
+
+def request_chart(post: Callable[[Dict], Dict], settings: Dict, poll_s: float) -> float:
+    """Request one chart and return the seconds until the figure arrived."""
+    start = time.perf_counter()
+    outputs = post(callback_payload(settings, "generate_button.n_clicks"))
+    while "figure_store" not in outputs:
+        chart_request = outputs.get("job_store", {}).get("data")
+        if chart_request is None:
+            raise RuntimeError(outputs.get("chart_status", {}).get("children"))
+        time.sleep(poll_s)
+        outputs = post(
+            callback_payload(settings, "chart_interval.n_intervals", chart_request)
+        )
+    return time.perf_counter() - start
+
+
+def run(
+    post: Callable[[Dict], Dict],
+    requests: int,
+    concurrency: int,
+    n_symbols: int,
+    poll_ms: float,
+    seed: int = 0,
+) -> Dict:
+    """Send requests charts from concurrency threads and summarize the latencies."""
+    rng = random.Random(seed)
+    settings = [random_settings(rng, n_symbols) for _ in range(requests)]
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    def worker(chart_settings: Dict):
+        try:
+            latencies.append(request_chart(post, chart_settings, poll_ms / 1000))
+        except Exception as error:
+            errors.append(f"{type(error).__name__}: {error}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, settings))
+    elapsed = time.perf_counter() - start
+
+    summary: Dict[str, Union[int, float, str]] = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(latencies) / elapsed,
+    }
+    if latencies:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+        summary.update(
+            mean_ms=statistics.mean(latencies) * 1000,
+            p50_ms=p50,
+            p90_ms=p90,
+            p99_ms=p99,
+            max_ms=max(latencies) * 1000,
+        )
+    if errors:
+        summary["first_error"] = errors[0]
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--symbols", type=int, default=50, help="size of the synthetic symbol pool"
+    )
+    parser.add_argument("--poll-ms", type=float, default=50)
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    post = http_poster(args.url) if args.url else in_process_poster()
+    summary = run(post, args.requests, args.concurrency, args.symbols, args.poll_ms)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for key, value in summary.items():
+            value = f"{value:.2f}" if isinstance(value, float) else value
+            print(f"{key:<20}{value:>12}")
+    if summary["errors"]:
+        sys.exit(1)
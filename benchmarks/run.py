@@ -0,0 +1,329 @@
+"""Run the benchmark suite and store or compare machine-readable baselines.
+
+Run with `python benchmarks/run.py [--only TEXT] [--save NAME] [--compare NAME]`
+from any folder, the repository root is put on sys.path. All cases run offline on
+synthetic OHLC bars:
+
+- get_stocks_data through an OHLC store with a stubbed provider (cold and warm),
+  and cold through the fetch gateway
+- stocks_chart across series lengths and indicator combinations, including the
+  size of the serialized figure
+- resampling daily bars into weekly, monthly and quarterly bars
+- parameter sweeps of every signal rule over its default grid on 10 years of bars
+- risk analysis of portfolios of 10 to 500 symbols over 21 years of bars
+- the store_chart_settings callback end to end through the Flask test client,
+  polling the background job until the figure arrives (cold and cached)
+- app import time and first response in a fresh interpreter
+
+Baselines are JSON files in benchmarks/baselines. With --compare, the script exits
+with status 1 if a case got slower or its payload larger than --tolerance allows.
+benchmarks/baselines/reference.json was stored with `--save reference`, its meta
+entry names the machine and library versions. Timings only compare on the same
+machine, so store a baseline of your own before changing code.
+"""
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from bench_startup import measure_startup
+from fixtures import (
+    SETTINGS,
+    STUDY_COMBINATIONS,
+    callback_payload,
+    settings_with,
+    synthetic_fetch,
+    synthetic_ohlc,
+)
+
+# fin is imported from the repository root, whichever folder the script runs from
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+BASELINE_FOLDER = Path(__file__).resolve().parent / "baselines"
+SERIES_LENGTHS = {"1y": 252, "5y": 5 * 252, "21y": 21 * 252}
+DATE_RANGE = {
+    "ticker_date_range_start_state": "2000-01-03",
+    "ticker_date_range_end_state": "2021-01-04",
+}
+
+
+def measure(func: Callable, repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Call func repeatedly and return the median and best wall time in ms."""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "repeat": repeat,
+    }
+
+
+def bench_fetch(repeat: int) -> Dict[str, Dict]:
+    """Time get_stocks_data on an empty (cold) and a filled (warm) OHLC store.
+
+    The gateway case repeats the cold read with the fetch gateway in front of the
+    stubbed provider, which bounds the gateway's overhead per upstream call.
+    """
+    from fin.domain.logic import stocks
+    from fin.domain.logic.datastore import OHLCStore
+    from fin.domain.logic.gateway import FetchGateway
+    from fin.domain.logic.providers import MarketDataProvider
+
+    class FixtureProvider(MarketDataProvider):
+        name = "fixture"
+
+        def fetch(self, ticker_symbol, date_start, date_end, interval="1d"):
+            return synthetic_fetch(ticker_symbol, date_start, date_end)
+
+    original_store = stocks.ohlc_store
+    start, end = DATE_RANGE.values()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            runs = itertools.count()
+
+            def cold_read():
+                # a new partition folder per run, so every read hits the provider
+                store_folder = Path(folder) / str(next(runs))
+                stocks.ohlc_store = OHLCStore(synthetic_fetch, store_folder)
+                stocks.get_stocks_data("SYNTH", start, end)
+
+            results["fetch/cold"] = measure(cold_read, repeat)
+            gateway = FetchGateway(FixtureProvider())
+
+            def gateway_read():
+                store_folder = Path(folder) / str(next(runs))
+                stocks.ohlc_store = OHLCStore(gateway, store_folder)
+                stocks.get_stocks_data("SYNTH", start, end)
+
+            results["fetch/gateway"] = measure(gateway_read, repeat)
+            stocks.ohlc_store = OHLCStore(synthetic_fetch, Path(folder) / "warm")
+            results["fetch/warm"] = measure(
+                lambda: stocks.get_stocks_data("SYNTH", start, end), repeat
+            )
+    finally:
+        stocks.ohlc_store = original_store
+    return results
+
+
+def bench_chart(repeat: int) -> Dict[str, Dict]:
+    """Time stocks_chart per series length and indicator combination."""
+    from fin.domain.logic.stocks import stocks_chart
+
+    results = {}
+    for length_name, n_days in SERIES_LENGTHS.items():
+        data = synthetic_ohlc(n_days)
+        for studies_name, studies in STUDY_COMBINATIONS.items():
+            settings = settings_with(studies)
+            case = measure(lambda: stocks_chart(data, settings), repeat)
+            case["bytes"] = len(stocks_chart(data, settings).to_json())
+            results[f"chart/{length_name}/{studies_name}"] = case
+    return results
+
+
+def bench_resample(repeat: int) -> Dict[str, Dict]:
+    """Time resampling of daily bars per series length and target interval."""
+    from fin.domain.logic.resample import resample_ohlc
+
+    results = {}
+    for length_name, n_days in SERIES_LENGTHS.items():
+        data = synthetic_ohlc(n_days)
+        for interval in ("1wk", "1mo", "3mo"):
+            results[f"resample/{length_name}/{interval}"] = measure(
+                lambda: resample_ohlc(data, interval), repeat
+            )
+    return results
+
+
+def bench_sweep(repeat: int) -> Dict[str, Dict]:
+    """Time a sweep of each signal rule over its default parameter grid."""
+    from fin.domain.logic.sweep import RULES, sweep
+
+    close = synthetic_ohlc(10 * 252)["Close"].to_numpy()
+    results = {}
+    for rule in RULES:
+        results[f"sweep/10y/{rule}"] = measure(
+            lambda: sweep(close, rule, SETTINGS), repeat
+        )
+    return results
+
+
+def bench_portfolio(repeat: int) -> Dict[str, Dict]:
+    """Time the risk analysis of equally weighted portfolios over 21 years."""
+    from fin.domain.logic.portfolio import portfolio_risk
+
+    index_closes = synthetic_ohlc(SERIES_LENGTHS["21y"], seed=0)["Close"]
+    results = {}
+    for n_symbols in (10, 100, 500):
+        closes = pd.concat(
+            {
+                f"S{seed}": synthetic_ohlc(SERIES_LENGTHS["21y"], seed=seed)["Close"]
+                for seed in range(1, n_symbols + 1)
+            },
+            axis=1,
+        )
+        weights = dict.fromkeys(closes.columns, 1 / n_symbols)
+        results[f"portfolio/21y/{n_symbols}"] = measure(
+            lambda: portfolio_risk(closes, weights, index_closes), repeat
+        )
+    return results
+
+
+def bench_callback(repeat: int) -> Dict[str, Dict]:
+    """Time a chart request through Dash, from the click to the received figure."""
+    from fin.domain.logic import stocks
+    from fin.domain.logic.datastore import OHLCStore
+    from fin.io import run_app
+
+    client = run_app.app.server.test_client()
+    settings = settings_with(STUDY_COMBINATIONS["all"], **DATE_RANGE)
+    original_store = stocks.ohlc_store
+
+    def request_chart() -> int:
+        response = client.post(
+            "/_dash-update-component",
+            json=callback_payload(settings, "generate_button.n_clicks"),
+        )
+        outputs = json.loads(response.data)["response"]
+        while "figure_store" not in outputs:
+            time.sleep(0.002)
+            chart_request = outputs["job_store"]["data"]
+            response = client.post(
+                "/_dash-update-component",
+                json=callback_payload(
+                    settings, "chart_interval.n_intervals", chart_request
+                ),
+            )
+            outputs = json.loads(response.data)["response"]
+        return len(response.data)
+
+    def cold_request():
+        run_app.figure_cache.invalidate()
+        request_chart()
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            stocks.ohlc_store = OHLCStore(synthetic_fetch, Path(folder))
+            results["callback/build"] = measure(cold_request, repeat)
+            results["callback/cached"] = measure(request_chart, repeat)
+            results["callback/build"]["bytes"] = request_chart()
+    finally:
+        stocks.ohlc_store = original_store
+    return results
+
+
+def bench_startup(repeat: int) -> Dict[str, Dict]:
+    """Measure import time and first response in fresh interpreters."""
+    runs = [measure_startup() for _ in range(max(repeat // 3, 3))]
+    return {
+        f"startup/{key[:-2]}": {
+            "median_ms": statistics.median(run[key] for run in runs) * 1000,
+            "min_ms": min(run[key] for run in runs) * 1000,
+            "repeat": len(runs),
+        }
+        for key in ("import_s", "first_response_s")
+    }
+
+
+SUITES = {
+    "fetch": bench_fetch,
+    "chart": bench_chart,
+    "resample": bench_resample,
+    "sweep": bench_sweep,
+    "portfolio": bench_portfolio,
+    "callback": bench_callback,
+    "startup": bench_startup,
+}
+
+
+def run(only: Optional[str] = None, repeat: int = 9) -> Dict:
+    """Run all suites (or those whose name contains only) and return a baseline."""
+    results: Dict[str, Dict] = {}
+    for name, suite in SUITES.items():
+        if only is None or only in name:
+            results.update(suite(repeat))
+    return {
+        "meta": {
+            "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plotly": plotly.__version__,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> List[str]:
+    """Print the ratio of each case to its baseline and return the regressions."""
+    regressions = []
+    print(f"{'case':<32}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for case, result in current["results"].items():
+        reference = baseline["results"].get(case)
+        if reference is None:
+            print(f"{case:<32}{'-':>12}{result['median_ms']:>10.2f}ms")
+            continue
+        for metric, unit in (("median_ms", "ms"), ("bytes", "B")):
+            if metric not in result or metric not in reference:
+                continue
+            ratio = result[metric] / reference[metric]
+            flag = ""
+            if ratio > 1 + tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{case} {metric}")
+            label = case if metric == "median_ms" else f"{case} (size)"
+            print(
+                f"{label:<32}{reference[metric]:>10.2f}{unit:<2}"
+                f"{result[metric]:>10.2f}{unit:<2}{ratio:>6.2f}x{flag}"
+            )
+    return regressions
+
+
+def print_results(current: Dict):
+    """Print the timings of a run."""
+    for case, result in current["results"].items():
+        size = f"{result['bytes'] / 1024:>10.1f} KB" if "bytes" in result else ""
+        print(f"{case:<32}{result['median_ms']:>10.2f} ms{size}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help="run only suites whose name contains TEXT")
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--save", metavar="NAME", help="store results as baseline")
+    parser.add_argument("--compare", metavar="NAME", help="compare with a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    current = run(args.only, args.repeat)
+    if args.compare:
+        baseline = json.loads((BASELINE_FOLDER / f"{args.compare}.json").read_text())
+        regressions = compare(baseline, current, args.tolerance)
+    else:
+        print_results(current)
+        regressions = []
+    if args.save:
+        BASELINE_FOLDER.mkdir(exist_ok=True)
+        path = BASELINE_FOLDER / f"{args.save}.json"
+        path.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"baseline stored in {path}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
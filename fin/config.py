@@ -12,3 +12,126 @@ DATA_FOLDER = ROOT_FOLDER / "data"
 ANALYSIS_FOLDER = DATA_FOLDER / "analysis"
 DATA_PY4FI_2ND = DATA_FOLDER / "py4fi2nd/source"
 DATA_API = DATA_FOLDER / "api"
+OHLC_FOLDER = DATA_FOLDER / "ohlc"
+SYMBOL_FOLDER = DATA_API / "symbols"
+
+# SYMBOL DIRECTORY
+SYMBOL_FTP_HOST = os.getenv("SYMBOL_FTP_HOST", default="ftp.nasdaqtrader.com")
+SYMBOL_FTP_DIR = os.getenv("SYMBOL_FTP_DIR", default="symboldirectory")
+SYMBOL_FTP_TIMEOUT = float(os.getenv("SYMBOL_FTP_TIMEOUT", default=30))
+
+# MARKET DATA
+# provider serving OHLC bars: "yfinance", "local" (CSV files) or "synthetic"
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", default="yfinance")
+LOCAL_DATA_FOLDER = Path(os.getenv("LOCAL_DATA_FOLDER", default=DATA_FOLDER / "market"))
+SYNTHETIC_SEED = int(os.getenv("SYNTHETIC_SEED", default=0))
+
+# FETCH
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", default=8))
+# upstream calls per second and burst of all server processes sharing
+# SHARED_CACHE_PATH (of each process without it), for rate limited providers
+# (yfinance), see fin.domain.logic.gateway
+FETCH_RATE = float(os.getenv("FETCH_RATE", default=2))
+FETCH_BURST = int(os.getenv("FETCH_BURST", default=5))
+# retries of a failed upstream call, waiting about FETCH_BACKOFF * 2 ** retry seconds
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", default=3))
+FETCH_BACKOFF = float(os.getenv("FETCH_BACKOFF", default=0.5))
+# symbols requesting the same dates within FETCH_BATCH_WINDOW seconds are
+# downloaded together, up to FETCH_BATCH_SIZE symbols per call
+FETCH_BATCH_WINDOW = float(os.getenv("FETCH_BATCH_WINDOW", default=0.05))
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", default=20))
+# seconds the bars of the current day are reused by requests of other users
+FETCH_FRESH_SECONDS = float(os.getenv("FETCH_FRESH_SECONDS", default=10))
+
+# CHART
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", default=1500))
+
+# CACHE
+FIGURE_CACHE_SIZE = int(os.getenv("FIGURE_CACHE_SIZE", default=128))
+FIGURE_CACHE_TTL = float(os.getenv("FIGURE_CACHE_TTL", default=900))
+
+# SHARED CACHE
+# SQLite file keeping the figure cache shared by all server processes, an empty
+# value keeps figures in the memory of each process (FIGURE_CACHE_SIZE)
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH", default=str(DATA_FOLDER / "cache" / "figures.sqlite")
+)
+SHARED_CACHE_MAX_BYTES = int(
+    float(os.getenv("SHARED_CACHE_MAX_MB", default=256)) * 1024 ** 2
+)
+
+# WEB SERVER
+# production server settings, see gunicorn.conf.py
+WEB_BIND = os.getenv("WEB_BIND", default="0.0.0.0:8050")
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", default=os.cpu_count() or 1))
+WEB_THREADS = int(os.getenv("WEB_THREADS", default=4))
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", default=120))
+
+# COMPRESSION
+# response encodings in order of preference
+COMPRESS_ALGORITHM = os.getenv("COMPRESS_ALGORITHM", default="br,gzip").split(",")
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", default=6))
+COMPRESS_BR_LEVEL = int(os.getenv("COMPRESS_BR_LEVEL", default=4))
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", default=500))
+
+# TICKER SEARCH
+DEFAULT_TICKERS = os.getenv(
+    "DEFAULT_TICKERS", default="AAPL,AMZN,GOOGL,MSFT,NVDA,TSLA,JPM,SPY,QQQ"
+).split(",")
+TICKER_SEARCH_LIMIT = int(os.getenv("TICKER_SEARCH_LIMIT", default=20))
+
+# BACKGROUND JOBS
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", default=4))
+JOB_TTL = float(os.getenv("JOB_TTL", default=300))
+JOB_POLL_INTERVAL_MS = int(os.getenv("JOB_POLL_INTERVAL_MS", default=300))
+# seconds between republishing running jobs to the shared cache, jobs of other
+# processes missing 3 heartbeats are considered dead and restarted
+JOB_HEARTBEAT = float(os.getenv("JOB_HEARTBEAT", default=5))
+
+# SESSIONS
+# chart settings saved per user, kept in a SQLite file shared by all server
+# processes, an empty path keeps up to SESSION_STORE_SIZE sessions per process
+SESSION_STORE_SIZE = int(os.getenv("SESSION_STORE_SIZE", default=10000))
+SESSION_TTL = float(os.getenv("SESSION_TTL", default=30 * 24 * 3600))
+SESSION_STORE_PATH = os.getenv(
+    "SESSION_STORE_PATH", default=str(DATA_FOLDER / "cache" / "sessions.sqlite")
+)
+SESSION_STORE_MAX_BYTES = int(
+    float(os.getenv("SESSION_STORE_MAX_MB", default=16)) * 1024 ** 2
+)
+
+# LIVE CHARTS
+# polling interval of charts in live mode
+LIVE_INTERVAL_MS = int(os.getenv("LIVE_INTERVAL_MS", default=60000))
+
+# PROCESS POOLS
+# start method of worker processes, "spawn" is safe to use from the threaded server
+PROCESS_START_METHOD = os.getenv("PROCESS_START_METHOD", default="spawn")
+
+# PORTFOLIO
+# index the betas of portfolios refer to, days of the rolling volatility and beta
+# and the confidence level of the value at risk (0.9, 0.95 or 0.99)
+PORTFOLIO_INDEX = os.getenv("PORTFOLIO_INDEX", default="SPY")
+PORTFOLIO_WINDOW = int(os.getenv("PORTFOLIO_WINDOW", default=63))
+PORTFOLIO_VAR_LEVEL = float(os.getenv("PORTFOLIO_VAR_LEVEL", default=0.95))
+
+# SCREENER
+# worker processes evaluating the symbol universe and symbols per task
+SCREEN_WORKERS = int(os.getenv("SCREEN_WORKERS", default=os.cpu_count() or 1))
+SCREEN_CHUNK_SIZE = int(os.getenv("SCREEN_CHUNK_SIZE", default=16))
+# crossovers count as signals if they happened within the last SCREEN_CROSS_BARS bars
+SCREEN_CROSS_BARS = int(os.getenv("SCREEN_CROSS_BARS", default=3))
+SCREEN_TOP = int(os.getenv("SCREEN_TOP", default=50))
+
+# EXPORT
+EXPORT_FOLDER = Path(os.getenv("EXPORT_FOLDER", default=DATA_FOLDER / "reports"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", default=os.cpu_count() or 1))
+
+# MONITORING
+# profile every Dash callback request: "" (off), "cpu" (cProfile) or "memory"
+# (tracemalloc), dumps are written to PROFILE_FOLDER
+PROFILE_MODE = os.getenv("PROFILE_MODE", default="")
+PROFILE_FOLDER = Path(os.getenv("PROFILE_FOLDER", default=DATA_FOLDER / "profiles"))
+# seconds between publishing the counters and histograms of a server process to
+# SHARED_CACHE_PATH, /metrics reports the sums of all processes
+METRICS_PUBLISH_INTERVAL = float(os.getenv("METRICS_PUBLISH_INTERVAL", default=5))
@@ -0,0 +1,153 @@
+"""Bounded LRU/TTL cache for serialized chart figures."""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+from fin import config
+from fin.domain.logic.encoding import encode_figure
+from fin.domain.logic.shared_cache import SQLiteCache
+
+
+def settings_key(settings_dict: Dict) -> str:
+    """Generate a canonical hash of chart settings.
+
+    Args:
+        settings_dict (Dict): settings derived from the UI
+
+    Returns:
+        str: hex digest independent of the key order of settings_dict
+    """
+    canonical = json.dumps(settings_dict, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class FigureCache:
+    """A thread-safe LRU cache storing figures as JSON strings.
+
+    Entries expire ttl seconds after they were created. Serialized figures are
+    immutable, so cached entries can be shared by all users of the dashboard.
+
+    With a shared cache the figures are kept in its SQLite file instead of the
+    process memory, so all workers of a multi-process server share them. maxsize
+    is then replaced by the size limit of the shared cache.
+
+    Args:
+        maxsize (int): maximum number of cached figures
+        ttl (float): seconds until a cached figure expires
+        shared (SQLiteCache, optional): cache shared by the server processes
+    """
+
+    def __init__(
+        self,
+        maxsize: int = config.FIGURE_CACHE_SIZE,
+        ttl: float = config.FIGURE_CACHE_TTL,
+        shared: Optional[SQLiteCache] = None,
+    ):
+        """Generate a cache instance."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        # key -> (creation time, ticker symbol, serialized figure)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str], str]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, settings_dict: Dict) -> Optional[str]:
+        """Return the serialized figure for settings_dict or None on a miss."""
+        key = settings_key(settings_dict)
+        if self.shared is not None:
+            serialized = self.shared.get(key)
+            with self._lock:
+                if serialized is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return serialized
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, settings_dict: Dict, figure: go.Figure) -> str:
+        """Serialize and store a compactly encoded figure.
+
+        Args:
+            settings_dict (Dict): settings the figure was generated from
+            figure (go.Figure): chart figure
+
+        Returns:
+            str: serialized figure, see fin.domain.logic.encoding
+        """
+        serialized = json.dumps(encode_figure(figure), cls=PlotlyJSONEncoder)
+        key = settings_key(settings_dict)
+        ticker = settings_dict.get("ticker_dropdown_state")
+        if self.shared is not None:
+            self.shared.set(key, serialized, tag=ticker)
+            return serialized
+        with self._lock:
+            self._entries[key] = (time.monotonic(), ticker, serialized)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return serialized
+
+    def get_or_build(self, settings_dict: Dict, build: Callable[[], go.Figure]) -> Dict:
+        """Return the cached figure or build and cache it.
+
+        Args:
+            settings_dict (Dict): settings derived from the UI
+            build (Callable[[], go.Figure]): function generating the figure on a miss
+
+        Returns:
+            Dict: encoded figure dict which can be returned by Dash callbacks
+        """
+        serialized = self.get(settings_dict)
+        if serialized is None:
+            serialized = self.set(settings_dict, build())
+        return json.loads(serialized)
+
+    def invalidate(self, ticker_symbol: str = None):
+        """Drop cached figures of a ticker symbol, or all figures if None."""
+        if self.shared is not None:
+            self.shared.invalidate(ticker_symbol)
+            return
+        with self._lock:
+            if ticker_symbol is None:
+                self._entries.clear()
+                return
+            for key in [
+                key
+                for key, (_, ticker, _) in self._entries.items()
+                if ticker == ticker_symbol
+            ]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current cache size."""
+        if self.shared is not None:
+            stats = self.shared.stats()
+            evictions = self.shared.evictions
+        else:
+            with self._lock:
+                stats = {"size": len(self._entries)}
+            evictions = self.evictions
+        with self._lock:
+            return dict(stats, hits=self.hits, misses=self.misses, evictions=evictions)
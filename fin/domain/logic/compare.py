@@ -0,0 +1,158 @@
+"""Compare the performance of several stocks."""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from fin import config
+from fin.domain.logic.stocks import THEME, get_stocks_data
+
+
+def _request_stock(ticker_symbol: str, date_start: str, date_end: str):
+    """Return the stock data of a ticker symbol or the exception its request raised."""
+    try:
+        return get_stocks_data(ticker_symbol, date_start, date_end)
+    except Exception as error:
+        return error
+
+
+def get_multi_stocks_data(
+    ticker_symbols: List[str],
+    date_start: str,
+    date_end: str,
+    max_workers: int = config.FETCH_WORKERS,
+) -> Tuple[pd.DataFrame, Dict[str, Exception]]:
+    """Request close prices of several stocks concurrently.
+
+    The prices are aligned on the union of all trading days, so stocks listed on
+    exchanges with different holidays share one calendar. Gaps after the first
+    trading day of a stock are filled with its last known close. Stocks whose
+    request fails are skipped and reported, so one failing ticker symbol does not
+    fail the others.
+
+    Args:
+        ticker_symbols (List[str]): ticker symbols used to request market data
+        date_start (str): include only dates later than date_start
+        date_end (str): include only dates earlier than date_end
+        max_workers (int): maximum number of concurrent requests
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, Exception]]: close prices, one column per
+            ticker symbol with data, and the error per failed ticker symbol
+    """
+    ticker_symbols = list(dict.fromkeys(ticker_symbols))
+    if not ticker_symbols:
+        return pd.DataFrame(), {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ticker_symbols))) as pool:
+        results = dict(
+            zip(
+                ticker_symbols,
+                pool.map(
+                    lambda ticker: _request_stock(ticker, date_start, date_end),
+                    ticker_symbols,
+                ),
+            )
+        )
+    failed = {
+        ticker: result
+        for ticker, result in results.items()
+        if isinstance(result, Exception)
+    }
+    closes = {
+        ticker: result["Close"]
+        for ticker, result in results.items()
+        if ticker not in failed and not result.empty
+    }
+    if not closes:
+        columns = [ticker for ticker in ticker_symbols if ticker not in failed]
+        return pd.DataFrame(columns=columns), failed
+    return pd.concat(closes, axis=1, sort=True).ffill(), failed
+
+
+def normalized_performance(closes: pd.DataFrame) -> pd.DataFrame:
+    """Scale close prices to the first available close of each stock.
+
+    Args:
+        closes (pd.DataFrame): aligned close prices, one column per stock
+
+    Returns:
+        pd.DataFrame: performance relative to the first close (1.0 = unchanged)
+    """
+    prices = closes.to_numpy(dtype=float)
+    if not prices.size:
+        return closes.astype(float)
+    # index of the first non-missing close per column
+    first_valid = np.argmax(~np.isnan(prices), axis=0)
+    base = prices[first_valid, np.arange(prices.shape[1])]
+    return pd.DataFrame(prices / base, index=closes.index, columns=closes.columns)
+
+
+def correlation_matrix(closes: pd.DataFrame) -> pd.DataFrame:
+    """Compute the correlation matrix of daily log returns.
+
+    Args:
+        closes (pd.DataFrame): aligned close prices, one column per stock
+
+    Returns:
+        pd.DataFrame: pairwise correlation of the stocks' daily log returns
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(closes.to_numpy(dtype=float)), axis=0)
+    return pd.DataFrame(returns, columns=closes.columns).corr()
+
+
+def comparison_chart(closes: pd.DataFrame) -> go.Figure:
+    """Generate a chart comparing normalized performance and return correlations.
+
+    Args:
+        closes (pd.DataFrame): aligned close prices, one column per stock
+
+    Returns:
+        go.Figure: line chart of the performance above a correlation heatmap
+    """
+    performance = normalized_performance(closes)
+    correlation = correlation_matrix(closes)
+    x = performance.index.strftime("%Y-%m-%d").to_numpy()
+
+    fig = make_subplots(
+        rows=2,
+        cols=1,
+        row_heights=[0.65, 0.35],
+        vertical_spacing=0.1,
+        subplot_titles=["Normalized performance", "Correlation of daily returns"],
+    )
+    for ticker in performance.columns:
+        fig.add_trace(
+            go.Scatter(
+                x=x, y=performance[ticker].to_numpy(), name=ticker, mode="lines"
+            ),
+            row=1,
+            col=1,
+        )
+    fig.add_trace(
+        go.Heatmap(
+            z=correlation.to_numpy().round(3),
+            x=list(correlation.columns),
+            y=list(correlation.index),
+            zmin=-1,
+            zmax=1,
+            colorscale="RdBu",
+            colorbar=dict(len=0.35, y=0.15),
+            showlegend=False,
+        ),
+        row=2,
+        col=1,
+    )
+    fig.update_layout(
+        paper_bgcolor=THEME["background"],
+        plot_bgcolor=THEME["background"],
+        font=dict(color=THEME["font"]),
+        margin=dict(b=30, l=30, r=30, t=30),
+        height=750,
+    )
+    fig.update_yaxes(tickformat=".0%", row=1, col=1)
+    fig.update_yaxes(autorange="reversed", row=2, col=1)
+    return fig
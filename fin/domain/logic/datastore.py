@@ -0,0 +1,242 @@
+"""Persistent per-ticker OHLC store with incremental gap filling."""
+import os
+import threading
+from contextlib import suppress
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import joblib
+import pandas as pd
+
+from fin import config, metrics
+
+# half-open [start, end) date range, in line with yfinance's exclusive end date
+DateRange = Tuple[pd.Timestamp, pd.Timestamp]
+
+
+def merge_ranges(ranges: List[DateRange]) -> List[DateRange]:
+    """Merge overlapping or adjacent date ranges.
+
+    Args:
+        ranges (List[DateRange]): unordered date ranges
+
+    Returns:
+        List[DateRange]: sorted, non-overlapping date ranges
+    """
+    merged: List[DateRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(
+    coverage: List[DateRange], start: pd.Timestamp, end: pd.Timestamp
+) -> List[DateRange]:
+    """Compute the parts of [start, end) which are not covered yet.
+
+    Args:
+        coverage (List[DateRange]): sorted, non-overlapping covered ranges
+        start (pd.Timestamp): first requested day
+        end (pd.Timestamp): day after the last requested day
+
+    Returns:
+        List[DateRange]: date ranges which have to be requested upstream
+    """
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in coverage:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class OHLCStore:
+    """A read-through store keeping one OHLC partition per ticker on disk.
+
+    Each partition holds the ticker's DataFrame together with the date ranges which
+    were already requested upstream. Date ranges without any trading day (weekends,
+    holidays) are therefore remembered as well and never requested twice. The current
+    day is never marked as covered since its bar is still changing. Subscribed
+    listeners are called with the ticker symbol whenever new data was stored.
+
+    Args:
+        fetch (Callable): function (ticker, start, end) -> pd.DataFrame requesting
+            missing data upstream
+        folder (Path): folder containing the ticker partitions
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, str, str], pd.DataFrame],
+        folder: Path = config.OHLC_FOLDER,
+    ):
+        """Generate a store instance."""
+        self.fetch = fetch
+        self.folder = Path(folder)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.listeners: List[Callable[[str], None]] = []
+
+    def subscribe(self, listener: Callable[[str], None]):
+        """Register a function called with the ticker symbol on new data."""
+        self.listeners.append(listener)
+
+    def partition_path(self, ticker_symbol: str) -> Path:
+        """Return the partition file of a ticker symbol."""
+        return self.folder / f"{ticker_symbol.replace(os.sep, '_')}.pkl"
+
+    def _lock(self, ticker_symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(ticker_symbol, threading.Lock())
+
+    def load(self, ticker_symbol: str) -> Tuple[pd.DataFrame, List[DateRange]]:
+        """Load a ticker partition.
+
+        Args:
+            ticker_symbol (str): ticker symbol of the partition
+
+        Returns:
+            Tuple[pd.DataFrame, List[DateRange]]: stored data, covered date ranges
+        """
+        path = self.partition_path(ticker_symbol)
+        if not path.exists():
+            return pd.DataFrame(), []
+        partition = joblib.load(path)
+        return partition["data"], partition["coverage"]
+
+    def save(self, ticker_symbol: str, data: pd.DataFrame, coverage: List[DateRange]):
+        """Store a ticker partition atomically.
+
+        Args:
+            ticker_symbol (str): ticker symbol of the partition
+            data (pd.DataFrame): OHLC data sorted by date
+            coverage (List[DateRange]): date ranges already requested upstream
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self.partition_path(ticker_symbol)
+        # write to a temporary file first so concurrent readers never see a
+        # partially written partition
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        joblib.dump({"data": data, "coverage": coverage}, tmp_path)
+        os.replace(tmp_path, path)
+
+    def drop(self, ticker_symbol: str):
+        """Delete the partition of a ticker symbol, e.g. after it was delisted."""
+        with self._lock(ticker_symbol):
+            with suppress(FileNotFoundError):
+                self.partition_path(ticker_symbol).unlink()
+
+    def _fetch(
+        self, ticker_symbol: str, start: pd.Timestamp, end: pd.Timestamp
+    ) -> pd.DataFrame:
+        """Request one missing date range upstream, counting failed requests."""
+        with metrics.span("upstream"):
+            try:
+                stocks_df = self.fetch(
+                    ticker_symbol, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+                )
+            except Exception as error:
+                metrics.upstream_errors.inc(type(error).__name__)
+                raise
+        return _naive_index(stocks_df)
+
+    def _fill(
+        self,
+        ticker_symbol: str,
+        data: pd.DataFrame,
+        coverage: List[DateRange],
+        gaps: List[DateRange],
+        today: pd.Timestamp,
+    ) -> pd.DataFrame:
+        """Request the missing date ranges upstream and store them.
+
+        Args:
+            ticker_symbol (str): ticker symbol of the partition
+            data (pd.DataFrame): stored data
+            coverage (List[DateRange]): date ranges already requested upstream
+            gaps (List[DateRange]): missing date ranges
+            today (pd.Timestamp): current day, never marked as covered
+
+        Returns:
+            pd.DataFrame: stored data including the fetched bars
+        """
+        fetched = [
+            self._fetch(ticker_symbol, gap_start, gap_end)
+            for gap_start, gap_end in gaps
+        ]
+        fetched = [df for df in fetched if not df.empty]
+        if fetched:
+            data = pd.concat([data] + fetched)
+            data = data[~data.index.duplicated(keep="last")].sort_index()
+        # the current day's bar is still changing, never mark it as covered
+        coverage = merge_ranges(
+            coverage
+            + [
+                (gap_start, min(gap_end, today))
+                for gap_start, gap_end in gaps
+                if gap_start < today
+            ]
+        )
+        self.save(ticker_symbol, data, coverage)
+        if fetched:
+            for listener in self.listeners:
+                listener(ticker_symbol)
+        return data
+
+    def read(self, ticker_symbol: str, date_start: str, date_end: str) -> pd.DataFrame:
+        """Return stored OHLC data, requesting only missing date ranges upstream.
+
+        If the upstream request fails, the stored bars are returned as long as some
+        of them fall into the requested range.
+
+        Args:
+            ticker_symbol (str): ticker symbol string used to request market data
+            date_start (str): include only dates later than date_start
+            date_end (str): include only dates earlier than date_end
+
+        Returns:
+            pd.DataFrame: DataFrame containing stock data
+        """
+        start = pd.Timestamp(date_start).normalize()
+        end = pd.Timestamp(date_end).normalize()
+        today = pd.Timestamp(date.today())
+
+        with self._lock(ticker_symbol):
+            data, coverage = self.load(ticker_symbol)
+            gaps = missing_ranges(coverage, start, end) if start < end else []
+            if gaps:
+                try:
+                    data = self._fill(ticker_symbol, data, coverage, gaps, today)
+                except Exception:
+                    # serve stale bars rather than failing, the gaps are requested
+                    # again on the next read
+                    if not _overlaps(data, start, end):
+                        raise
+                    metrics.stale_reads.inc()
+
+        if data.empty:
+            return data
+        return data[(data.index >= start) & (data.index < end)]
+
+
+def _overlaps(data: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> bool:
+    """Check if stored data holds any bar in [start, end)."""
+    return not data.empty and bool(((data.index >= start) & (data.index < end)).any())
+
+
+def _naive_index(stocks_df: pd.DataFrame) -> pd.DataFrame:
+    """Drop time zone information of daily bars so partitions stay comparable."""
+    if isinstance(stocks_df.index, pd.DatetimeIndex) and stocks_df.index.tz:
+        stocks_df = stocks_df.tz_localize(None)
+    return stocks_df
@@ -0,0 +1,140 @@
+"""Downsample chart series while keeping their visual shape.
+
+Lines are reduced with Largest-Triangle-Three-Buckets (LTTB), candles are merged into
+OHLC buckets. All functions work on positions (row numbers), so the selected points
+can be applied to any column of the same DataFrame.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+
+def lttb_indices(values: np.ndarray, n_out: int) -> np.ndarray:
+    """Select the positions of the points which shape a line most.
+
+    The first and last point are always kept. The remaining points are split into
+    n_out - 2 buckets and the point forming the largest triangle with the previously
+    selected point and the average of the next bucket is kept per bucket. Missing
+    values are skipped.
+
+    Args:
+        values (np.ndarray): y values of the line, x values are their positions
+        n_out (int): maximum number of points to keep
+
+    Returns:
+        np.ndarray: ascending positions of the kept points
+    """
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) <= max(n_out, 2):
+        return valid
+    if n_out < 3:
+        return valid[[0, -1]]
+
+    x = valid.astype(float)
+    y = values[valid]
+    # bucket boundaries of the inner points 1 .. n - 2 and each bucket's average
+    edges = np.linspace(1, len(valid) - 1, n_out - 1).astype(int)
+    counts = np.diff(edges)
+    average_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    average_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # the point following the last bucket is the last point itself
+    next_x = np.append(average_x[1:], x[-1]).tolist()
+    next_y = np.append(average_y[1:], y[-1]).tolist()
+
+    # buckets hold few points each, so the sequential selection runs on python
+    # floats instead of many tiny numpy operations
+    xs, ys, bounds = x.tolist(), y.tolist(), edges.tolist()
+    selected = [0]
+    previous = 0
+    for bucket in range(n_out - 2):
+        previous_x, previous_y = xs[previous], ys[previous]
+        dx, dy = previous_x - next_x[bucket], next_y[bucket] - previous_y
+        best_area = -1.0
+        for position in range(bounds[bucket], bounds[bucket + 1]):
+            # doubled triangle area of previous point, candidate and next average
+            area = abs(
+                dx * (ys[position] - previous_y) - (previous_x - xs[position]) * dy
+            )
+            if area > best_area:
+                best_area, previous = area, position
+        selected.append(previous)
+    selected.append(len(valid) - 1)
+    return valid[selected]
+
+
+def bucket_starts(start: int, end: int, n_out: int) -> np.ndarray:
+    """Split positions start .. end - 1 into at most n_out equally sized buckets.
+
+    Args:
+        start (int): first position
+        end (int): position after the last position
+        n_out (int): maximum number of buckets
+
+    Returns:
+        np.ndarray: first position of each bucket
+    """
+    if end - start <= n_out:
+        return np.arange(start, end)
+    return np.unique(np.linspace(start, end, max(n_out, 1), endpoint=False).astype(int))
+
+
+def ohlc_buckets(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    starts: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Merge consecutive candles into one candle per bucket.
+
+    Args:
+        open_ (np.ndarray): open prices
+        high (np.ndarray): high prices
+        low (np.ndarray): low prices
+        close (np.ndarray): close prices
+        starts (np.ndarray): ascending first position of each bucket
+
+    Returns:
+        Tuple[np.ndarray, ...]: first open, highest high, lowest low and last close
+            of each bucket
+    """
+    if not len(starts):
+        empty = np.array([], dtype=float)
+        return empty, empty, empty, empty
+    ends = np.append(starts[1:], len(close)) - 1
+    return (
+        np.asarray(open_)[starts],
+        np.fmax.reduceat(np.asarray(high, dtype=float), starts),
+        np.fmin.reduceat(np.asarray(low, dtype=float), starts),
+        np.asarray(close)[ends],
+    )
+
+
+def resolution_segments(
+    length: int, window: Tuple[int, int] = None, max_points: int = 1500
+) -> List[Tuple[int, int, int]]:
+    """Distribute the point budget of a chart over its segments.
+
+    Without a window the whole series shares max_points. With a zoom window, the
+    window gets the full budget (full resolution if it fits) and the parts left and
+    right of it share half of the budget, so the overview stays available.
+
+    Args:
+        length (int): number of rows of the series
+        window (Tuple[int, int], optional): first and after-last position zoomed in
+        max_points (int): point budget per segment group
+
+    Returns:
+        List[Tuple[int, int, int]]: (start, end, n_out) for each non-empty segment
+    """
+    if window is None:
+        return [(0, length, max_points)] if length else []
+    lower, upper = max(window[0], 0), min(window[1], length)
+    outside = max(length - (upper - lower), 1)
+    segments = [
+        (0, lower, max(lower * max_points // (2 * outside), 2)),
+        (lower, upper, max_points),
+        (upper, length, max((length - upper) * max_points // (2 * outside), 2)),
+    ]
+    return [segment for segment in segments if segment[1] > segment[0]]
@@ -0,0 +1,136 @@
+"""Compact figure encoding with base64 typed arrays and shared data arrays.
+
+plotly.js 1.x, bundled with Dash 1, has no native typed-array JSON format, so
+encoded figures are decoded in the browser by DECODE_FIGURE_JS before they are
+handed to the graph. Data arrays are encoded as:
+
+- dates: int32 minutes since the epoch, shown on date axes as milliseconds
+- numbers: float32 where the round trip keeps FLOAT32_RTOL, float64 otherwise
+
+Identical arrays, e.g. the x values shared by the candles and the unsampled
+studies, are stored once and referenced by every trace using them.
+"""
+import base64
+from typing import Dict, List, Optional
+
+import numpy as np
+import plotly.graph_objects as go
+
+# trace attributes holding data arrays
+ARRAY_KEYS = ("x", "y", "open", "high", "low", "close")
+# largest relative error accepted when storing numbers as float32
+FLOAT32_RTOL = 1e-6
+
+
+def encode_array(values) -> Optional[Dict[str, str]]:
+    """Encode numeric or date values as base64 typed array.
+
+    Args:
+        values (array-like): data array of a trace
+
+    Returns:
+        Optional[Dict[str, str]]: "dtype" ("f4", "f8" or "i4"), "bdata" and for
+            dates "unit" ("min"), None if the values are neither numbers nor dates
+    """
+    values = np.asarray(values)
+    if values.ndim != 1 or values.dtype == bool:
+        return None
+    if values.dtype.kind in "iuf":
+        numbers = values.astype(np.float64)
+        compact = numbers.astype(np.float32)
+        with np.errstate(invalid="ignore", over="ignore"):
+            fits = np.allclose(compact, numbers, rtol=FLOAT32_RTOL, equal_nan=True)
+        array, dtype = (compact, "f4") if fits else (numbers, "f8")
+        return {"dtype": dtype, "bdata": _base64(array)}
+    if values.dtype.kind in "OUM":
+        try:
+            minutes = values.astype("datetime64[m]")
+        except (TypeError, ValueError):
+            return None
+        if np.isnat(minutes).any():
+            return None
+        array = minutes.astype(np.int64).astype(np.int32)
+        return {"dtype": "i4", "unit": "min", "bdata": _base64(array)}
+    return None
+
+
+def _base64(array: np.ndarray) -> str:
+    """Return the little-endian bytes of array as base64 string."""
+    little_endian = array.astype(array.dtype.newbyteorder("<"))
+    return base64.b64encode(little_endian.tobytes()).decode("ascii")
+
+
+def encode_figure(fig: go.Figure) -> Dict:
+    """Encode the data arrays of a figure compactly.
+
+    Args:
+        fig (go.Figure): chart figure
+
+    Returns:
+        Dict: figure dict whose array attributes are replaced by {"ref": position}
+            into its "arrays" list, to be decoded by DECODE_FIGURE_JS
+    """
+    figure = fig.to_plotly_json()
+    arrays: List[Dict[str, str]] = []
+    positions: Dict[str, int] = {}
+    date_axes = set()
+    for trace in figure["data"]:
+        for key in ARRAY_KEYS:
+            if key not in trace or isinstance(trace[key], (str, dict)):
+                continue
+            encoded = encode_array(trace[key])
+            if encoded is None:
+                continue
+            identity = encoded["dtype"] + encoded.get("unit", "") + encoded["bdata"]
+            if identity not in positions:
+                positions[identity] = len(arrays)
+                arrays.append(encoded)
+            trace[key] = {"ref": positions[identity]}
+            if key == "x" and "unit" in encoded:
+                date_axes.add("xaxis" + trace.get("xaxis", "x")[1:])
+    # dates arrive as numbers, the axes have to be told they are dates
+    for axis in date_axes:
+        figure["layout"].setdefault(axis, {})["type"] = "date"
+    figure["arrays"] = arrays
+    return figure
+
+
+# clientside callback restoring a plotly figure from an encoded figure dict
+DECODE_FIGURE_JS = """
+function(encoded) {
+    if (!encoded) {
+        return window.dash_clientside.no_update;
+    }
+    if (!encoded.arrays) {
+        return encoded;
+    }
+    var types = {f4: Float32Array, f8: Float64Array, i4: Int32Array};
+    var arrays = encoded.arrays.map(function(spec) {
+        var raw = atob(spec.bdata);
+        var bytes = new Uint8Array(raw.length);
+        for (var i = 0; i < raw.length; i++) {
+            bytes[i] = raw.charCodeAt(i);
+        }
+        var values = new types[spec.dtype](bytes.buffer);
+        if (spec.unit === "min") {
+            return Array.from(values, function(v) { return v * 60000; });
+        }
+        if (spec.dtype === "f4") {
+            // drop the float32 noise digits, e.g. in hover labels
+            return Array.from(values, function(v) { return +v.toPrecision(7); });
+        }
+        return Array.from(values);
+    });
+    var data = encoded.data.map(function(trace) {
+        var decoded = Object.assign({}, trace);
+        Object.keys(decoded).forEach(function(key) {
+            var value = decoded[key];
+            if (value && typeof value === "object" && value.ref !== undefined) {
+                decoded[key] = arrays[value.ref];
+            }
+        });
+        return decoded;
+    });
+    return {data: data, layout: encoded.layout};
+}
+"""
@@ -0,0 +1,204 @@
+"""Export chart reports of many tickers in parallel.
+
+Every report is an HTML file referencing one shared plotly.min.js in the report
+folder instead of embedding the ~3 MB bundle, optionally accompanied by a static
+image. A manifest.json lists the reports, so a nightly report set can be published
+and checked without opening every file.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import plotly
+from plotly.offline import get_plotlyjs
+
+from fin import config
+from fin.domain.logic.stocks import get_stocks_data, persist_figure, stocks_chart
+from fin.domain.session.usersession import default_settings, session_default
+
+PLOTLYJS_FILE = "plotly.min.js"
+MANIFEST_FILE = "manifest.json"
+
+
+def write_plotlyjs(folder: Path) -> Path:
+    """Write the plotly.js bundle shared by all reports of folder, once.
+
+    Args:
+        folder (Path): report folder
+
+    Returns:
+        Path: path of the bundle
+    """
+    path = folder / PLOTLYJS_FILE
+    if not path.exists():
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(get_plotlyjs(), encoding="utf-8")
+        os.replace(tmp_path, path)
+    return path
+
+
+def export_report(
+    ticker: str,
+    folder: Path,
+    settings_dict: Dict,
+    date_start: str,
+    date_end: str,
+    image_format: Optional[str] = None,
+) -> Dict:
+    """Render the chart report of one ticker, runs in a worker process.
+
+    Args:
+        ticker (str): ticker symbol
+        folder (Path): report folder containing the shared plotly.js bundle
+        settings_dict (Dict): chart settings selecting the studies and parameters
+        date_start (str): include only dates later than date_start
+        date_end (str): include only dates earlier than date_end
+        image_format (str, optional): also write a static image, e.g. "png" or
+            "svg", requires kaleido
+
+    Returns:
+        Dict: manifest entry of the report, failures are reported by "error"
+    """
+    start = time.perf_counter()
+    entry: Dict = {"ticker": ticker}
+    try:
+        stocks_df = get_stocks_data(ticker, date_start, date_end)
+        if stocks_df.empty:
+            raise ValueError("no data")
+        fig = stocks_chart(stocks_df, dict(settings_dict, ticker_dropdown_state=ticker))
+        html_path = persist_figure(fig, ticker, folder, include_plotlyjs="directory")
+        entry.update(
+            html=html_path.name,
+            bars=len(stocks_df),
+            first_date=stocks_df.index[0].strftime("%Y-%m-%d"),
+            last_date=stocks_df.index[-1].strftime("%Y-%m-%d"),
+        )
+        if image_format is not None:
+            image_path = html_path.with_suffix(f".{image_format}")
+            fig.write_image(str(image_path), engine="kaleido")
+            entry["image"] = image_path.name
+    except Exception as error:
+        entry["error"] = f"{type(error).__name__}: {error}"
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def export_reports(
+    tickers: Sequence[str],
+    folder: Path,
+    settings_dict: Dict = None,
+    date_start: str = session_default.start_date,
+    date_end: str = session_default.end_date,
+    image_format: Optional[str] = None,
+    max_workers: int = config.EXPORT_WORKERS,
+) -> Dict:
+    """Render chart reports of several tickers on a process pool.
+
+    Args:
+        tickers (Sequence[str]): ticker symbols
+        folder (Path): report folder, created if missing
+        settings_dict (Dict, optional): chart settings, defaults to all studies
+            with their default parameters
+        date_start (str): include only dates later than date_start
+        date_end (str): include only dates earlier than date_end
+        image_format (str, optional): also write static images, e.g. "png" or
+            "svg", requires kaleido
+        max_workers (int): number of worker processes
+
+    Raises:
+        ImportError: a static image format was requested without kaleido
+
+    Returns:
+        Dict: manifest, also written to folder/manifest.json
+    """
+    if image_format is not None:
+        # fail before rendering anything rather than in every worker
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "static images require kaleido, install it with `pip install kaleido`"
+            ) from None
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    write_plotlyjs(folder)
+    settings_dict = default_settings() if settings_dict is None else settings_dict
+    tickers = list(dict.fromkeys(tickers))
+
+    reports: List[Dict] = []
+    if tickers:
+        context = multiprocessing.get_context(config.PROCESS_START_METHOD)
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(tickers)), mp_context=context
+        ) as pool:
+            futures = [
+                pool.submit(
+                    export_report,
+                    ticker,
+                    folder,
+                    settings_dict,
+                    date_start,
+                    date_end,
+                    image_format,
+                )
+                for ticker in tickers
+            ]
+            reports = [future.result() for future in as_completed(futures)]
+    # keep the order of the requested tickers
+    positions = {ticker: position for position, ticker in enumerate(tickers)}
+    reports.sort(key=lambda entry: positions[entry["ticker"]])
+
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "date_start": date_start,
+        "date_end": date_end,
+        # the bundle shipped with plotly.py, shared by all reports
+        "plotlyjs": PLOTLYJS_FILE,
+        "plotly_version": plotly.__version__,
+        "settings": settings_dict,
+        "failed": sum("error" in entry for entry in reports),
+        "reports": reports,
+    }
+    with open(folder / MANIFEST_FILE, "w") as fh:
+        json.dump(manifest, fh, indent=2, default=str)
+    return manifest
+
+
+def main(argv: List[str] = None):
+    """Export chart reports from the command line.
+
+    Run with `python -m fin.domain.logic.stocks export TICKER [TICKER ...]`.
+
+    Args:
+        argv (List[str], optional): command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(prog="export", description=__doc__.splitlines()[0])
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument(
+        "--folder",
+        type=Path,
+        default=config.EXPORT_FOLDER / date.today().strftime("%Y_%m_%d"),
+    )
+    parser.add_argument("--start", default=session_default.start_date)
+    parser.add_argument("--end", default=session_default.end_date)
+    parser.add_argument("--image", help="also write static images, e.g. png or svg")
+    parser.add_argument("--workers", type=int, default=config.EXPORT_WORKERS)
+    args = parser.parse_args(argv)
+
+    manifest = export_reports(
+        args.tickers,
+        args.folder,
+        date_start=args.start,
+        date_end=args.end,
+        image_format=args.image,
+        max_workers=args.workers,
+    )
+    for entry in manifest["reports"]:
+        print(f"{entry['ticker']:<8}{entry.get('html', entry.get('error'))}")
+    print(f"{len(manifest['reports'])} reports in {args.folder}")
@@ -0,0 +1,352 @@
+"""Gateway limiting, batching and coalescing the calls to the market data provider.
+
+All bars of a server process are requested upstream through one FetchGateway:
+
+- a fetch contained in a running upstream call of its symbol, or in a call of the
+  last FETCH_FRESH_SECONDS reaching into the current day, waits for and reuses
+  its bars. Overlapping fetches queued within the batch window share one call
+- symbols queued for the same date range are downloaded in one call, if the
+  provider serves several symbols at once (MarketDataProvider.batch_size)
+- upstream calls are limited by a token bucket (MarketDataProvider.rate_limit)
+  and failed calls are retried with jittered exponential backoff. Symbols failing
+  within a batch are retried one by one, see PartialFetchError
+
+Fetches failing on every attempt raise UpstreamError, the OHLC store then serves
+the bars it already has, see OHLCStore.read. Coalescing and batching apply per
+server process, the token bucket is shared by all processes through the shared
+cache, if one is configured.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from fin import config, metrics
+from fin.domain.logic.providers import (
+    OHLC_COLUMNS,
+    MarketDataProvider,
+    PartialFetchError,
+)
+from fin.domain.logic.shared_cache import SQLiteCache
+
+# maximum number of recent upstream calls kept for reuse
+FRESH_CALLS = 1024
+
+
+class UpstreamError(Exception):
+    """Raised when the market data provider failed on every attempt."""
+
+
+class TokenBucket:
+    """Limit the rate of calls while allowing short bursts.
+
+    With a shared cache the tokens are kept in its SQLite file, so the rate limits
+    the calls of all processes together, e.g. of every web server worker and of
+    the screener's process pool.
+
+    Args:
+        rate (float): tokens added per second
+        burst (int): maximum number of stored tokens
+        shared (SQLiteCache, optional): cache shared by the server processes
+        name (str): name of the bucket in the shared cache
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        shared: Optional[SQLiteCache] = None,
+        name: str = "",
+    ):
+        """Generate a bucket holding burst tokens."""
+        self.rate = rate
+        self.burst = burst
+        self.shared = shared
+        self.name = name
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting until one is available.
+
+        Returns:
+            float: seconds waited
+        """
+        if self.shared is not None:
+            wait = self.shared.take_token(self.name, self.rate, self.burst)
+            if wait:
+                time.sleep(wait)
+            return wait
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            # missing tokens are reserved in advance, so waiting callers are
+            # served in order
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class _Call:
+    """An upstream call of one symbol, shared by all fetches it covers."""
+
+    __slots__ = ("ticker_symbol", "interval", "start", "end", "future", "finished")
+
+    def __init__(
+        self, ticker_symbol: str, interval: str, start: pd.Timestamp, end: pd.Timestamp
+    ):
+        self.ticker_symbol = ticker_symbol
+        self.interval = interval
+        self.start = start
+        self.end = end
+        self.future: Future = Future()
+        self.finished = 0.0
+
+    def covers(self, start: pd.Timestamp, end: pd.Timestamp) -> bool:
+        return self.start <= start and end <= self.end
+
+
+class FetchGateway:
+    """Fetch bars like a provider, limiting and batching the upstream calls.
+
+    Gateways are called like providers, so they can be passed to OHLCStore.
+
+    Args:
+        provider (MarketDataProvider): provider requested upstream
+        rate (float, optional): upstream calls per second, defaults to the
+            provider's rate_limit, 0 is unlimited
+        burst (int): calls allowed at once before the rate applies
+        retries (int): retries of a failed upstream call
+        backoff (float): seconds waited before the first retry, doubling per retry
+        window (float): seconds fetches are queued for batching, only used if the
+            provider serves several symbols per call
+        fresh (float): seconds the bars of the current day are reused
+        max_workers (int): maximum number of concurrent upstream calls
+        shared (SQLiteCache, optional): cache keeping the token bucket of all
+            server processes
+    """
+
+    def __init__(
+        self,
+        provider: MarketDataProvider,
+        rate: Optional[float] = None,
+        burst: int = config.FETCH_BURST,
+        retries: int = config.FETCH_RETRIES,
+        backoff: float = config.FETCH_BACKOFF,
+        window: float = config.FETCH_BATCH_WINDOW,
+        fresh: float = config.FETCH_FRESH_SECONDS,
+        max_workers: int = config.FETCH_WORKERS,
+        shared: Optional[SQLiteCache] = None,
+    ):
+        """Generate a gateway instance."""
+        self.provider = provider
+        self.name = provider.name
+        rate = provider.rate_limit if rate is None else rate
+        self.bucket = (
+            TokenBucket(rate, burst, shared, f"fetch:{provider.name}") if rate else None
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.window = window if provider.batch_size > 1 else 0.0
+        self.fresh = fresh
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="fetch")
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._queued: List[_Call] = []
+        # (ticker symbol, interval) -> calls in progress or finished recently
+        self._running: Dict[Tuple[str, str], List[_Call]] = {}
+        self._recent: "OrderedDict[Tuple[str, str], _Call]" = OrderedDict()
+        self.calls = 0
+        self.coalesced = 0
+
+    def __call__(
+        self, ticker_symbol: str, date_start: str, date_end: str, interval: str = "1d"
+    ) -> pd.DataFrame:
+        """Return OHLC bars of ticker_symbol in [date_start, date_end).
+
+        Args:
+            ticker_symbol (str): ticker symbol string used to request market data
+            date_start (str): include only dates later than date_start
+            date_end (str): include only dates earlier than date_end
+            interval (str): bar interval, "1d" or "1h"
+
+        Raises:
+            UpstreamError: if the provider failed on every attempt
+
+        Returns:
+            pd.DataFrame: DataFrame containing stock data
+        """
+        start, end = pd.Timestamp(date_start), pd.Timestamp(date_end)
+        stocks_df = self._attach(ticker_symbol, interval, start, end).future.result()
+        return stocks_df[(stocks_df.index >= start) & (stocks_df.index < end)]
+
+    def _attach(
+        self, ticker_symbol: str, interval: str, start: pd.Timestamp, end: pd.Timestamp
+    ) -> _Call:
+        """Return the upstream call serving a fetch, queuing a new one if needed."""
+        key = (ticker_symbol, interval)
+        with self._lock:
+            shared = self._running.get(key, []) + self._fresh_calls(key)
+            for call in shared:
+                if call.covers(start, end):
+                    return self._coalesce(call)
+            for call in self._queued:
+                # queued calls are widened to overlapping fetches
+                if (call.ticker_symbol, call.interval) == key and (
+                    start <= call.end and call.start <= end
+                ):
+                    call.start, call.end = min(call.start, start), max(call.end, end)
+                    return self._coalesce(call)
+            call = _Call(ticker_symbol, interval, start, end)
+            self._queued.append(call)
+            flush_now = self.window <= 0
+            if not flush_now and self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self._flush()
+        return call
+
+    def _coalesce(self, call: _Call) -> _Call:
+        self.coalesced += 1
+        metrics.coalesced_fetches.inc()
+        return call
+
+    def _fresh_calls(self, key: Tuple[str, str]) -> List[_Call]:
+        """Return the recent call of key if its bars are still fresh."""
+        call = self._recent.get(key)
+        if call is None or time.monotonic() - call.finished > self.fresh:
+            return []
+        return [call]
+
+    def _flush(self):
+        """Submit the queued calls, batching symbols of the same date range."""
+        with self._lock:
+            queued, self._queued, self._timer = self._queued, [], None
+            batches: Dict[Tuple[str, pd.Timestamp, pd.Timestamp], List[_Call]] = {}
+            for call in queued:
+                self._running.setdefault(
+                    (call.ticker_symbol, call.interval), []
+                ).append(call)
+                batches.setdefault((call.interval, call.start, call.end), []).append(
+                    call
+                )
+        size = self.provider.batch_size
+        for calls in batches.values():
+            while calls:
+                batch, calls = calls[:size], calls[size:]
+                self._pool.submit(self._run, batch)
+
+    def _run(self, batch: List[_Call]):
+        """Request the bars of a batch upstream and hand them to its fetches."""
+        first = batch[0]
+        ticker_symbols = [call.ticker_symbol for call in batch]
+        frames, errors = self._request(
+            ticker_symbols, first.interval, first.start, first.end
+        )
+        for call in batch:
+            error = errors.get(call.ticker_symbol)
+            if error is None:
+                call.future.set_result(_naive_index(frames.get(call.ticker_symbol)))
+                continue
+            failure = UpstreamError(f"fetching {call.ticker_symbol}: {error}")
+            failure.__cause__ = error
+            call.future.set_exception(failure)
+        self._release(batch)
+
+    def _request(
+        self,
+        ticker_symbols: List[str],
+        interval: str,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+    ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Exception]]:
+        """Call the provider, retrying failed calls with jittered backoff.
+
+        A failed call is retried as a whole, the failed symbols of a partially
+        failed batch one by one.
+
+        Returns:
+            Tuple[Dict[str, pd.DataFrame], Dict[str, Exception]]: bars per ticker
+                symbol, last error per ticker symbol failing on every attempt
+        """
+        date_start, date_end = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+        frames: Dict[str, pd.DataFrame] = {}
+        errors: Dict[str, Exception] = {}
+        pending = [ticker_symbols]
+        attempt = 0
+        while pending:
+            retry = []
+            for symbols in pending:
+                if self.bucket is not None:
+                    self.bucket.acquire()
+                with self._lock:
+                    self.calls += 1
+                try:
+                    fetched = self.provider.fetch_many(
+                        symbols, date_start, date_end, interval
+                    )
+                except PartialFetchError as error:
+                    frames.update(error.frames)
+                    failed = [[symbol] for symbol in error.failed]
+                    last_error: Exception = error
+                except Exception as error:
+                    failed = [symbols]
+                    last_error = error
+                else:
+                    metrics.upstream_calls.inc("ok")
+                    frames.update(fetched)
+                    continue
+                metrics.upstream_calls.inc("error")
+                if attempt < self.retries:
+                    retry += failed
+                else:
+                    errors.update(
+                        (symbol, last_error) for group in failed for symbol in group
+                    )
+            if retry:
+                # jitter keeps the retries of concurrent calls apart
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+                attempt += 1
+            pending = retry
+        return frames, errors
+
+    def _release(self, batch: List[_Call]):
+        """Stop sharing finished calls, except fresh bars of the current day."""
+        today = pd.Timestamp(date.today())
+        now = time.monotonic()
+        with self._lock:
+            for call in batch:
+                key = (call.ticker_symbol, call.interval)
+                self._running[key].remove(call)
+                if not self._running[key]:
+                    del self._running[key]
+                if call.end > today and call.future.exception() is None:
+                    call.finished = now
+                    self._recent[key] = call
+                    self._recent.move_to_end(key)
+            while len(self._recent) > FRESH_CALLS:
+                self._recent.popitem(last=False)
+
+
+def _naive_index(stocks_df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Return bars with a time zone naive DatetimeIndex, empty ones if missing."""
+    if stocks_df is None or not isinstance(stocks_df.index, pd.DatetimeIndex):
+        return pd.DataFrame(
+            columns=OHLC_COLUMNS, index=pd.DatetimeIndex([], name="Date")
+        )
+    if stocks_df.index.tz:
+        stocks_df = stocks_df.tz_localize(None)
+    return stocks_df
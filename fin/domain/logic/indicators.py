@@ -0,0 +1,185 @@
+"""Vectorized technical indicators (Bollinger, MACD, RSI, SMA).
+
+The definitions follow the pure python studies of cufflinks.ta, so charts keep their
+values while the computation runs on NumPy arrays instead of pandas objects.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+def _window_sums(values: np.ndarray, periods: int) -> np.ndarray:
+    """Sum all complete windows of length periods using a single cumulative sum."""
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    return cumsum[periods:] - cumsum[:-periods]
+
+
+def _pad(window_values: np.ndarray, length: int) -> np.ndarray:
+    """Left-pad window results with NaN to the length of the input series."""
+    result = np.full(length, np.nan)
+    offset = length - len(window_values)
+    result[offset:] = window_values
+    return result
+
+
+def rolling_mean(values: np.ndarray, periods: int) -> np.ndarray:
+    """Compute the simple moving average.
+
+    Args:
+        values (np.ndarray): input series
+        periods (int): window length
+
+    Returns:
+        np.ndarray: moving average, NaN until the first window is complete
+    """
+    values = np.asarray(values, dtype=float)
+    if periods > len(values):
+        return np.full(len(values), np.nan)
+    return _pad(_window_sums(values, periods) / periods, len(values))
+
+
+def rolling_std(values: np.ndarray, periods: int) -> np.ndarray:
+    """Compute the moving sample standard deviation (ddof=1 like pandas).
+
+    Args:
+        values (np.ndarray): input series
+        periods (int): window length
+
+    Returns:
+        np.ndarray: moving standard deviation, NaN until the first window is complete
+    """
+    values = np.asarray(values, dtype=float)
+    if periods < 2 or periods > len(values):
+        return np.full(len(values), np.nan)
+    # shift values towards zero to reduce cancellation in the sum of squares
+    shifted = values - values[0]
+    sums = _window_sums(shifted, periods)
+    squares = _window_sums(shifted * shifted, periods)
+    variance = np.maximum((squares - sums * sums / periods) / (periods - 1), 0.0)
+    return _pad(np.sqrt(variance), len(values))
+
+
+def ema(values: np.ndarray, periods: int) -> np.ndarray:
+    """Compute the exponential moving average seeded with the first value.
+
+    Args:
+        values (np.ndarray): input series
+        periods (int): span of the moving average
+
+    Returns:
+        np.ndarray: exponential moving average
+    """
+    values = np.asarray(values, dtype=float)
+    factor = 2.0 / (periods + 1)
+    result = np.empty(len(values))
+    if not len(values):
+        return result
+    # the recursion runs on python floats, which is considerably faster than
+    # indexing single numpy elements
+    current = values[0]
+    result_list = [current]
+    for value in values[1:].tolist():
+        current = value * factor + current * (1 - factor)
+        result_list.append(current)
+    result[:] = result_list
+    return result
+
+
+def bollinger_bands(
+    close: np.ndarray, periods: int = 20, boll_std: float = 2
+) -> Dict[str, np.ndarray]:
+    """Compute Bollinger Bands.
+
+    Args:
+        close (np.ndarray): close prices
+        periods (int): window length
+        boll_std (float): band width in standard deviations
+
+    Returns:
+        Dict[str, np.ndarray]: middle band ("sma"), "upper" and "lower" band
+    """
+    middle = rolling_mean(close, periods)
+    width = rolling_std(close, periods) * boll_std
+    return {"sma": middle, "upper": middle + width, "lower": middle - width}
+
+
+def macd(
+    close: np.ndarray,
+    fast_period: int = 12,
+    slow_period: int = 26,
+    signal_period: int = 9,
+) -> Dict[str, np.ndarray]:
+    """Compute the Moving Average Convergence Divergence.
+
+    Args:
+        close (np.ndarray): close prices
+        fast_period (int): span of the fast EMA
+        slow_period (int): span of the slow EMA
+        signal_period (int): span of the signal EMA
+
+    Returns:
+        Dict[str, np.ndarray]: "macd" and "signal" line
+    """
+    if slow_period < fast_period:
+        raise ValueError("slow_period cannot be less than fast_period")
+    macd_line = ema(close, fast_period) - ema(close, slow_period)
+    return {"macd": macd_line, "signal": ema(macd_line, signal_period)}
+
+
+def rsi(close: np.ndarray, periods: int = 20) -> np.ndarray:
+    """Compute the Relative Strength Index based on simple moving averages.
+
+    Args:
+        close (np.ndarray): close prices
+        periods (int): window length
+
+    Returns:
+        np.ndarray: RSI values between 0 and 100
+    """
+    close = np.asarray(close, dtype=float)
+    if not len(close):
+        return close
+    change = np.diff(close, prepend=np.nan)
+    change[0] = 0.0
+    up_avg = rolling_mean(np.maximum(change, 0.0), periods)
+    down_avg = rolling_mean(np.maximum(-change, 0.0), periods)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - 100 / (1 + up_avg / down_avg)
+
+
+def compute_indicators(close: np.ndarray, settings_dict: Dict) -> Dict[str, Dict]:
+    """Compute all indicators enabled in the UI settings in one pass.
+
+    Args:
+        close (np.ndarray): close prices
+        settings_dict (Dict): settings derived from the UI
+
+    Returns:
+        Dict[str, Dict]: indicator values keyed by study ("bollinger", "macd", "rsi",
+            "sma"), deselected studies are omitted
+    """
+    close = np.asarray(close, dtype=float)
+    studies: Dict[str, Dict] = {}
+
+    # if UI checklists were deselected settings_dict values are empty lists
+    if settings_dict["bollinger_check_state"]:
+        studies["bollinger"] = bollinger_bands(
+            close,
+            periods=int(settings_dict["bollinger_periods_state"]),
+            boll_std=float(settings_dict["boll_std_state"]),
+        )
+    if settings_dict["macd_check_state"]:
+        studies["macd"] = macd(
+            close,
+            fast_period=int(settings_dict["macd_fast_period_state"]),
+            slow_period=int(settings_dict["macd_slow_period_state"]),
+            signal_period=int(settings_dict["macd_signal_period_state"]),
+        )
+    if settings_dict["rsi_check_state"]:
+        studies["rsi"] = {"rsi": rsi(close, int(settings_dict["rsi_periods_state"]))}
+    if settings_dict["sma_check_state"]:
+        studies["sma"] = {
+            "sma": rolling_mean(close, int(settings_dict["sma_periods_state"]))
+        }
+
+    return studies
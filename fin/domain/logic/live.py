@@ -0,0 +1,352 @@
+"""Extend a shown chart with new bars and incrementally updated studies.
+
+Live mode polls for bars since the last bar of the shown chart. Only bars followed
+by a newer bar are complete, the newest bar is still forming. The last bar of the
+chart is replaced once it is complete, as it may have been forming. The studies
+are advanced bar by bar from a state independent of the length of the history: the
+rolling windows of SMA, Bollinger and RSI keep their last values, the EMAs of the
+MACD only their current average. The state travels through a dcc.Store, so any
+server process can serve the next poll.
+"""
+import math
+from collections import deque
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from fin.domain.logic.stocks import get_stocks_data
+
+# clientside function applying the completed bars of a live update to the shown
+# figure. Traces are matched by their meta tags, see stocks_chart, updates of
+# another figure revision are dropped. Shown points at or after the first update
+# point are replaced, e.g. the forming bar the chart was generated with. x values
+# are either dates, "%Y-%m-%d %H:%M" strings, or milliseconds of encoded figures
+EXTEND_FIGURE_JS = """
+function(figure, live, revision) {
+    if (!live || !live.points || live.revision !== revision || !figure) {
+        return window.dash_clientside.no_update;
+    }
+    var points = live.points;
+    var milliseconds = function(x) {
+        if (typeof x === "number") {
+            return x;
+        }
+        var text = String(x);
+        return Date.parse(
+            (text.length > 10 ? text.replace(" ", "T") : text + "T00:00") + "Z"
+        );
+    };
+    var first = points.x[0];
+    var data = figure.data.map(function(trace) {
+        var meta = trace.meta || {};
+        var ohlc = meta.study === "ohlc";
+        var values = points.lines[meta.study + "." + meta.line];
+        if (!ohlc && !values) {
+            return trace;
+        }
+        var x = Array.from(trace.x || []);
+        var kept = x.length;
+        while (kept && milliseconds(x[kept - 1]) >= first) {
+            kept--;
+        }
+        var extended = Object.assign({}, trace, {
+            x: x.slice(0, kept).concat(points.x),
+        });
+        var keys = ohlc ? ["open", "high", "low", "close"] : ["y"];
+        keys.forEach(function(key) {
+            var shown = Array.from(trace[key] || []).slice(0, kept);
+            extended[key] = shown.concat(ohlc ? points[key] : values);
+        });
+        return extended;
+    });
+    return Object.assign({}, figure, {data: data});
+}
+"""
+
+
+class RollingWindow:
+    """Mean and standard deviation of the last periods values.
+
+    Values are shifted by the first value to reduce cancellation in the sum of
+    squares, like indicators.rolling_std does.
+
+    Args:
+        periods (int): window length
+        values (Tuple[float, ...], optional): shifted values of a snapshot
+        shift (float, optional): value subtracted from all values
+    """
+
+    def __init__(
+        self, periods: int, values: Tuple[float, ...] = (), shift: float = None
+    ):
+        """Generate a window instance."""
+        self.periods = periods
+        self.shift = shift
+        self.values: deque = deque(values, maxlen=periods)
+        # sums are rebuilt from the values, so rounding errors do not accumulate
+        # across snapshots
+        self.sum = math.fsum(self.values)
+        self.squares = math.fsum(value * value for value in self.values)
+
+    def push(self, value: float):
+        """Add a value, dropping the oldest one of a full window."""
+        if self.shift is None:
+            self.shift = value
+        value -= self.shift
+        if len(self.values) == self.periods:
+            oldest = self.values[0]
+            self.sum -= oldest
+            self.squares -= oldest * oldest
+        self.values.append(value)
+        self.sum += value
+        self.squares += value * value
+
+    def mean(self) -> float:
+        """Return the window mean, NaN until the window is complete."""
+        if len(self.values) < self.periods or self.shift is None:
+            return math.nan
+        return self.sum / self.periods + self.shift
+
+    def std(self) -> float:
+        """Return the sample standard deviation, NaN until the window is complete."""
+        if self.periods < 2 or len(self.values) < self.periods:
+            return math.nan
+        variance = (self.squares - self.sum * self.sum / self.periods) / (
+            self.periods - 1
+        )
+        return math.sqrt(max(variance, 0.0))
+
+    def snapshot(self) -> Dict:
+        """Return the window as JSON serializable dict."""
+        return {
+            "periods": self.periods,
+            "values": list(self.values),
+            "shift": self.shift,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> "RollingWindow":
+        """Restore a window from its snapshot."""
+        return cls(snapshot["periods"], snapshot["values"], snapshot["shift"])
+
+
+def _ema(current: Optional[float], value: float, periods: int) -> float:
+    """Advance an exponential moving average seeded with its first value."""
+    if current is None:
+        return value
+    factor = 2.0 / (periods + 1)
+    return value * factor + current * (1 - factor)
+
+
+class LiveStudies:
+    """Studies of a chart, advanced one close price at a time.
+
+    The values match the studies stocks_chart computes on the whole series, see
+    indicators.compute_indicators.
+
+    Args:
+        settings_dict (Dict): chart settings selecting the studies and parameters
+    """
+
+    def __init__(self, settings_dict: Dict):
+        """Generate a studies instance without history."""
+        self.settings_dict = settings_dict
+        self.previous_close: Optional[float] = None
+        self.windows: Dict[str, RollingWindow] = {}
+        self.emas: Dict[str, Optional[float]] = {}
+        if settings_dict["bollinger_check_state"]:
+            self.windows["bollinger"] = RollingWindow(
+                int(settings_dict["bollinger_periods_state"])
+            )
+        if settings_dict["macd_check_state"]:
+            self.emas.update(fast=None, slow=None, signal=None)
+        if settings_dict["rsi_check_state"]:
+            periods = int(settings_dict["rsi_periods_state"])
+            self.windows["rsi_up"] = RollingWindow(periods)
+            self.windows["rsi_down"] = RollingWindow(periods)
+        if settings_dict["sma_check_state"]:
+            self.windows["sma"] = RollingWindow(int(settings_dict["sma_periods_state"]))
+
+    def push(self, close: float) -> Dict[str, float]:
+        """Advance the studies by one bar.
+
+        Args:
+            close (float): close price of the new bar
+
+        Returns:
+            Dict[str, float]: value per "study.line", named like the meta tags of
+                the stocks_chart traces
+        """
+        settings_dict = self.settings_dict
+        values = {}
+        if "bollinger" in self.windows:
+            window = self.windows["bollinger"]
+            window.push(close)
+            middle = window.mean()
+            width = window.std() * float(settings_dict["boll_std_state"])
+            values.update(
+                {
+                    "bollinger.sma": middle,
+                    "bollinger.upper": middle + width,
+                    "bollinger.lower": middle - width,
+                }
+            )
+        if self.emas:
+            fast = _ema(
+                self.emas["fast"], close, int(settings_dict["macd_fast_period_state"])
+            )
+            slow = _ema(
+                self.emas["slow"], close, int(settings_dict["macd_slow_period_state"])
+            )
+            macd_line = fast - slow
+            signal = _ema(
+                self.emas["signal"],
+                macd_line,
+                int(settings_dict["macd_signal_period_state"]),
+            )
+            self.emas.update(fast=fast, slow=slow, signal=signal)
+            values.update({"macd.macd": macd_line, "macd.signal": signal})
+        if "rsi_up" in self.windows:
+            values.update(self._push_rsi(close))
+        if "sma" in self.windows:
+            self.windows["sma"].push(close)
+            values["sma.sma"] = self.windows["sma"].mean()
+        self.previous_close = close
+        return values
+
+    def _push_rsi(self, close: float) -> Dict[str, float]:
+        """Advance the RSI, the change of the first bar counts as zero."""
+        change = 0.0 if self.previous_close is None else close - self.previous_close
+        self.windows["rsi_up"].push(max(change, 0.0))
+        self.windows["rsi_down"].push(max(-change, 0.0))
+        up_avg = self.windows["rsi_up"].mean()
+        down_avg = self.windows["rsi_down"].mean()
+        if down_avg == 0:
+            value = 100.0 if up_avg > 0 else math.nan
+        else:
+            value = 100 - 100 / (1 + up_avg / down_avg)
+        return {
+            "rsi.rsi": value,
+            "rsi.lower_band": float(self.settings_dict["rsi_lower_state"]),
+            "rsi.upper_band": float(self.settings_dict["rsi_upper_state"]),
+        }
+
+    def snapshot(self) -> Dict:
+        """Return the studies as JSON serializable dict."""
+        return {
+            "previous_close": self.previous_close,
+            "windows": {
+                name: window.snapshot() for name, window in self.windows.items()
+            },
+            "emas": self.emas,
+        }
+
+    @classmethod
+    def from_snapshot(cls, settings_dict: Dict, snapshot: Dict) -> "LiveStudies":
+        """Restore the studies of a chart from their snapshot."""
+        studies = cls(settings_dict)
+        studies.previous_close = snapshot["previous_close"]
+        studies.windows = {
+            name: RollingWindow.from_snapshot(window)
+            for name, window in snapshot["windows"].items()
+        }
+        studies.emas = dict(snapshot["emas"])
+        return studies
+
+
+def _milliseconds(index: pd.DatetimeIndex) -> list:
+    """Convert bar timestamps to milliseconds since the epoch, as the figure has."""
+    return index.values.astype("datetime64[ms]").astype(np.int64).tolist()
+
+
+def start_live(settings_dict: Dict) -> Dict:
+    """Build the live state of the chart generated for settings_dict.
+
+    The last bar of the chart may still be forming, or be cut off by the end of
+    the date range, e.g. the current week of weekly bars. It is left out of the
+    studies and resent by poll_live once it is complete.
+
+    Args:
+        settings_dict (Dict): settings of the shown chart
+
+    Returns:
+        Dict: live state, "since" is the last shown bar, None without any bar
+    """
+    stocks_df = get_stocks_data(
+        settings_dict["ticker_dropdown_state"],
+        settings_dict["ticker_date_range_start_state"],
+        settings_dict["ticker_date_range_end_state"],
+        settings_dict.get("interval_state", "1d"),
+    )
+    studies = LiveStudies(settings_dict)
+    for close in stocks_df["Close"].iloc[:-1].tolist():
+        studies.push(close)
+    since = _milliseconds(stocks_df.index[-1:])
+    return {
+        "since": since[0] if since else None,
+        "studies": studies.snapshot(),
+        "points": None,
+        "forming": None,
+    }
+
+
+def poll_live(state: Dict, settings_dict: Dict) -> Dict:
+    """Fetch the bars since the first incomplete bar and advance the studies.
+
+    Only missing date ranges are requested upstream, see OHLCStore.read. Bars are
+    requested from the day of the first incomplete bar on, so resampled bars
+    cover their whole week, month, etc.
+
+    Args:
+        state (Dict): live state of start_live or a previous poll_live
+        settings_dict (Dict): settings of the shown chart
+
+    Returns:
+        Dict: new live state, "points" holds the completed bars to show, replacing
+            shown bars from their first date on, and the study values per
+            "study.line", "forming" the newest bar
+    """
+    since = pd.Timestamp(state["since"], unit="ms")
+    stocks_df = get_stocks_data(
+        settings_dict["ticker_dropdown_state"],
+        since.strftime("%Y-%m-%d"),
+        (date.today() + timedelta(days=1)).strftime("%Y-%m-%d"),
+        settings_dict.get("interval_state", "1d"),
+    )
+    new_bars = stocks_df[stocks_df.index >= since]
+    # the newest bar is still forming until a newer bar exists
+    completed = new_bars.iloc[:-1]
+    forming = None
+    if len(new_bars):
+        newest = new_bars.index[-1]
+        forming = {
+            "date": newest.strftime(
+                "%Y-%m-%d" if newest == newest.normalize() else "%Y-%m-%d %H:%M"
+            ),
+            "close": float(new_bars["Close"].iloc[-1]),
+        }
+        since = newest
+
+    studies = LiveStudies.from_snapshot(settings_dict, state["studies"])
+    lines: Dict[str, list] = {}
+    for close in completed["Close"].tolist():
+        for line, value in studies.push(close).items():
+            lines.setdefault(line, []).append(None if math.isnan(value) else value)
+    points = None
+    if len(completed):
+        points = {
+            "x": _milliseconds(completed.index),
+            "open": completed["Open"].tolist(),
+            "high": completed["High"].tolist(),
+            "low": completed["Low"].tolist(),
+            "close": completed["Close"].tolist(),
+            "lines": lines,
+        }
+    return {
+        "since": _milliseconds(pd.DatetimeIndex([since]))[0],
+        "studies": studies.snapshot(),
+        "points": points,
+        "forming": forming,
+    }
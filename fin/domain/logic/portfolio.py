@@ -0,0 +1,456 @@
+"""Risk analytics of a weighted portfolio of many stocks.
+
+All measures are computed with array operations over an aligned panel of daily
+returns, one column per symbol, so hundreds of symbols and decades of bars take
+milliseconds. Symbols join the portfolio with their first close, until then the
+weights are spread over the listed symbols.
+"""
+import re
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from fin import config
+from fin.domain.logic.compare import get_multi_stocks_data
+from fin.domain.logic.stocks import THEME
+from fin.domain.logic.sweep import BARS_PER_YEAR
+
+# standard normal quantile of each supported VaR confidence level
+VAR_LEVELS = {
+    0.9: 1.2815515655446004,
+    0.95: 1.6448536269514722,
+    0.99: 2.326347874040841,
+}
+# symbols, each optionally followed by a weight, e.g. "AAPL 40, MSFT:35, NVDA"
+WEIGHT_PATTERN = re.compile(r"([A-Za-z^][A-Za-z0-9.^=-]*)(?:\s*:?\s*(\d*\.?\d+))?")
+SUMMARY = {
+    "annual_return": "Annual return",
+    "volatility": "Volatility",
+    "max_drawdown": "Max. drawdown",
+    "var_historical": "Historical VaR",
+    "var_parametric": "Parametric VaR",
+    "beta": "Beta",
+}
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """Parse symbols and weights like "AAPL 40, MSFT 35, NVDA".
+
+    Symbols without weight get the mean of the given weights, so weights can be
+    entered in any unit, e.g. as percents or as shares. Without any weight, all
+    symbols are weighted equally.
+
+    Args:
+        text (str): symbols, each optionally followed by a weight
+
+    Raises:
+        ValueError: if no symbol or only zero weights are given
+
+    Returns:
+        Dict[str, float]: weight per symbol, summing to 1
+    """
+    weights: Dict[str, float] = {}
+    for symbol, weight in WEIGHT_PATTERN.findall(text or ""):
+        weights[symbol.upper()] = float(weight) if weight else np.nan
+    if not weights:
+        raise ValueError("enter at least one ticker symbol")
+    values = np.array(list(weights.values()))
+    unweighted = np.isnan(values)
+    if unweighted.all():
+        values[:] = 1.0
+    else:
+        values[unweighted] = values[~unweighted].mean()
+    if values.sum() <= 0:
+        raise ValueError("weights have to sum to a positive number")
+    return dict(zip(weights, values / values.sum()))
+
+
+def returns_panel(closes: pd.DataFrame) -> np.ndarray:
+    """Compute the simple daily returns of aligned close prices.
+
+    Args:
+        closes (pd.DataFrame): aligned close prices, one column per stock
+
+    Returns:
+        np.ndarray: (n - 1, k) returns, NaN before the first close of a stock
+    """
+    prices = closes.to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return prices[1:] / prices[:-1] - 1
+
+
+def portfolio_returns(returns: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Weight the returns of the stocks listed on each day.
+
+    Args:
+        returns (np.ndarray): (n, k) returns, NaN while a stock is not listed
+        weights (np.ndarray): k target weights
+
+    Returns:
+        np.ndarray: n portfolio returns, NaN on days without any listed stock
+    """
+    listed = ~np.isnan(returns)
+    # weights of the listed stocks, the others' weights are spread over them
+    total = listed @ weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (
+            np.where(listed, returns, 0.0)
+            @ weights
+            / np.where(total > 0, total, np.nan)
+        )
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum trailing windows along the first axis, the first window - 1 sums are 0."""
+    cumsum = np.cumsum(values, axis=0)
+    sums = cumsum.copy()
+    sums[window:] -= cumsum[:-window]
+    sums[: window - 1] = 0.0
+    return sums
+
+
+def rolling_volatility(
+    returns: np.ndarray, window: int, bars_per_year: int = BARS_PER_YEAR["1d"]
+) -> np.ndarray:
+    """Annualized standard deviation of the returns of trailing windows.
+
+    Args:
+        returns (np.ndarray): returns along the first axis, one column per series
+        window (int): window length
+        bars_per_year (int): number of bars per year used to annualize
+
+    Returns:
+        np.ndarray: volatility per bar and series, NaN unless the window is full
+    """
+    listed = ~np.isnan(returns)
+    values = np.where(listed, returns, 0.0)
+    counts = _rolling_sum(listed.astype(float), window)
+    sums = _rolling_sum(values, window)
+    squares = _rolling_sum(values * values, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (squares - sums * sums / window) / (window - 1)
+    variance = np.where(counts == window, np.maximum(variance, 0.0), np.nan)
+    return np.sqrt(variance * bars_per_year)
+
+
+def rolling_beta(
+    returns: np.ndarray, index_returns: np.ndarray, window: int
+) -> np.ndarray:
+    """Beta of the returns against the index returns of trailing windows.
+
+    Args:
+        returns (np.ndarray): n returns
+        index_returns (np.ndarray): n returns of the index, NaN if missing
+        window (int): window length
+
+    Returns:
+        np.ndarray: n betas, NaN unless the window holds window index returns
+    """
+    paired = ~(np.isnan(returns) | np.isnan(index_returns))
+    x = np.where(paired, returns, 0.0)
+    y = np.where(paired, index_returns, 0.0)
+    counts = _rolling_sum(paired.astype(float), window)
+    sum_x, sum_y = _rolling_sum(x, window), _rolling_sum(y, window)
+    covariance = _rolling_sum(x * y, window) - sum_x * sum_y / window
+    variance = _rolling_sum(y * y, window) - sum_y * sum_y / window
+    full = (counts == window) & (variance > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(full, covariance / variance, np.nan)
+
+
+def drawdown(returns: np.ndarray) -> np.ndarray:
+    """Relative loss from the running maximum of the compounded returns.
+
+    Args:
+        returns (np.ndarray): returns along the first axis, NaN counts as 0
+
+    Returns:
+        np.ndarray: drawdowns between 0 and 1 of the same shape
+    """
+    log_wealth = np.cumsum(np.log1p(np.nan_to_num(returns)), axis=0)
+    return 1 - np.exp(log_wealth - np.maximum.accumulate(log_wealth, axis=0))
+
+
+def _nanquantile(values: np.ndarray, q: float) -> np.ndarray:
+    """Linearly interpolated quantile per column, ignoring NaN.
+
+    Sorting moves NaN to the end, so each column's quantile is picked at its own
+    count. np.nanquantile loops over the columns instead.
+    """
+    ordered = np.sort(values, axis=0)
+    counts = (~np.isnan(values)).sum(axis=0)
+    position = np.maximum(counts - 1, 0) * q
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    low = np.take_along_axis(ordered, lower[None], axis=0)[0]
+    high = np.take_along_axis(ordered, upper[None], axis=0)[0]
+    return np.where(counts > 0, low + (high - low) * (position - lower), np.nan)
+
+
+def _moments(returns: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Count, mean and sample standard deviation per column, ignoring NaN."""
+    listed = ~np.isnan(returns)
+    counts = listed.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(listed, returns, 0.0).sum(axis=0) / counts
+        deviations = np.where(listed, returns - mean, 0.0)
+        variance = (deviations * deviations).sum(axis=0) / (counts - 1)
+    return counts, mean, np.sqrt(np.where(counts > 1, variance, np.nan))
+
+
+def value_at_risk(returns: np.ndarray, level: float = 0.95) -> Tuple[np.ndarray, ...]:
+    """Daily historical and parametric (normal) value at risk per column.
+
+    Args:
+        returns (np.ndarray): (n, k) returns, NaN if missing
+        level (float): confidence level, see VAR_LEVELS
+
+    Returns:
+        Tuple[np.ndarray, ...]: k historical and k parametric VaRs, as positive
+            fractions of the invested value
+    """
+    _, mean, std = _moments(returns)
+    return -_nanquantile(returns, 1 - level), VAR_LEVELS[level] * std - mean
+
+
+def beta(returns: np.ndarray, index_returns: np.ndarray) -> np.ndarray:
+    """Beta of each column against the index, over the days both have returns.
+
+    Args:
+        returns (np.ndarray): (n, k) returns, NaN if missing
+        index_returns (np.ndarray): n returns of the index, NaN if missing
+
+    Returns:
+        np.ndarray: k betas
+    """
+    paired = ~(np.isnan(returns) | np.isnan(index_returns)[:, None])
+    counts = paired.sum(axis=0)
+    x = np.where(paired, returns, 0.0)
+    y = np.where(paired, index_returns[:, None], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_x, mean_y = x.sum(axis=0) / counts, y.sum(axis=0) / counts
+        covariance = (x * y).sum(axis=0) / counts - mean_x * mean_y
+        variance = (y * y).sum(axis=0) / counts - mean_y * mean_y
+        return np.where(variance > 0, covariance / variance, np.nan)
+
+
+class PortfolioRisk(NamedTuple):
+    """Risk measures of a portfolio and its stocks."""
+
+    dates: pd.DatetimeIndex
+    wealth: np.ndarray
+    index_wealth: np.ndarray
+    drawdown: np.ndarray
+    volatility: np.ndarray
+    beta: np.ndarray
+    summary: Dict[str, float]
+    assets: pd.DataFrame
+
+
+def portfolio_risk(
+    closes: pd.DataFrame,
+    weights: Dict[str, float],
+    index_closes: pd.Series = None,
+    window: int = config.PORTFOLIO_WINDOW,
+    level: float = config.PORTFOLIO_VAR_LEVEL,
+) -> PortfolioRisk:
+    """Compute the risk of a weighted portfolio.
+
+    Args:
+        closes (pd.DataFrame): aligned close prices, one column per stock
+        weights (Dict[str, float]): weight per column of closes
+        index_closes (pd.Series, optional): close prices of the index betas refer
+            to, aligned to closes
+        window (int): days of the rolling volatility and beta
+        level (float): VaR confidence level, see VAR_LEVELS
+
+    Raises:
+        ValueError: if no stock has two closes or level is not supported
+
+    Returns:
+        PortfolioRisk: daily series and summary of the portfolio, and the risk
+            measures per stock
+    """
+    if level not in VAR_LEVELS:
+        raise ValueError(
+            f"unsupported VaR level {level}, choose from {list(VAR_LEVELS)}"
+        )
+    symbols = list(closes.columns)
+    weight_array = np.array([weights.get(symbol, 0.0) for symbol in symbols])
+    returns = returns_panel(closes)
+    portfolio = portfolio_returns(returns, weight_array)
+    # the portfolio starts on the first day any weighted stock is listed
+    days = np.flatnonzero(~np.isnan(portfolio))
+    if not len(days):
+        raise ValueError("no price history of the selected symbols in the date range")
+    first = days[0]
+    returns, portfolio = returns[first:], portfolio[first:]
+    if index_closes is None:
+        index_returns = np.full(len(portfolio), np.nan)
+    else:
+        index_returns = returns_panel(index_closes.to_frame())[first:, 0]
+
+    bars_per_year = BARS_PER_YEAR["1d"]
+    both = np.column_stack([portfolio, returns])
+    counts, mean, std = _moments(both)
+    drawdowns = drawdown(both)
+    # stocks without returns in the date range yield NaN
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_growth = np.log1p(np.nan_to_num(both)).sum(axis=0)
+        measures = {
+            "annual_return": np.expm1(log_growth * bars_per_year / counts),
+            "volatility": std * np.sqrt(bars_per_year),
+            "max_drawdown": drawdowns.max(axis=0),
+            "var_historical": -_nanquantile(both, 1 - level),
+            "var_parametric": VAR_LEVELS[level] * std - mean,
+            "beta": beta(both, index_returns),
+        }
+    measures = {
+        name: np.where(counts > 0, values, np.nan) for name, values in measures.items()
+    }
+    summary = {name: float(values[0]) for name, values in measures.items()}
+    assets = pd.DataFrame(
+        dict(
+            {"weight": weight_array},
+            **{name: values[1:] for name, values in measures.items()},
+        ),
+        index=pd.Index(symbols, name="symbol"),
+    )
+    return PortfolioRisk(
+        # returns start with the second close
+        dates=closes.index[1:][first:],
+        wealth=np.exp(np.cumsum(np.log1p(portfolio))),
+        index_wealth=np.exp(np.cumsum(np.log1p(np.nan_to_num(index_returns)))),
+        drawdown=drawdowns[:, 0],
+        volatility=rolling_volatility(portfolio, window, bars_per_year),
+        beta=rolling_beta(portfolio, index_returns, window),
+        summary=summary,
+        assets=assets,
+    )
+
+
+def get_portfolio_risk(
+    weights: Dict[str, float],
+    date_start: str,
+    date_end: str,
+    index_symbol: str = config.PORTFOLIO_INDEX,
+    window: int = config.PORTFOLIO_WINDOW,
+    level: float = config.PORTFOLIO_VAR_LEVEL,
+) -> Tuple[PortfolioRisk, Dict[str, Exception]]:
+    """Load the closes of the portfolio and the index and compute the risk.
+
+    Symbols whose request fails are left out with NaN measures and reported.
+
+    Args:
+        weights (Dict[str, float]): weight per ticker symbol, see parse_weights
+        date_start (str): include only dates later than date_start
+        date_end (str): include only dates earlier than date_end
+        index_symbol (str): ticker symbol of the index betas refer to
+        window (int): days of the rolling volatility and beta
+        level (float): VaR confidence level, see VAR_LEVELS
+
+    Raises:
+        ValueError: if the index or every symbol of the portfolio fails to load
+
+    Returns:
+        Tuple[PortfolioRisk, Dict[str, Exception]]: risk of the portfolio and the
+            error per failed ticker symbol
+    """
+    symbols: List[str] = list(weights)
+    closes, failed = get_multi_stocks_data(
+        symbols + [index_symbol], date_start, date_end
+    )
+    if index_symbol in failed:
+        raise ValueError(
+            f"cannot load the index {index_symbol}, {failed[index_symbol]}"
+        )
+    if all(symbol in failed for symbol in symbols):
+        raise ValueError(
+            "cannot load any symbol, "
+            + "; ".join(f"{symbol}: {error}" for symbol, error in failed.items())
+        )
+    index_closes = closes[index_symbol] if index_symbol in closes else None
+    closes = closes.reindex(columns=symbols)
+    return portfolio_risk(closes, weights, index_closes, window, level), failed
+
+
+def risk_chart(risk: PortfolioRisk, index_symbol: str = config.PORTFOLIO_INDEX):
+    """Generate a chart of the growth, drawdown, volatility and beta of a portfolio.
+
+    Args:
+        risk (PortfolioRisk): risk of the portfolio
+        index_symbol (str): ticker symbol of the index shown for comparison
+
+    Returns:
+        go.Figure: four stacked line charts sharing the date axis
+    """
+    x = risk.dates.strftime("%Y-%m-%d").to_numpy()
+    fig = make_subplots(
+        rows=4,
+        cols=1,
+        shared_xaxes=True,
+        row_heights=[0.4, 0.2, 0.2, 0.2],
+        vertical_spacing=0.04,
+        subplot_titles=["Growth", "Drawdown", "Rolling volatility", "Rolling beta"],
+    )
+    lines = [
+        (risk.wealth, "Portfolio", THEME["line"], 1),
+        (risk.index_wealth, index_symbol, THEME["down"], 1),
+        (-risk.drawdown, "Drawdown", THEME["signal"], 2),
+        (risk.volatility, "Volatility", THEME["line"], 3),
+        (risk.beta, "Beta", THEME["line"], 4),
+    ]
+    for y, name, color, row in lines:
+        fig.add_trace(
+            go.Scatter(
+                x=x,
+                y=np.round(y, 5),
+                name=name,
+                mode="lines",
+                line=dict(color=color, width=1.5),
+                showlegend=row == 1,
+            ),
+            row=row,
+            col=1,
+        )
+    fig.update_layout(
+        paper_bgcolor=THEME["background"],
+        plot_bgcolor=THEME["background"],
+        font=dict(color=THEME["font"]),
+        margin=dict(b=30, l=30, r=30, t=30),
+        legend=dict(orientation="h", y=1.06),
+        height=750,
+    )
+    fig.update_yaxes(tickformat=".0%", row=2, col=1)
+    fig.update_yaxes(tickformat=".0%", row=3, col=1)
+    return fig
+
+
+def summary_table(risk: PortfolioRisk, rows: int = 10) -> pd.DataFrame:
+    """Tabulate the summary of the portfolio and its largest positions.
+
+    Args:
+        risk (PortfolioRisk): risk of the portfolio
+        rows (int): maximum number of stocks listed
+
+    Returns:
+        pd.DataFrame: formatted measures, one row for the portfolio and per stock
+    """
+    table = pd.concat(
+        [
+            pd.DataFrame(dict(risk.summary, weight=1.0), index=["Portfolio"]),
+            risk.assets.nlargest(rows, "weight"),
+        ]
+    )
+    formatted = pd.DataFrame(index=table.index)
+    formatted["Weight"] = table["weight"].map("{:.1%}".format)
+    for column, label in SUMMARY.items():
+        value_format = "{:.2f}" if column == "beta" else "{:.1%}"
+        formatted[label] = [
+            "n/a" if np.isnan(value) else value_format.format(value)
+            for value in table[column]
+        ]
+    return formatted.reset_index().rename(columns={"index": "Symbol"})
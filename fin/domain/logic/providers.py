@@ -0,0 +1,375 @@
+"""Market data providers serving daily OHLC bars to the OHLC store.
+
+A provider is called like request_stocks_data(ticker_symbol, date_start, date_end)
+and returns a DataFrame with a DatetimeIndex named "Date" and the columns Open, High,
+Low and Close, covering the half-open range [date_start, date_end). Providers serve
+the base intervals "1d" (default) and "1h", coarser bars are resampled locally, see
+fin.domain.logic.resample. The app requests bars through a gateway limiting and
+batching the calls to the provider, see fin.domain.logic.gateway.
+"""
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+import pandas as pd
+
+from fin import config
+
+OHLC_COLUMNS = ["Open", "High", "Low", "Close"]
+# start of the hourly bars of a trading session, like the hourly bars of Yahoo
+SESSION_HOURS = np.arange(7) * np.timedelta64(60, "m") + np.timedelta64(570, "m")
+# yf.download resets and fills module globals of yfinance (shared._DFS and
+# shared._ERRORS), so concurrent downloads would mix up their symbols
+_DOWNLOAD_LOCK = threading.Lock()
+
+
+class PartialFetchError(Exception):
+    """Raised by fetch_many if some symbols of a batch failed.
+
+    Args:
+        failed (Dict[str, str]): error message per failed ticker symbol
+        frames (Dict[str, pd.DataFrame]): bars of the other ticker symbols
+    """
+
+    def __init__(self, failed: Dict[str, str], frames: Dict[str, pd.DataFrame]):
+        """Generate an error naming the failed symbols."""
+        super().__init__(
+            "; ".join(f"{symbol}: {message}" for symbol, message in failed.items())
+        )
+        self.failed = failed
+        self.frames = frames
+
+
+class MarketDataProvider(ABC):
+    """Base class of market data providers, subclasses implement fetch."""
+
+    # name used in the configuration, also the provider's OHLC store subfolder
+    name = ""
+    # maximum number of symbols per call of fetch_many
+    batch_size = 1
+    # maximum upstream calls per second, None if unlimited
+    rate_limit: Optional[float] = None
+    # number of past days hourly bars are served for, None if unlimited
+    intraday_days: Optional[int] = None
+
+    @abstractmethod
+    def fetch(
+        self, ticker_symbol: str, date_start: str, date_end: str, interval: str = "1d"
+    ) -> pd.DataFrame:
+        """Return OHLC bars of ticker_symbol in [date_start, date_end).
+
+        Args:
+            ticker_symbol (str): ticker symbol string used to request market data
+            date_start (str): include only dates later than date_start
+            date_end (str): include only dates earlier than date_end
+            interval (str): bar interval, "1d" or "1h"
+
+        Returns:
+            pd.DataFrame: DataFrame containing stock data
+        """
+
+    def fetch_many(
+        self,
+        ticker_symbols: List[str],
+        date_start: str,
+        date_end: str,
+        interval: str = "1d",
+    ) -> Dict[str, pd.DataFrame]:
+        """Return OHLC bars of several symbols in [date_start, date_end).
+
+        Providers which can serve several symbols in one call override this method
+        and raise batch_size.
+
+        Args:
+            ticker_symbols (List[str]): at most batch_size ticker symbols
+            date_start (str): include only dates later than date_start
+            date_end (str): include only dates earlier than date_end
+            interval (str): bar interval, "1d" or "1h"
+
+        Raises:
+            PartialFetchError: if some of the symbols failed
+
+        Returns:
+            Dict[str, pd.DataFrame]: bars per ticker symbol
+        """
+        return {
+            ticker_symbol: self.fetch(ticker_symbol, date_start, date_end, interval)
+            for ticker_symbol in ticker_symbols
+        }
+
+    def __call__(
+        self, ticker_symbol: str, date_start: str, date_end: str, interval: str = "1d"
+    ) -> pd.DataFrame:
+        """Fetch bars, so providers can be used where fetch functions are expected."""
+        return self.fetch(ticker_symbol, date_start, date_end, interval)
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Request bars from Yahoo Finance using yfinance."""
+
+    name = "yfinance"
+    batch_size = config.FETCH_BATCH_SIZE
+    # Yahoo Finance throttles clients sending many requests
+    rate_limit = config.FETCH_RATE
+    intraday_days = 730
+
+    def fetch(
+        self, ticker_symbol: str, date_start: str, date_end: str, interval: str = "1d"
+    ) -> pd.DataFrame:
+        """Request stock market DataFrame from Yahoo Finance.
+
+        Yahoo Finance serves hourly bars of the last 730 days only, see intraday_days.
+        """
+        # yfinance is imported on first request only, it is slow to import
+        import yfinance as yf
+
+        stocks_df = (
+            yf.Ticker(ticker_symbol)
+            .history(start=date_start, end=date_end, interval=interval)
+            .drop(columns=["Volume", "Dividends", "Stock Splits"])
+        )
+        # hourly bars are indexed by "Datetime"
+        stocks_df.index.name = "Date"
+        return stocks_df
+
+    def fetch_many(
+        self,
+        ticker_symbols: List[str],
+        date_start: str,
+        date_end: str,
+        interval: str = "1d",
+    ) -> Dict[str, pd.DataFrame]:
+        """Download the bars of several symbols in one request.
+
+        yf.download does not raise for failed symbols, it records their errors in
+        yfinance's shared registry and returns NaN columns. These symbols, and
+        symbols missing from the download, are reported by PartialFetchError, so
+        they are neither taken for symbols without bars nor marked as covered by
+        the OHLC store. Yahoo Finance also reports symbols without any bar in the
+        date range there, the gateway therefore retries failed symbols one by one,
+        see FetchGateway. Downloads run one at a time, as the registry is global.
+        """
+        if len(ticker_symbols) == 1:
+            return super().fetch_many(ticker_symbols, date_start, date_end, interval)
+        import yfinance as yf
+        from yfinance import shared
+
+        with _DOWNLOAD_LOCK:
+            downloaded = yf.download(
+                ticker_symbols,
+                start=date_start,
+                end=date_end,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=True,
+                actions=False,
+                threads=False,
+                progress=False,
+            )
+            # the registry is reset by every download, keyed by upper case symbols
+            errors = {
+                symbol.upper(): str(message)
+                for symbol, message in shared._ERRORS.items()
+            }
+        downloaded_symbols = set(downloaded.columns.get_level_values(0))
+        frames = {}
+        failed = {}
+        for ticker_symbol in ticker_symbols:
+            if ticker_symbol.upper() in errors:
+                failed[ticker_symbol] = errors[ticker_symbol.upper()]
+            elif ticker_symbol not in downloaded_symbols:
+                failed[ticker_symbol] = "missing from the download"
+            else:
+                # days without bars of a symbol are missing rows of the others
+                stocks_df = downloaded[ticker_symbol][OHLC_COLUMNS].dropna(how="all")
+                stocks_df.index.name = "Date"
+                frames[ticker_symbol] = stocks_df
+        if failed:
+            raise PartialFetchError(failed, frames)
+        return frames
+
+
+class LocalFileProvider(MarketDataProvider):
+    """Read bars from CSV files, one per ticker symbol, e.g. recorded fixtures.
+
+    Each file is named {ticker_symbol}.csv ({ticker_symbol}_1h.csv for hourly bars)
+    and holds a Date column plus the OHLC columns. Symbols without a file yield an
+    empty DataFrame, like unknown symbols on Yahoo Finance.
+
+    Args:
+        folder (Path): folder containing the CSV files
+    """
+
+    name = "local"
+
+    def __init__(self, folder: Path = config.LOCAL_DATA_FOLDER):
+        """Generate a local file provider."""
+        self.folder = Path(folder)
+
+    def fetch(
+        self, ticker_symbol: str, date_start: str, date_end: str, interval: str = "1d"
+    ) -> pd.DataFrame:
+        """Read the stored bars of ticker_symbol within the requested range."""
+        suffix = "" if interval == "1d" else f"_{interval}"
+        path = self.folder / f"{ticker_symbol}{suffix}.csv"
+        if not path.exists():
+            return pd.DataFrame(columns=OHLC_COLUMNS, index=pd.DatetimeIndex([]))
+        stocks_df = pd.read_csv(
+            path,
+            index_col="Date",
+            parse_dates=["Date"],
+            usecols=["Date"] + OHLC_COLUMNS,
+        )
+        in_range = (stocks_df.index >= pd.Timestamp(date_start)) & (
+            stocks_df.index < pd.Timestamp(date_end)
+        )
+        return stocks_df[in_range].sort_index()
+
+
+class SyntheticProvider(MarketDataProvider):
+    """Generate deterministic bars following a geometric Brownian motion.
+
+    Every symbol gets its own random walk starting at epoch, seeded by the symbol and
+    seed, so overlapping requests return identical bars and any symbol and date range
+    can be served without network access. Dates before epoch yield no bars. Hourly
+    bars split each daily bar into the seven hours of a trading session.
+
+    Args:
+        seed (int): seed shared by all symbols
+        drift (float): expected annual log return
+        volatility (float): annual volatility of the log returns
+        epoch (str): first business day of every random walk
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        seed: int = config.SYNTHETIC_SEED,
+        drift: float = 0.07,
+        volatility: float = 0.3,
+        epoch: str = "1990-01-01",
+    ):
+        """Generate a synthetic provider."""
+        self.seed = seed
+        self.drift = drift
+        self.volatility = volatility
+        self.epoch = pd.Timestamp(epoch)
+
+    def fetch(
+        self, ticker_symbol: str, date_start: str, date_end: str, interval: str = "1d"
+    ) -> pd.DataFrame:
+        """Generate the bars of ticker_symbol within the requested range."""
+        start = max(pd.Timestamp(date_start), self.epoch)
+        end = pd.Timestamp(date_end)
+        # business days in [epoch, end), pd.bdate_range is slow on long ranges
+        calendar = np.arange(
+            self.epoch.to_datetime64().astype("M8[D]"),
+            end.to_datetime64().astype("M8[D]"),
+        )
+        days = pd.DatetimeIndex(
+            calendar[np.is_busday(calendar)].astype("M8[ns]"), name="Date"
+        )
+        first = days.searchsorted(start)
+
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker_symbol.encode())])
+        start_price = 20 + rng.random() * 180
+        # four draws per day: close return, open gap and two intraday extremes,
+        # drawn in date order, so the bars don't depend on the requested end
+        draws = rng.standard_normal((len(days), 4))
+        daily_volatility = self.volatility / np.sqrt(252)
+        daily_drift = self.drift / 252 - daily_volatility ** 2 / 2
+        log_returns = daily_drift + daily_volatility * draws[:, 0]
+        close = start_price * np.exp(np.cumsum(log_returns))
+        open_ = close * np.exp(daily_volatility * 0.3 * draws[:, 1])
+        high = np.maximum(open_, close) * np.exp(
+            np.abs(draws[:, 2]) * daily_volatility * 0.5
+        )
+        low = np.minimum(open_, close) * np.exp(
+            -np.abs(draws[:, 3]) * daily_volatility * 0.5
+        )
+        bars = pd.DataFrame(
+            {"Open": open_, "High": high, "Low": low, "Close": close}, index=days
+        )
+        if interval == "1h":
+            # hours are drawn from their own stream, all days since epoch, so they
+            # don't depend on the requested range either
+            hourly_rng = np.random.default_rng(
+                [self.seed, zlib.crc32(ticker_symbol.encode()), 1]
+            )
+            first_hour = first * len(SESSION_HOURS)
+            return self._hourly(bars, hourly_rng).iloc[first_hour:]
+        return bars.iloc[first:]
+
+    def _hourly(self, daily: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+        """Split daily bars into hourly bars starting at 9:30.
+
+        The hourly closes follow a Brownian bridge from the daily open to the daily
+        close. All hourly prices stay within the daily low and high, which are reached
+        by the lowest and the highest hourly bar.
+        """
+        hours = len(SESSION_HOURS)
+        n_days = len(daily)
+        daily_volatility = self.volatility / np.sqrt(252)
+        # log prices relative to the open at the end of every hour
+        steps = rng.standard_normal((n_days, hours)) * daily_volatility / np.sqrt(hours)
+        walk = np.cumsum(steps, axis=1)
+        log_close = np.log(daily["Close"].to_numpy() / daily["Open"].to_numpy())
+        bridge = walk - walk[:, -1:] * np.arange(1, hours + 1) / hours
+        close = daily["Open"].to_numpy()[:, None] * np.exp(
+            bridge + log_close[:, None] * np.arange(1, hours + 1) / hours
+        )
+        day_high = daily["High"].to_numpy()[:, None]
+        day_low = daily["Low"].to_numpy()[:, None]
+        close = np.clip(close, day_low, day_high)
+        open_ = np.column_stack([daily["Open"].to_numpy(), close[:, :-1]])
+        high = np.minimum(
+            np.maximum(open_, close) * np.exp(np.abs(steps) * 0.5), day_high
+        )
+        low = np.maximum(
+            np.minimum(open_, close) * np.exp(-np.abs(steps[:, ::-1]) * 0.5), day_low
+        )
+        days = np.arange(n_days)
+        high[days, high.argmax(axis=1)] = day_high[:, 0]
+        low[days, low.argmin(axis=1)] = day_low[:, 0]
+        index = pd.DatetimeIndex(
+            (daily.index.values[:, None] + SESSION_HOURS[None, :]).ravel(), name="Date"
+        )
+        return pd.DataFrame(
+            {
+                "Open": open_.ravel(),
+                "High": high.ravel(),
+                "Low": low.ravel(),
+                "Close": close.ravel(),
+            },
+            index=index,
+        )
+
+
+PROVIDERS: Dict[str, Type[MarketDataProvider]] = {
+    provider.name: provider
+    for provider in (YFinanceProvider, LocalFileProvider, SyntheticProvider)
+}
+
+
+def get_provider(name: str = config.MARKET_DATA_PROVIDER) -> MarketDataProvider:
+    """Return the market data provider configured by name.
+
+    Args:
+        name (str): "yfinance", "local" or "synthetic"
+
+    Raises:
+        ValueError: if no provider is called name
+
+    Returns:
+        MarketDataProvider: provider with its default settings
+    """
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(
+            f"unknown market data provider '{name}', choose from {sorted(PROVIDERS)}"
+        ) from None
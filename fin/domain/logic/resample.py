@@ -0,0 +1,116 @@
+"""Derive coarser OHLC bars from stored finer bars.
+
+Only the base intervals are requested upstream and stored, every other interval is
+resampled locally from the bars of its base interval. Bars are grouped by a bucket
+key per bar, consecutive bars sharing a key are merged with ufunc.reduceat.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from fin.domain.logic.downsample import ohlc_buckets
+
+# base interval each supported interval is derived from
+INTERVALS: Dict[str, str] = {
+    "1h": "1h",
+    "2h": "1h",
+    "4h": "1h",
+    "1d": "1d",
+    "1wk": "1d",
+    "1mo": "1d",
+    "3mo": "1d",
+}
+BASE_INTERVALS = ("1h", "1d")
+INTERVAL_LABELS = {
+    "1h": "1 hour",
+    "2h": "2 hours",
+    "4h": "4 hours",
+    "1d": "1 day",
+    "1wk": "1 week",
+    "1mo": "1 month",
+    "3mo": "3 months",
+}
+
+
+def base_interval(interval: str) -> str:
+    """Return the stored interval an interval is resampled from.
+
+    Args:
+        interval (str): bar interval, see INTERVALS
+
+    Raises:
+        ValueError: if the interval is not supported
+
+    Returns:
+        str: "1h" or "1d"
+    """
+    try:
+        return INTERVALS[interval]
+    except KeyError:
+        raise ValueError(
+            f"unsupported interval '{interval}', choose from {list(INTERVALS)}"
+        ) from None
+
+
+def bucket_keys(index: pd.DatetimeIndex, interval: str) -> np.ndarray:
+    """Compute the bucket of every bar, bars of one bucket share a key.
+
+    Hour buckets start with the first bar of each trading day, so a 2h bucket
+    merges the 1st and 2nd, 3rd and 4th, ... hourly bar of a day. Weeks start on
+    Mondays, months and quarters on the calendar.
+
+    Args:
+        index (pd.DatetimeIndex): ascending bar timestamps
+        interval (str): target interval, coarser than its base interval
+
+    Returns:
+        np.ndarray: int64 key per bar, non-decreasing
+    """
+    days = index.values.astype("datetime64[D]").astype(np.int64)
+    if interval.endswith("h"):
+        # position of each bar within its day
+        new_day = np.r_[True, days[1:] != days[:-1]]
+        first_of_day = np.flatnonzero(new_day)
+        position = np.arange(len(days)) - first_of_day[np.cumsum(new_day) - 1]
+        return days * 24 + position // int(interval[:-1])
+    if interval == "1wk":
+        # day 0 (1970-01-01) is a Thursday, shifting by 3 days starts weeks on Monday
+        return (days + 3) // 7
+    months = index.values.astype("datetime64[M]").astype(np.int64)
+    if interval == "1mo":
+        return months
+    if interval == "3mo":
+        return months // 3
+    raise ValueError(f"cannot resample to interval '{interval}'")
+
+
+def resample_ohlc(stocks_df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """Merge bars of a base interval into bars of a coarser interval.
+
+    Each bar is labeled with the timestamp of its first base bar, like the weekly
+    and monthly bars of Yahoo Finance.
+
+    Args:
+        stocks_df (pd.DataFrame): bars of base_interval(interval) with the columns
+            Open, High, Low and Close
+        interval (str): target interval, see INTERVALS
+
+    Returns:
+        pd.DataFrame: resampled bars
+    """
+    if base_interval(interval) == interval or stocks_df.empty:
+        return stocks_df
+    keys = bucket_keys(stocks_df.index, interval)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    open_, high, low, close = ohlc_buckets(
+        stocks_df["Open"].to_numpy(),
+        stocks_df["High"].to_numpy(),
+        stocks_df["Low"].to_numpy(),
+        stocks_df["Close"].to_numpy(),
+        starts,
+    )
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close},
+        index=stocks_df.index[starts],
+    )
@@ -0,0 +1,302 @@
+"""Screen the symbol universe for indicator signals on a process pool.
+
+Every symbol is evaluated with the studies enabled in the chart settings, signals
+fire on the last bar of the requested date range:
+
+- rsi_oversold / rsi_overbought: RSI beyond the lower / upper RSI threshold
+- macd_cross_up / macd_cross_down: MACD crossed its signal line
+- sma_cross_up / sma_cross_down: close crossed the SMA
+- below_bollinger / above_bollinger: close outside the Bollinger bands
+
+Crossovers count if they happened within the last config.SCREEN_CROSS_BARS bars.
+"""
+import argparse
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from fin import config
+from fin.domain.logic.indicators import compute_indicators
+from fin.domain.logic.stocks import get_stocks_data
+from fin.domain.logic.symbols import get_symbol_table
+from fin.domain.session.usersession import default_settings, session_default
+
+# direction of each signal, bullish (1) or bearish (-1)
+SIGNALS = {
+    "rsi_oversold": 1,
+    "rsi_overbought": -1,
+    "macd_cross_up": 1,
+    "macd_cross_down": -1,
+    "sma_cross_up": 1,
+    "sma_cross_down": -1,
+    "below_bollinger": 1,
+    "above_bollinger": -1,
+}
+
+
+class ScreenResult(NamedTuple):
+    """Signals of one symbol on the last bar of the screened date range."""
+
+    ticker: str
+    date: Optional[str] = None
+    close: float = float("nan")
+    rsi: float = float("nan")
+    signals: tuple = ()
+    error: Optional[str] = None
+
+    @property
+    def score(self) -> int:
+        """Return the number of fired signals, failed symbols score -1."""
+        return -1 if self.error else len(self.signals)
+
+    @property
+    def bias(self) -> int:
+        """Return the number of bullish minus bearish signals."""
+        return sum(SIGNALS[signal] for signal in self.signals)
+
+
+def crossed(fast: np.ndarray, slow: np.ndarray, bars: int) -> int:
+    """Detect the latest crossover of two series within the last bars.
+
+    Args:
+        fast (np.ndarray): crossing series, e.g. MACD or close prices
+        slow (np.ndarray): crossed series, e.g. the signal line or SMA
+        bars (int): number of most recent bars to look at
+
+    Returns:
+        int: 1 if fast crossed above slow, -1 if below, 0 without crossover
+    """
+    valid = np.flatnonzero(~(np.isnan(fast) | np.isnan(slow)))
+    first = max(len(valid) - bars - 1, 0)
+    valid = valid[first:]
+    if len(valid) < 2:
+        return 0
+    changes = np.diff((fast[valid] > slow[valid]).astype(np.int8))
+    changes = changes[changes != 0]
+    return int(changes[-1]) if len(changes) else 0
+
+
+def rsi_signals(rsi: float, rsi_lower: float, rsi_upper: float) -> List[str]:
+    """Return the RSI signal fired by an RSI value.
+
+    The session defaults keep the overbought threshold in rsi_lower (70) and the
+    oversold one in rsi_upper (30), so the thresholds are accepted in either order.
+    """
+    oversold, overbought = sorted([float(rsi_lower), float(rsi_upper)])
+    if rsi <= oversold:
+        return ["rsi_oversold"]
+    if rsi >= overbought:
+        return ["rsi_overbought"]
+    return []
+
+
+def evaluate(
+    ticker: str,
+    stocks_df: pd.DataFrame,
+    settings_dict: Dict,
+    cross_bars: int = config.SCREEN_CROSS_BARS,
+) -> ScreenResult:
+    """Evaluate the signals of one symbol on its last bar.
+
+    Args:
+        ticker (str): ticker symbol
+        stocks_df (pd.DataFrame): stock data as returned by get_stocks_data
+        settings_dict (Dict): chart settings selecting the studies and parameters
+        cross_bars (int): number of most recent bars crossovers are looked for in
+
+    Returns:
+        ScreenResult: signals of the symbol
+    """
+    if stocks_df.empty:
+        return ScreenResult(ticker, error="no data")
+    close = stocks_df["Close"].to_numpy(dtype=float)
+    studies = compute_indicators(close, settings_dict)
+    signals = []
+    rsi = float("nan")
+
+    if "rsi" in studies:
+        rsi = float(studies["rsi"]["rsi"][-1])
+        signals += rsi_signals(
+            rsi, settings_dict["rsi_lower_state"], settings_dict["rsi_upper_state"]
+        )
+    crossings = []
+    if "macd" in studies:
+        crossings.append(("macd", studies["macd"]["macd"], studies["macd"]["signal"]))
+    if "sma" in studies:
+        crossings.append(("sma", close, studies["sma"]["sma"]))
+    for study, fast, slow in crossings:
+        direction = crossed(fast, slow, cross_bars)
+        if direction:
+            signals.append(f"{study}_cross_{'up' if direction > 0 else 'down'}")
+    if "bollinger" in studies:
+        if close[-1] < studies["bollinger"]["lower"][-1]:
+            signals.append("below_bollinger")
+        elif close[-1] > studies["bollinger"]["upper"][-1]:
+            signals.append("above_bollinger")
+
+    return ScreenResult(
+        ticker,
+        date=stocks_df.index[-1].strftime("%Y-%m-%d"),
+        close=float(close[-1]),
+        rsi=rsi,
+        signals=tuple(signals),
+    )
+
+
+def screen_tickers(
+    tickers: Sequence[str], settings_dict: Dict, date_start: str, date_end: str
+) -> List[ScreenResult]:
+    """Evaluate several symbols, runs in a worker process of screen.
+
+    Failing symbols are reported by their result instead of failing the whole chunk.
+    """
+    results = []
+    for ticker in tickers:
+        try:
+            stocks_df = get_stocks_data(ticker, date_start, date_end)
+            results.append(evaluate(ticker, stocks_df, settings_dict))
+        except Exception as error:
+            results.append(
+                ScreenResult(ticker, error=f"{type(error).__name__}: {error}")
+            )
+    return results
+
+
+def universe(etf: bool = None) -> List[str]:
+    """Return all real (non-test) issues of the symbol table.
+
+    Args:
+        etf (bool, optional): keep only ETFs (True) or only non-ETFs (False)
+
+    Returns:
+        List[str]: ticker symbols in symbol table order
+    """
+    table = get_symbol_table()
+    return table.symbols(table.mask(etf=etf, test_issue=False)).tolist()
+
+
+def screen(
+    tickers: Sequence[str],
+    settings_dict: Dict,
+    date_start: str,
+    date_end: str,
+    max_workers: int = config.SCREEN_WORKERS,
+    chunk_size: int = config.SCREEN_CHUNK_SIZE,
+) -> Iterator[List[ScreenResult]]:
+    """Evaluate symbols on a process pool and yield results as they complete.
+
+    Symbols are sent to the workers in chunks of chunk_size, so the pool is not
+    slowed down by one round trip per symbol. The workers read the stock data
+    through their own OHLC store, which shares the partitions on disk.
+
+    Args:
+        tickers (Sequence[str]): ticker symbols to screen
+        settings_dict (Dict): chart settings selecting the studies and parameters
+        date_start (str): include only dates later than date_start
+        date_end (str): include only dates earlier than date_end
+        max_workers (int): number of worker processes
+        chunk_size (int): number of symbols per task
+
+    Yields:
+        List[ScreenResult]: results of one chunk, in order of completion
+    """
+    chunks = []
+    for start in range(0, len(tickers), chunk_size):
+        end = start + chunk_size
+        chunks.append(list(tickers[start:end]))
+    if not chunks:
+        return
+    context = multiprocessing.get_context(config.PROCESS_START_METHOD)
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers, len(chunks)), mp_context=context
+    ) as pool:
+        futures = [
+            pool.submit(screen_tickers, chunk, settings_dict, date_start, date_end)
+            for chunk in chunks
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # stop scheduling chunks if the consumer stops early
+            for future in futures:
+                future.cancel()
+
+
+def rank(
+    results: Iterable[ScreenResult], top: int = config.SCREEN_TOP
+) -> List[ScreenResult]:
+    """Return the top results with at least one signal.
+
+    Results are ranked by their number of signals, ties by how far the RSI is off
+    its neutral value of 50.
+
+    Args:
+        results (Iterable[ScreenResult]): screened symbols
+        top (int): maximum number of returned results
+
+    Returns:
+        List[ScreenResult]: best results first
+    """
+    return heapq.nlargest(
+        top,
+        (result for result in results if result.score > 0),
+        key=lambda result: (result.score, np.nan_to_num(abs(result.rsi - 50))),
+    )
+
+
+def format_result(result: ScreenResult) -> str:
+    """Format a result as one line of the CLI output."""
+    return (
+        f"{result.ticker:<8}{result.date:>12}{result.close:>12.2f}"
+        f"{result.rsi:>8.1f}  {', '.join(result.signals)}"
+    )
+
+
+def main(argv: List[str] = None):
+    """Screen the universe from the command line.
+
+    Run with `python -m fin.domain.logic.stocks screen [--help]`. Symbols with
+    signals are printed as soon as their chunk completes, the ranking follows when
+    all symbols are screened.
+
+    Args:
+        argv (List[str], optional): command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(prog="screen", description=__doc__.splitlines()[0])
+    parser.add_argument("tickers", nargs="*", help="defaults to the whole universe")
+    parser.add_argument("--start", default=session_default.start_date)
+    parser.add_argument("--end", default=session_default.end_date)
+    etf = parser.add_mutually_exclusive_group()
+    etf.add_argument("--etf", dest="etf", action="store_true", default=None)
+    etf.add_argument("--no-etf", dest="etf", action="store_false")
+    parser.add_argument("--limit", type=int, help="screen only the first symbols")
+    parser.add_argument("--top", type=int, default=config.SCREEN_TOP)
+    parser.add_argument("--workers", type=int, default=config.SCREEN_WORKERS)
+    parser.add_argument("--rsi-lower", type=float, default=session_default.rsi_lower)
+    parser.add_argument("--rsi-upper", type=float, default=session_default.rsi_upper)
+    args = parser.parse_args(argv)
+
+    tickers = args.tickers or universe(etf=args.etf)
+    tickers = tickers[: args.limit]
+    settings_dict = dict(
+        default_settings(),
+        rsi_lower_state=args.rsi_lower,
+        rsi_upper_state=args.rsi_upper,
+    )
+
+    results: List[ScreenResult] = []
+    for chunk in screen(tickers, settings_dict, args.start, args.end, args.workers):
+        results += chunk
+        for result in chunk:
+            if result.score > 0:
+                print(f"[{len(results)}/{len(tickers)}] {format_result(result)}")
+
+    failed = sum(result.error is not None for result in results)
+    print(f"\nScreened {len(results)} symbols, {failed} without data.")
+    for position, result in enumerate(rank(results, args.top), start=1):
+        print(f"{position:>4} {format_result(result)}")
@@ -0,0 +1,210 @@
+"""Size-bounded cache in a SQLite file shared by all processes of a host."""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from fin import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    tag TEXT,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_tag ON entries (tag);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    process TEXT PRIMARY KEY,
+    snapshot TEXT NOT NULL
+);
+"""
+
+# access times are only refreshed if older than this many seconds, which saves a
+# write for most hits on popular entries
+ACCESS_RESOLUTION = 1.0
+
+
+class SQLiteCache:
+    """A least recently used cache of strings, shared by processes through SQLite.
+
+    The database runs in WAL mode, so readers of all web server workers proceed
+    while one of them writes. Entries expire ttl seconds after they were created
+    and the least recently used entries are evicted once the values exceed
+    max_bytes. Entries can be tagged (e.g. by ticker symbol) and invalidated by tag
+    from any process. The file also keeps token buckets limiting the rate of all
+    processes together, see take_token, and the metrics of every process, see
+    publish_metrics.
+
+    Args:
+        path (Union[str, Path]): database file, created if missing
+        max_bytes (int): maximum total size of the cached values
+        ttl (float): seconds until an entry expires
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = config.SHARED_CACHE_PATH,
+        max_bytes: int = config.SHARED_CACHE_MAX_BYTES,
+        ttl: float = config.FIGURE_CACHE_TTL,
+    ):
+        """Generate a cache instance."""
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        # connections can neither be shared by threads nor survive a fork
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread and process."""
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(
+                str(self.path), timeout=30, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the value of key or None if it is missing or expired."""
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, created, accessed FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created, accessed = row
+        now = time.time()
+        if now - created > self.ttl:
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        if now - accessed > ACCESS_RESOLUTION:
+            connection.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return value
+
+    def set(self, key: str, value: str, tag: str = None):
+        """Store value under key and evict entries beyond the size limit.
+
+        Args:
+            key (str): cache key
+            value (str): cached value
+            tag (str, optional): group of entries invalidated together
+        """
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, tag, value, len(value), now, now),
+            )
+            connection.execute(
+                "DELETE FROM entries WHERE created < ?", (now - self.ttl,)
+            )
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Drop least recently used entries until the values fit max_bytes."""
+        (total,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM entries ORDER BY accessed"
+        ):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def invalidate(self, tag: str = None):
+        """Drop all entries of tag, or all entries if None."""
+        if tag is None:
+            self._connection().execute("DELETE FROM entries")
+        else:
+            self._connection().execute("DELETE FROM entries WHERE tag = ?", (tag,))
+
+    def take_token(self, name: str, rate: float, burst: int) -> float:
+        """Take a token of the bucket name, shared by all processes.
+
+        Missing tokens are reserved in advance, like TokenBucket.acquire does, the
+        caller waits the returned seconds before using it.
+
+        Args:
+            name (str): name of the bucket, e.g. of the limited provider
+            rate (float): tokens added per second
+            burst (int): maximum number of stored tokens
+
+        Returns:
+            float: seconds until the token is available
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = connection.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (name,)
+            ).fetchone()
+            tokens = float(burst)
+            if row is not None:
+                tokens = min(burst, row[0] + max(now - row[1], 0.0) * rate)
+            tokens -= 1
+            connection.execute(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (name, tokens, now)
+            )
+        return max(0.0, -tokens / rate)
+
+    def publish_metrics(self, process: str, snapshot: str):
+        """Store the serialized metrics of a process, replacing its last snapshot.
+
+        Snapshots are neither expired nor evicted, so the counts of exited processes
+        stay part of the totals until clear_metrics is called.
+
+        Args:
+            process (str): identifier of the process, unique among all processes
+                sharing the file
+            snapshot (str): serialized metrics of the process
+        """
+        self._connection().execute(
+            "INSERT OR REPLACE INTO metrics VALUES (?, ?)", (process, snapshot)
+        )
+
+    def metric_snapshots(self, exclude: str = None) -> List[str]:
+        """Return the metrics published by all processes except exclude."""
+        rows = self._connection().execute(
+            "SELECT snapshot FROM metrics WHERE process != ?", (exclude or "",)
+        )
+        return [snapshot for (snapshot,) in rows]
+
+    def clear_metrics(self):
+        """Drop the metrics of all processes, e.g. when the server starts."""
+        self._connection().execute("DELETE FROM metrics")
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of entries and the total size of their values."""
+        count, size = (
+            self._connection()
+            .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries")
+            .fetchone()
+        )
+        return {"size": count, "bytes": size}
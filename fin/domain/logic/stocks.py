@@ -1,112 +1,247 @@
 """Load and visualize stock market data."""
-from datetime import date
+import sys
+import time
+from datetime import date, timedelta
+from functools import partial
 from ftplib import FTP
-from typing import Dict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Union
 
-import cufflinks as cf
-import joblib
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.offline as plyo
-import yfinance as yf
-from pylab import mpl, plt
 
-from fin import config
+from fin import config, metrics
+from fin.domain.logic.datastore import OHLCStore
+from fin.domain.logic.downsample import (
+    bucket_starts,
+    lttb_indices,
+    ohlc_buckets,
+    resolution_segments,
+)
+from fin.domain.logic.gateway import FetchGateway
+from fin.domain.logic.indicators import compute_indicators
+from fin.domain.logic.providers import (
+    MarketDataProvider,
+    YFinanceProvider,
+    get_provider,
+)
+from fin.domain.logic.resample import INTERVAL_LABELS, base_interval, resample_ohlc
+from fin.domain.logic.shared_cache import SQLiteCache
+from fin.domain.logic.symbol_directory import (
+    SymbolDiff,
+    connect_nasdaq_ftp,
+    refresh_symbol_directory,
+)
+from fin.domain.logic.symbols import SymbolTable, build_symbol_table
 from fin.domain.session.usersession import session_default
 
-plt.style.use("seaborn")
-mpl.rcParams["font.family"] = "serif"
-
 # activate plotly only in a notebook environment
 try:
     get_ipython  # type: ignore
+    import plotly.offline as plyo
+
     plyo.init_notebook_mode(connected=True)
     print("Plotly activated.")
 except NameError:
     pass
 
 
+def request_stocks_data(
+    ticker_symbol: str, date_start: str, date_end: str
+) -> pd.DataFrame:
+    """Request stock market DataFrame from Yahoo Finance using yfinance.
+
+    Args:
+        ticker_symbol (str): ticker symbol string used to request market data
+        date_start (str): include only dates later than date_start
+        date_end (str): include only dates earlier than date_end
+
+    Returns:
+        pd.DataFrame: DataFrame containing stock data
+    """
+    return YFinanceProvider().fetch(ticker_symbol, date_start, date_end)
+
+
+# local OHLC partitions, only missing date ranges are requested from the configured
+# provider, each provider keeps its own partitions. Daily and hourly bars are
+# stored, all other intervals are resampled from them. Upstream calls pass through
+# the gateway, which coalesces, batches and rate limits them. The rate limit is
+# shared by all processes through the shared cache
+market_data_provider = get_provider()
+fetch_gateway = FetchGateway(
+    market_data_provider,
+    shared=SQLiteCache() if config.SHARED_CACHE_PATH else None,
+)
+ohlc_store = OHLCStore(
+    fetch=fetch_gateway,
+    folder=config.OHLC_FOLDER / market_data_provider.name,
+)
+intraday_store = OHLCStore(
+    fetch=partial(fetch_gateway, interval="1h"),
+    folder=config.OHLC_FOLDER / market_data_provider.name / "1h",
+)
+
+
 def get_stocks_data(
-    ticker_symbol: str = session_default.ticker[0],
+    ticker_symbol: str = None,
     date_start: str = session_default.start_date,
     date_end: str = session_default.end_date,
+    interval: str = session_default.interval,
 ) -> pd.DataFrame:
-    """Request stock market DataFrame using yfinance.
+    """Load stock market DataFrame through the local OHLC store.
+
+    Only daily ("1d") and hourly ("1h") bars are requested upstream, coarser bars
+    are resampled from the stored bars, see fin.domain.logic.resample. Hourly bars
+    start no earlier than the provider serves them, see intraday_start.
 
     Args:
-        ticker_symbol (str): ticker symbol string used to request market data
+        ticker_symbol (str): ticker symbol string used to request market data,
+            defaults to the first available ticker symbol
         date_start (str): include only dates later than date_start
         date_end (str): include only dates earlier than date_end
+        interval (str): bar interval, one of resample.INTERVALS
 
     Returns:
         pd.DataFrame: DataFrame containing stock data
     """
-    stocks_df = (
-        yf.Ticker(ticker_symbol)
-        .history(start=date_start, end=date_end, interval="1d")
-        .drop(columns=["Volume", "Dividends", "Stock Splits"])
+    if ticker_symbol is None:
+        ticker_symbol = session_default.ticker[0]
+    if base_interval(interval) == "1h":
+        store = intraday_store
+        date_start = max(date_start, intraday_start())
+    else:
+        store = ohlc_store
+    stocks_df = store.read(ticker_symbol, date_start, date_end)
+    return resample_ohlc(stocks_df, interval)
+
+
+def intraday_start(provider: MarketDataProvider = market_data_provider) -> str:
+    """Return the first day hourly bars are served for by provider.
+
+    Yahoo Finance, e.g., rejects requests of hourly bars older than 730 days.
+
+    Args:
+        provider (MarketDataProvider): provider of the hourly bars
+
+    Returns:
+        str: ISO date, "" if hourly bars of any day are served
+    """
+    if provider.intraday_days is None:
+        return ""
+    return str(date.today() - timedelta(days=provider.intraday_days - 1))
+
+
+# chart colors derived from the cufflinks "pearl" theme used so far
+THEME = {
+    "background": "#F5F6F9",
+    "font": "#4D5663",
+    "grid": "#E1E5ED",
+    "line": "rgba(55, 128, 191, 1.0)",
+    "signal": "rgba(219, 64, 82, 1.0)",
+    "up": "#17BECF",
+    "down": "#808080",
+}
+
+
+# checklist setting of each study
+STUDY_CHECKS = {
+    "bollinger": "bollinger_check_state",
+    "macd": "macd_check_state",
+    "rsi": "rsi_check_state",
+    "sma": "sma_check_state",
+}
+
+
+def with_all_studies(settings_dict: Dict) -> Dict:
+    """Return chart settings with every study selected.
+
+    The web app renders all studies once and toggles them in the browser, see
+    SHOW_STUDIES_JS, so the figure does not depend on the study checklists.
+    """
+    return dict(
+        settings_dict,
+        **{key: getattr(session_default, key[:-6]) for key in STUDY_CHECKS.values()},
     )
 
-    return stocks_df
 
+def _panel_domains(n_panels: int) -> Dict[str, Dict]:
+    """Compute y axis domains: price panel on top, one panel per lower study.
 
-def stocks_chart(
-    stock_data: pd.DataFrame = None, settings_dict: Dict = None
-) -> go.Figure:
-    """Generate plotly finance chart.
+    Mirrors cufflinks.QuantFig panel arrangement (min_panel_size=.15, spacing=.08).
 
     Args:
-        stocks_data (pd.DataFrame): stock data derived from yf
-        settings (Dict): settings derived from the UI
+        n_panels (int): number of panels including the price panel
 
     Returns:
-        go.Figure: final stock chart
+        Dict[str, Dict]: layout settings per y axis, price panel is "yaxis2"
     """
-    # setting default values
-    data = get_stocks_data() if stock_data is None else stock_data
-    if settings_dict is None:
-        settings_dict = {
-            key + "_state": value for key, value in session_default.__dict__.items()
+    domains = {}
+    for axis in range(n_panels + 1, 1, -1):
+        lower = round((0.15 + 0.08) * (n_panels + 1 - axis), 2)
+        domains[f"yaxis{axis}"] = dict(domain=[lower, lower + 0.15])
+    domains["yaxis2"]["domain"][1] = 0.9
+    return domains
+
+
+# clientside function showing the studies selected by checks, {study: bool}, in a
+# figure of stocks_chart. Traces are matched by their meta.study tag, the remaining
+# lower panels are stacked like _panel_domains does
+SHOW_STUDIES_JS = """
+function(figure, checks) {
+    var panels = (figure.layout.meta || {}).panels;
+    if (!panels) {
+        return figure;
+    }
+    var data = figure.data.map(function(trace) {
+        var study = (trace.meta || {}).study;
+        if (checks[study] === undefined) {
+            return trace;
         }
-        settings_dict["ticker_dropdown_state"] = settings_dict["ticker"][0]
-    # extract chart settings from settings_dict
-
-    # if  UI checklists were deselected settings_dict values are empty lists
-    add_boll_feature = bool(len(settings_dict["bollinger_check_state"]))
-    add_macd_feature = bool(len(settings_dict["macd_check_state"]))
-    add_rsi_feature = bool(len(settings_dict["rsi_check_state"]))
-    add_sma_feature = bool(len(settings_dict["sma_check_state"]))
-
-    # initialize QuantFig chart figure
-    qf = cf.QuantFig(data, title=settings_dict["ticker_dropdown_state"], legend="right")
-
-    if add_boll_feature is True:
-        qf.add_bollinger_bands(
-            periods=settings_dict["bollinger_periods_state"],
-            boll_std=settings_dict["boll_std_state"],
-        )
+        return Object.assign({}, trace, {visible: checks[study]});
+    });
+    var layout = Object.assign({}, figure.layout);
+    var shown = panels.filter(function(panel) { return checks[panel[1]]; });
+    var round = function(v) { return Math.round(v * 100) / 100; };
+    var price = [round(0.23 * shown.length), 0.9];
+    layout.yaxis2 = Object.assign({}, layout.yaxis2, {domain: price});
+    panels.forEach(function(panel) {
+        var position = shown.indexOf(panel);
+        var lower = round(0.23 * (shown.length - 1 - position));
+        layout[panel[0]] = Object.assign({}, layout[panel[0]], position < 0
+            ? {visible: false, domain: price}
+            : {visible: true, domain: [lower, lower + 0.15]});
+    });
+    return {data: data, layout: layout};
+}
+"""
+
+
+def _x_values(index: pd.DatetimeIndex) -> np.ndarray:
+    """Format chart x values as date strings.
+
+    Plotly deep-copies and converts Timestamp objects element by element, whereas
+    plain strings are passed through and serialize to shorter JSON.
+    """
+    if (index == index.normalize()).all():
+        return index.strftime("%Y-%m-%d").to_numpy()
+    return index.strftime("%Y-%m-%d %H:%M").to_numpy()
 
-    if add_macd_feature is True:
-        qf.add_macd(
-            fast_period=settings_dict["macd_fast_period_state"],
-            slow_period=settings_dict["macd_slow_period_state"],
-            signal_period=settings_dict["macd_signal_period_state"],
-        )
 
-    if add_rsi_feature is True:
-        qf.add_rsi(
-            periods=settings_dict["rsi_periods_state"],
-            rsi_lower=settings_dict["rsi_lower_state"],
-            rsi_upper=settings_dict["rsi_upper_state"],
-        )
+def _line_trace(x, y, name: str, yaxis: str, **kwargs) -> go.Scatter:
+    """Generate a study line trace."""
+    line = dict(color=THEME["line"], dash="solid", shape="linear", width=1.3)
+    line.update(kwargs.pop("line", {}))
+    return go.Scatter(
+        x=x, y=y, name=name, yaxis=yaxis, mode="lines", line=line, **kwargs
+    )
 
-    if add_sma_feature is True:
-        qf.add_sma(periods=settings_dict["sma_periods_state"])
 
-    # cast QuantFig object to plotly figure
-    qf_fig = qf.figure()
+def _time_slider(index: pd.DatetimeIndex) -> Dict:
+    """Generate the x axis settings with range selector and range slider.
 
-    # add time slider to figure
+    Nights and weekends are hidden if the bars are intraday bars.
+    """
     slider_dict = dict(
         rangeselector=dict(
             buttons=list(
@@ -122,71 +257,316 @@ def stocks_chart(
         rangeslider=dict(visible=True),
         type="date",
     )
-    qf_fig.update_layout(xaxis=slider_dict)
+    if len(index) and (index != index.normalize()).any():
+        slider_dict["rangebreaks"] = [
+            dict(bounds=["sat", "mon"]),
+            dict(bounds=[16, 9.5], pattern="hour"),
+        ]
+    return slider_dict
 
-    return qf_fig
 
+def stocks_chart(
+    stock_data: pd.DataFrame = None,
+    settings_dict: Dict = None,
+    x_range: Tuple[str, str] = None,
+    max_points: int = config.CHART_MAX_POINTS,
+) -> go.Figure:
+    """Generate plotly finance chart.
 
-def persist_figure(qf_fig: go.Figure, ticker: yf.Ticker):
-    """Generate plot from QuantFig and store resulting chart as HTML file.
+    Studies are computed on the full stock data, afterwards every trace is
+    downsampled to at most max_points points: lines using LTTB, candles by merging
+    them into OHLC buckets. If x_range is given, that window is shown in full
+    resolution (or downsampled to max_points), the remaining data only coarsely.
 
     Args:
-        ticker (yf.Ticker): yfinance ticker symbol, from that qf was derived
-        qf (cf.QuantFig): QuantFig object which contains chart data
+        stocks_data (pd.DataFrame): stock data derived from yf
+        settings (Dict): settings derived from the UI
+        x_range (Tuple[str, str], optional): first and last date zoomed in
+        max_points (int): maximum number of points per trace and segment
+
+    Returns:
+        go.Figure: final stock chart
     """
-    # plot figure
-    qf_fig.show()
+    # setting default values
+    data = get_stocks_data() if stock_data is None else stock_data
+    if settings_dict is None:
+        settings_dict = session_default.to_settings()
+        settings_dict["ticker_dropdown_state"] = session_default.ticker[0]
+
+    # compute all selected studies in one pass over the close prices
+    with metrics.span("indicators"):
+        studies = compute_indicators(data["Close"].to_numpy(), settings_dict)
+    build_start = time.perf_counter()
+    x = _x_values(data.index)
+    window = None
+    if x_range is not None:
+        window = (
+            data.index.searchsorted(pd.Timestamp(x_range[0])),
+            data.index.searchsorted(pd.Timestamp(x_range[1]), side="right"),
+        )
+    segments = resolution_segments(len(data), window, max_points)
 
-    # store interactive HTML file
-    qf_fig.write_html(f"""{ticker}_quantFig_{date.today().strftime("%Y_%m_%d")}.html""")
-
-
-def load_ticker_data():
-    """Load NASDAQ ticker information from ftp.nasdaqtrader.com FTP server."""
-    # Create FTP connection, move to specific dir
-    ftp = FTP("ftp.nasdaqtrader.com")
-    ftp.login()
-    ftp.cwd("symboldirectory")
-
-    # read & store files from FTP server locally
-    try:
-        with open(config.DATA_API / "nasdaqlisted.csv", "wb") as fh:
-            ftp.retrbinary("RETR nasdaqlisted.txt", fh.write)
-    except Exception:
-        print("Failed loading nasdaqlisted.txt")
-    try:
-        with open(config.DATA_API / "otherlisted.csv", "wb") as fh:
-            ftp.retrbinary("RETR otherlisted.txt", fh.write)
-    except Exception:
-        print("Failed loading otherlisted.txt")
-
-
-def extract_ticker_symbols():
-    """Generate and store ticker symbol list from raw data."""
-    # sep: separate cols by "|"
-    # skipfooter: rm processing information on last line
-    # usecols: use only ticker symbols
-    nasdaq_listed = pd.read_csv(
-        config.DATA_API / "nasdaqlisted.csv",
-        sep="|",
-        skipfooter=1,
-        usecols=["Symbol"],
+    def reduced(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Downsample a study line using LTTB per resolution segment."""
+        positions = np.concatenate(
+            [np.arange(0)]
+            + [lttb_indices(values[lo:hi], n) + lo for lo, hi, n in segments]
+        )
+        return x[positions], values[positions]
+
+    # constant band lines only need their end points
+    band_x = x[[0, -1]] if len(x) else x
+    traces = []
+    # price panel is y2, each lower study (MACD, RSI) gets its own panel below
+    n_panels = 1
+    # y axis of each lower study panel, top to bottom
+    panels = []
+
+    if "bollinger" in studies:
+        boll = studies["bollinger"]
+        name = f"BOLL(Close,{settings_dict['bollinger_periods_state']})"
+        boll_kwargs = dict(legendgroup=name, showlegend=False)
+        traces += [
+            _line_trace(
+                *reduced(boll["sma"]),
+                name,
+                "y2",
+                legendgroup=name,
+                showlegend=True,
+                meta=dict(study="bollinger", line="sma"),
+            ),
+            _line_trace(
+                *reduced(boll["upper"]),
+                f"UPPER(Close,{settings_dict['bollinger_periods_state']})",
+                "y2",
+                line=dict(color="rgba(55, 128, 191, 0.9)"),
+                meta=dict(study="bollinger", line="upper"),
+                **boll_kwargs,
+            ),
+            _line_trace(
+                *reduced(boll["lower"]),
+                f"LOWER(Close,{settings_dict['bollinger_periods_state']})",
+                "y2",
+                line=dict(color="rgba(55, 128, 191, 0.8)"),
+                fill="tonexty",
+                fillcolor="rgba(55, 128, 191, 0.1)",
+                meta=dict(study="bollinger", line="lower"),
+                **boll_kwargs,
+            ),
+        ]
+
+    if "macd" in studies:
+        n_panels += 1
+        yaxis = f"y{n_panels + 1}"
+        panels.append((f"yaxis{n_panels + 1}", "macd"))
+        traces += [
+            _line_trace(
+                *reduced(studies["macd"]["macd"]),
+                "MACD([{},{}])".format(
+                    settings_dict["macd_fast_period_state"],
+                    settings_dict["macd_slow_period_state"],
+                ),
+                yaxis,
+                meta=dict(study="macd", line="macd"),
+            ),
+            _line_trace(
+                *reduced(studies["macd"]["signal"]),
+                f"MACD SIGNAL({settings_dict['macd_signal_period_state']})",
+                yaxis,
+                line=dict(color=THEME["signal"]),
+                meta=dict(study="macd", line="signal"),
+            ),
+        ]
+
+    if "rsi" in studies:
+        n_panels += 1
+        yaxis = f"y{n_panels + 1}"
+        panels.append((f"yaxis{n_panels + 1}", "rsi"))
+        name = f"RSI(Close,{settings_dict['rsi_periods_state']})"
+        band_line = dict(width=1, dash=None, shape=None)
+        traces += [
+            _line_trace(
+                *reduced(studies["rsi"]["rsi"]),
+                name,
+                yaxis,
+                legendgroup=name,
+                meta=dict(study="rsi", line="rsi"),
+            ),
+            _line_trace(
+                band_x,
+                np.full(len(band_x), settings_dict["rsi_lower_state"]),
+                "",
+                yaxis,
+                legendgroup=name,
+                line=dict(band_line, color=THEME["down"]),
+                meta=dict(study="rsi", line="lower_band"),
+            ),
+            _line_trace(
+                band_x,
+                np.full(len(band_x), settings_dict["rsi_upper_state"]),
+                "",
+                yaxis,
+                legendgroup=name,
+                line=dict(band_line, color=THEME["up"]),
+                meta=dict(study="rsi", line="upper_band"),
+            ),
+        ]
+
+    if "sma" in studies:
+        traces.append(
+            _line_trace(
+                *reduced(studies["sma"]["sma"]),
+                f"SMA({settings_dict['sma_periods_state']})",
+                "y2",
+                meta=dict(study="sma", line="sma"),
+            )
+        )
+
+    # candlesticks are drawn last so they stay on top of the overlays
+    starts = np.concatenate(
+        [np.arange(0, dtype=int)] + [bucket_starts(lo, hi, n) for lo, hi, n in segments]
+    )
+    open_, high, low, close = ohlc_buckets(
+        data["Open"].to_numpy(),
+        data["High"].to_numpy(),
+        data["Low"].to_numpy(),
+        data["Close"].to_numpy(),
+        starts,
+    )
+    traces.append(
+        go.Candlestick(
+            x=x[starts],
+            open=open_,
+            high=high,
+            low=low,
+            close=close,
+            name=settings_dict["ticker_dropdown_state"],
+            yaxis="y2",
+            meta=dict(study="ohlc"),
+            increasing=dict(line=dict(color=THEME["up"])),
+            decreasing=dict(line=dict(color=THEME["down"])),
+        )
+    )
+
+    # add time slider to figure
+    slider_dict = _time_slider(data.index)
+    interval = settings_dict.get("interval_state", "1d")
+    title = settings_dict["ticker_dropdown_state"]
+    if interval != "1d":
+        title += f" ({INTERVAL_LABELS[interval]})"
+    axis_style = dict(
+        gridcolor=THEME["grid"],
+        showgrid=True,
+        tickfont=dict(color=THEME["font"]),
+        zerolinecolor=THEME["grid"],
     )
-    other_listed = pd.read_csv(
-        config.DATA_API / "otherlisted.csv",
-        sep="|",
-        skipfooter=1,
-        usecols=["ACT Symbol"],
-    ).rename(columns={"ACT Symbol": "Symbol"})
-
-    # store ticker list locally
-    tickers_list = list(
-        pd.concat([nasdaq_listed, other_listed], axis=0).Symbol.unique()
+    layout = dict(
+        legend=dict(bgcolor=THEME["background"], font=dict(color=THEME["font"])),
+        margin=dict(b=30, l=30, r=30, t=30),
+        paper_bgcolor=THEME["background"],
+        plot_bgcolor=THEME["background"],
+        showlegend=True,
+        title=dict(text=title, font=dict(color=THEME["font"])),
+        xaxis=dict(anchor="y2", **axis_style, **slider_dict),
+        # keep the user's zoom when the figure is replaced in a higher resolution
+        uirevision=settings_dict["ticker_dropdown_state"],
+        # lower study panels, rearranged when studies are toggled in the browser
+        meta=dict(panels=panels),
     )
-    joblib.dump(tickers_list, config.DATA_API / "tickers_list.lzma")
+    for axis, domain in _panel_domains(n_panels).items():
+        layout[axis] = dict(axis_style, **domain)
+
+    fig = go.Figure(data=traces, layout=layout)
+    metrics.spans.observe("figure", time.perf_counter() - build_start)
+    return fig
+
+
+def persist_figure(
+    qf_fig: go.Figure,
+    ticker: str,
+    folder: Path = Path("."),
+    include_plotlyjs: Union[bool, str] = True,
+) -> Path:
+    """Store chart figure as HTML file, without showing it.
+
+    Args:
+        qf_fig (go.Figure): chart figure generated by stocks_chart
+        ticker (str): ticker symbol, from that qf_fig was derived
+        folder (Path): folder the HTML file is written to
+        include_plotlyjs (Union[bool, str]): True embeds plotly.js, "directory"
+            references a plotly.min.js next to the file, see go.Figure.write_html
+
+    Returns:
+        Path: path of the HTML file
+    """
+    # store interactive HTML file
+    file_name = f"{ticker}_quantFig_{date.today().strftime('%Y_%m_%d')}.html"
+    path = Path(folder) / file_name
+    qf_fig.write_html(str(path), include_plotlyjs=include_plotlyjs)
+    return path
+
+
+def drop_symbol_data(diff: SymbolDiff):
+    """Drop stored bars and shared cached figures of added and removed symbols.
+
+    Bars of delisted symbols are no longer needed, while newly listed symbols may
+    have been requested before and remembered without bars.
+
+    Args:
+        diff (SymbolDiff): outcome of a symbol directory refresh
+    """
+    shared_cache = SQLiteCache() if config.SHARED_CACHE_PATH else None
+    for ticker in diff.added + diff.removed:
+        ohlc_store.drop(ticker)
+        intraday_store.drop(ticker)
+        if shared_cache is not None:
+            shared_cache.invalidate(ticker)
+
+
+# called with the diff of every symbol directory refresh, e.g. the web app adds
+# the invalidation of its figure cache
+symbol_listeners: List[Callable[[SymbolDiff], None]] = [drop_symbol_data]
+
+
+def load_ticker_data(ftp_factory: Callable[[], FTP] = connect_nasdaq_ftp) -> SymbolDiff:
+    """Refresh NASDAQ ticker information from ftp.nasdaqtrader.com FTP server.
+
+    Only files which changed since the last refresh are downloaded, see
+    refresh_symbol_directory. The changes are applied by symbol_listeners.
+
+    Args:
+        ftp_factory (Callable[[], FTP]): returns an FTP session opened in the symbol
+            directory
+
+    Returns:
+        SymbolDiff: added and removed symbols, downloaded and failed files
+    """
+    return refresh_symbol_directory(
+        ftp_factory, config.DATA_API, config.SYMBOL_FOLDER, symbol_listeners
+    )
+
+
+def extract_ticker_symbols() -> SymbolTable:
+    """Generate and store the symbol table from raw data.
+
+    Returns:
+        SymbolTable: symbols with name, exchange, ETF and test issue flags
+    """
+    return build_symbol_table(config.DATA_API, config.SYMBOL_FOLDER)
 
 
 if __name__ == "__main__":
-    fig_data = get_stocks_data()
-    fig = stocks_chart()
-    print("Done.")
+    if sys.argv[1:2] == ["screen"]:
+        # screen the symbol universe, see `python -m fin.domain.logic.stocks screen -h`
+        from fin.domain.logic.screener import main
+
+        main(sys.argv[2:])
+    elif sys.argv[1:2] == ["export"]:
+        # batch export of chart reports, see `... stocks export -h`
+        from fin.domain.logic.export import main
+
+        main(sys.argv[2:])
+    else:
+        fig_data = get_stocks_data()
+        fig = stocks_chart()
+        print("Done.")
@@ -0,0 +1,485 @@
+"""Sweep indicator parameters of a ticker in batched NumPy computations.
+
+Each rule is evaluated for a whole grid of two parameters at once. The parameter
+combinations form the leading array axis, broadcast against the bar axis:
+
+- sma_cross: long while the fast SMA is above the slow SMA (fast x slow periods)
+- bollinger: long from a close below the lower band until a close above the middle
+  band (periods x standard deviations)
+- macd: long while the MACD is above its signal line (fast x slow periods)
+- rsi_bands: long from an RSI below the lower band until an RSI above the upper band
+  (lower x upper band)
+
+Positions are taken on the close of the signal bar and earn the return of the
+following bar, without costs.
+"""
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from fin.domain.logic.indicators import rsi
+from fin.domain.logic.stocks import THEME, get_stocks_data
+
+# bars per year of each interval, hourly bars cover the 7 bars of a trading session
+BARS_PER_YEAR = {
+    "1h": 252 * 7,
+    "2h": 252 * 4,
+    "4h": 252 * 2,
+    "1d": 252,
+    "1wk": 52,
+    "1mo": 12,
+    "3mo": 4,
+}
+METRICS = {
+    "sharpe": "Sharpe ratio",
+    "annual_return": "Annual return",
+    "total_return": "Total return",
+    "max_drawdown": "Max. drawdown",
+    "trades": "Trades",
+    "exposure": "Exposure",
+}
+# parameter combinations evaluated per batch, bounds the memory of the
+# (combinations x bars) arrays
+BATCH_SIZE = 256
+
+
+def _window_sums(values: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    """Sum the trailing window of every bar for several window lengths.
+
+    Args:
+        values (np.ndarray): input series of n bars
+        periods (np.ndarray): p window lengths
+
+    Returns:
+        np.ndarray: (p, n) window sums, NaN until a window is complete
+    """
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = ends - periods[:, None]
+    sums = cumsum[ends] - cumsum[np.maximum(starts, 0)]
+    return np.where(starts >= 0, sums, np.nan)
+
+
+def rolling_means(values: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    """Compute simple moving averages of several window lengths.
+
+    Args:
+        values (np.ndarray): input series of n bars
+        periods (np.ndarray): p window lengths
+
+    Returns:
+        np.ndarray: (p, n) moving averages, like indicators.rolling_mean per row
+    """
+    periods = np.asarray(periods, dtype=int)
+    return _window_sums(np.asarray(values, dtype=float), periods) / periods[:, None]
+
+
+def rolling_stds(values: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    """Compute moving sample standard deviations of several window lengths.
+
+    Args:
+        values (np.ndarray): input series of n bars
+        periods (np.ndarray): p window lengths, at least 2
+
+    Returns:
+        np.ndarray: (p, n) standard deviations, like indicators.rolling_std per row
+    """
+    values = np.asarray(values, dtype=float)
+    periods = np.asarray(periods, dtype=int)[:, None]
+    # shift values towards zero to reduce cancellation in the sum of squares
+    shifted = values - values[0] if len(values) else values
+    sums = _window_sums(shifted, periods[:, 0])
+    squares = _window_sums(shifted * shifted, periods[:, 0])
+    variance = np.maximum((squares - sums * sums / periods) / (periods - 1), 0.0)
+    return np.sqrt(variance)
+
+
+def emas(values: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    """Compute exponential moving averages seeded with the first value.
+
+    The recursion runs over the bars, every step updates all series at once.
+
+    Args:
+        values (np.ndarray): input series, (n,) or one row per period (p, n)
+        periods (np.ndarray): p spans
+
+    Returns:
+        np.ndarray: (p, n) moving averages, like indicators.ema per row
+    """
+    factors = 2.0 / (np.asarray(periods, dtype=float) + 1)
+    values = np.asarray(values, dtype=float)
+    # bars on the first axis, so every step reads a contiguous row
+    columns = np.ascontiguousarray(
+        np.broadcast_to(values, (len(factors), values.shape[-1])).T
+    )
+    result = np.empty_like(columns)
+    if not len(columns):
+        return result.T
+    current = columns[0].copy()
+    result[0] = current
+    for bar in range(1, len(columns)):
+        current *= 1 - factors
+        current += columns[bar] * factors
+        result[bar] = current
+    return result.T
+
+
+def hold(entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """Hold a position from each entry bar until the next exit bar.
+
+    Args:
+        entries (np.ndarray): (k, n) bars opening a position
+        exits (np.ndarray): (k, n) bars closing a position, entries win ties
+
+    Returns:
+        np.ndarray: (k, n) True while the position is held
+    """
+    events = np.where(entries, 1, np.where(exits, 0, -1))
+    # carry the latest event forward along the bars
+    positions = np.where(events >= 0, np.arange(events.shape[-1]), -1)
+    latest = np.maximum.accumulate(positions, axis=-1)
+    state = np.take_along_axis(events, np.maximum(latest, 0), axis=-1)
+    return (latest >= 0) & (state == 1)
+
+
+def _rows(periods: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the distinct periods and the row of each period among them."""
+    unique = np.unique(periods)
+    return unique, np.searchsorted(unique, periods)
+
+
+def sma_cross_positions(
+    close: np.ndarray, fast: np.ndarray, slow: np.ndarray, settings_dict: Dict
+) -> np.ndarray:
+    """Go long while the fast SMA is above the slow SMA."""
+    periods, fast_rows = _rows(fast)
+    slow_periods, slow_rows = _rows(slow)
+    with np.errstate(invalid="ignore"):
+        return (
+            rolling_means(close, periods)[fast_rows]
+            > rolling_means(close, slow_periods)[slow_rows]
+        )
+
+
+def bollinger_positions(
+    close: np.ndarray, periods: np.ndarray, boll_std: np.ndarray, settings_dict: Dict
+) -> np.ndarray:
+    """Go long on a close below the lower band until a close above the middle band."""
+    unique, rows = _rows(periods)
+    middle = rolling_means(close, unique)[rows]
+    lower = middle - rolling_stds(close, unique)[rows] * boll_std[:, None]
+    with np.errstate(invalid="ignore"):
+        return hold(close < lower, close > middle)
+
+
+def macd_positions(
+    close: np.ndarray, fast: np.ndarray, slow: np.ndarray, settings_dict: Dict
+) -> np.ndarray:
+    """Go long while the MACD is above its signal line."""
+    periods, fast_rows = _rows(fast)
+    slow_periods, slow_rows = _rows(slow)
+    macd_lines = emas(close, periods)[fast_rows] - emas(close, slow_periods)[slow_rows]
+    signal_period = np.full(len(fast), float(settings_dict["macd_signal_period_state"]))
+    return macd_lines > emas(macd_lines, signal_period)
+
+
+def rsi_bands_positions(
+    close: np.ndarray, lower: np.ndarray, upper: np.ndarray, settings_dict: Dict
+) -> np.ndarray:
+    """Go long on an RSI below the lower band until an RSI above the upper band."""
+    rsi_values = rsi(close, int(settings_dict["rsi_periods_state"]))
+    with np.errstate(invalid="ignore"):
+        return hold(rsi_values < lower[:, None], rsi_values > upper[:, None])
+
+
+class Rule(NamedTuple):
+    """Signal rule and its default parameter grid."""
+
+    positions: Callable[[np.ndarray, np.ndarray, np.ndarray, Dict], np.ndarray]
+    x_name: str
+    y_name: str
+    x_values: np.ndarray
+    y_values: np.ndarray
+    # combinations not satisfying valid(x, y) are skipped
+    valid: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
+
+
+# about 1,000 combinations per rule with the default grids
+RULES = {
+    "sma_cross": Rule(
+        sma_cross_positions,
+        "fast SMA periods",
+        "slow SMA periods",
+        np.arange(5, 51),
+        np.arange(20, 205, 5),
+        valid=lambda fast, slow: fast < slow,
+    ),
+    "bollinger": Rule(
+        bollinger_positions,
+        "Bollinger periods",
+        "Bollinger std",
+        np.arange(10, 61),
+        np.round(np.arange(1.0, 3.05, 0.1), 1),
+    ),
+    "macd": Rule(
+        macd_positions,
+        "MACD fast periods",
+        "MACD slow periods",
+        np.arange(4, 31),
+        np.arange(10, 62, 2),
+        valid=lambda fast, slow: fast < slow,
+    ),
+    "rsi_bands": Rule(
+        rsi_bands_positions,
+        "RSI lower band",
+        "RSI upper band",
+        np.arange(10, 46),
+        np.arange(55, 91),
+    ),
+}
+
+
+def score(
+    positions: np.ndarray, close: np.ndarray, bars_per_year: int = 252
+) -> Dict[str, np.ndarray]:
+    """Score the returns of several position series.
+
+    Args:
+        positions (np.ndarray): (k, n) True while a position is held
+        close (np.ndarray): n close prices
+        bars_per_year (int): number of bars per year used to annualize
+
+    Returns:
+        Dict[str, np.ndarray]: k values per metric, see METRICS
+    """
+    returns = close[1:] / close[:-1] - 1
+    strategy = positions[:, :-1] * returns
+    log_equity = np.cumsum(np.log1p(strategy), axis=1)
+    log_growth = log_equity[:, -1] if log_equity.shape[1] else np.zeros(len(strategy))
+    drawdown = 1 - np.exp(log_equity - np.maximum.accumulate(log_equity, axis=1))
+    std = strategy.std(axis=1, ddof=1) if len(returns) > 1 else np.zeros(len(strategy))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(
+            std > 0, strategy.mean(axis=1) / std * np.sqrt(bars_per_year), 0.0
+        )
+    changes = np.diff(positions.astype(np.int8), axis=1, prepend=0)
+    return {
+        "sharpe": sharpe,
+        "annual_return": np.expm1(log_growth * bars_per_year / max(len(returns), 1)),
+        "total_return": np.expm1(log_growth),
+        "max_drawdown": drawdown.max(axis=1, initial=0.0),
+        "trades": np.count_nonzero(changes > 0, axis=1).astype(float),
+        "exposure": positions.mean(axis=1),
+    }
+
+
+class SweepResult(NamedTuple):
+    """Scores of a rule over a parameter grid."""
+
+    ticker: str
+    rule: str
+    x_values: np.ndarray
+    y_values: np.ndarray
+    # (len(y_values), len(x_values)) grid per metric, NaN for invalid combinations
+    scores: Dict[str, np.ndarray]
+    buy_and_hold: Dict[str, float]
+    bars: int
+    seconds: float
+
+    def best(self, metric: str = "sharpe") -> Tuple[float, float, float]:
+        """Return x and y parameter of the best combination and its score."""
+        grid = self.scores[metric]
+        if np.isnan(grid).all():
+            return float("nan"), float("nan"), float("nan")
+        # smaller drawdowns are better
+        pick = np.nanargmin if metric == "max_drawdown" else np.nanargmax
+        row, column = np.unravel_index(pick(grid), grid.shape)
+        return self.x_values[column], self.y_values[row], grid[row, column]
+
+    def to_dict(self) -> Dict:
+        """Return the result as JSON serializable dict, NaN scores become None."""
+        scores = {}
+        for metric, grid in self.scores.items():
+            values = grid.astype(object)
+            values[np.isnan(grid)] = None
+            scores[metric] = values.tolist()
+        return dict(
+            self._asdict(),
+            x_values=self.x_values.tolist(),
+            y_values=self.y_values.tolist(),
+            scores=scores,
+        )
+
+    @classmethod
+    def from_dict(cls, dictionary: Dict) -> "SweepResult":
+        """Restore a result serialized by to_dict."""
+        return cls(
+            **dict(
+                dictionary,
+                x_values=np.asarray(dictionary["x_values"]),
+                y_values=np.asarray(dictionary["y_values"]),
+                scores={
+                    metric: np.array(grid, dtype=float)
+                    for metric, grid in dictionary["scores"].items()
+                },
+            )
+        )
+
+
+def sweep(
+    close: np.ndarray,
+    rule: str,
+    settings_dict: Dict,
+    x_values: np.ndarray = None,
+    y_values: np.ndarray = None,
+    bars_per_year: int = 252,
+    ticker: str = "",
+) -> SweepResult:
+    """Score a signal rule for every combination of two parameter grids.
+
+    Args:
+        close (np.ndarray): close prices
+        rule (str): signal rule, see RULES
+        settings_dict (Dict): chart settings providing the parameters not swept,
+            e.g. the RSI periods of rsi_bands
+        x_values (np.ndarray, optional): first parameter grid, defaults to the grid
+            of the rule
+        y_values (np.ndarray, optional): second parameter grid, defaults to the grid
+            of the rule
+        bars_per_year (int): number of bars per year used to annualize
+        ticker (str): ticker symbol the close prices belong to
+
+    Raises:
+        ValueError: if the rule is unknown or there are no close prices
+
+    Returns:
+        SweepResult: scores per metric and parameter combination
+    """
+    if rule not in RULES:
+        raise ValueError(f"unknown rule '{rule}', choose from {list(RULES)}")
+    close = np.asarray(close, dtype=float)
+    if not len(close):
+        raise ValueError(f"no close prices of {ticker or 'the ticker'} to sweep")
+    start = time.perf_counter()
+    spec = RULES[rule]
+    x_values = spec.x_values if x_values is None else np.asarray(x_values)
+    y_values = spec.y_values if y_values is None else np.asarray(y_values)
+
+    # flatten the grid into one combination axis, y major like the heatmap rows
+    xs, ys = (grid.ravel() for grid in np.meshgrid(x_values, y_values))
+    combinations = np.flatnonzero(
+        np.ones(len(xs), dtype=bool) if spec.valid is None else spec.valid(xs, ys)
+    )
+    scores = {metric: np.full(len(xs), np.nan) for metric in METRICS}
+    for first in range(0, len(combinations), BATCH_SIZE):
+        last = first + BATCH_SIZE
+        batch = combinations[first:last]
+        positions = spec.positions(close, xs[batch], ys[batch], settings_dict)
+        for metric, values in score(positions, close, bars_per_year).items():
+            scores[metric][batch] = values
+    buy_and_hold = score(np.ones((1, len(close)), dtype=bool), close, bars_per_year)
+
+    shape = (len(y_values), len(x_values))
+    return SweepResult(
+        ticker,
+        rule,
+        x_values,
+        y_values,
+        {metric: values.reshape(shape) for metric, values in scores.items()},
+        {metric: float(values[0]) for metric, values in buy_and_hold.items()},
+        len(close),
+        time.perf_counter() - start,
+    )
+
+
+def sweep_ticker(
+    ticker: str,
+    rule: str,
+    settings_dict: Dict,
+    date_start: str,
+    date_end: str,
+    interval: str = "1d",
+) -> SweepResult:
+    """Sweep a rule over the stock data of a ticker, see sweep.
+
+    Args:
+        ticker (str): ticker symbol
+        rule (str): signal rule, see RULES
+        settings_dict (Dict): chart settings providing the parameters not swept
+        date_start (str): include only dates later than date_start
+        date_end (str): include only dates earlier than date_end
+        interval (str): bar interval, one of resample.INTERVALS
+
+    Raises:
+        ValueError: if the rule is unknown or there are no bars in the date range
+
+    Returns:
+        SweepResult: scores per metric and parameter combination
+    """
+    stocks_df: pd.DataFrame = get_stocks_data(ticker, date_start, date_end, interval)
+    if stocks_df.empty:
+        raise ValueError(f"no data of {ticker} in the date range")
+    return sweep(
+        stocks_df["Close"].to_numpy(dtype=float),
+        rule,
+        settings_dict,
+        bars_per_year=BARS_PER_YEAR[interval],
+        ticker=ticker,
+    )
+
+
+def sweep_heatmap(result: SweepResult, metric: str = "sharpe") -> go.Figure:
+    """Generate a heatmap of one metric over the parameter grid.
+
+    Args:
+        result (SweepResult): sweep scores
+        metric (str): shown metric, see METRICS
+
+    Returns:
+        go.Figure: heatmap marking the best combination
+    """
+    spec = RULES[result.rule]
+    best_x, best_y, best = result.best(metric)
+    percent = metric in ("annual_return", "total_return", "max_drawdown", "exposure")
+    value_format = ".1%" if percent else ".2f"
+    title = (
+        f"{result.ticker} {result.rule}: {METRICS[metric]}, "
+        f"best {best:{value_format}} at ({best_x:g}, {best_y:g}), "
+        f"buy and hold {result.buy_and_hold[metric]:{value_format}}"
+    )
+    fig = go.Figure(
+        [
+            go.Heatmap(
+                z=result.scores[metric].round(4),
+                x=result.x_values,
+                y=result.y_values,
+                colorscale="RdYlGn_r" if metric == "max_drawdown" else "RdYlGn",
+                colorbar=dict(tickformat=value_format),
+                hovertemplate=(
+                    f"{spec.x_name}: %{{x}}<br>{spec.y_name}: %{{y}}<br>"
+                    f"{METRICS[metric]}: %{{z:{value_format}}}<extra></extra>"
+                ),
+            ),
+            go.Scatter(
+                x=[best_x],
+                y=[best_y],
+                mode="markers",
+                marker=dict(symbol="x", size=12, color=THEME["font"]),
+                hoverinfo="skip",
+                showlegend=False,
+            ),
+        ]
+    )
+    fig.update_layout(
+        title=dict(text=title, font=dict(color=THEME["font"])),
+        xaxis_title=spec.x_name,
+        yaxis_title=spec.y_name,
+        paper_bgcolor=THEME["background"],
+        plot_bgcolor=THEME["background"],
+        font=dict(color=THEME["font"]),
+        margin=dict(b=30, l=30, r=30, t=50),
+    )
+    return fig
@@ -0,0 +1,235 @@
+"""Conditional, incremental refresh of the NASDAQ symbol directory."""
+import json
+import os
+from contextlib import suppress
+from ftplib import FTP, all_errors
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set
+
+from fin import config
+from fin.domain.logic.symbols import (
+    NASDAQ_EXCHANGE,
+    SymbolTable,
+    build_symbol_table,
+    saved_version,
+)
+
+# remote file -> local file and symbol column of the NASDAQ symbol directory
+DIRECTORY_FILES = {
+    "nasdaqlisted.txt": ("nasdaqlisted.csv", "Symbol"),
+    "otherlisted.txt": ("otherlisted.csv", "ACT Symbol"),
+}
+# the last line of a complete file holds processing information
+FOOTER = "File Creation Time"
+# size and modification time of the last downloaded remote files
+METADATA_FILE = "symbol_directory.json"
+# errors failing the refresh of a single directory file
+REFRESH_ERRORS = (ValueError,) + all_errors
+
+
+class SymbolDiff(NamedTuple):
+    """Outcome of a symbol directory refresh.
+
+    Args:
+        added (List[str]): symbols listed since the last refresh
+        removed (List[str]): symbols no longer listed
+        downloaded (List[str]): remote files which changed and were downloaded
+        failed (Dict[str, str]): remote files which could not be refreshed and why
+    """
+
+    added: List[str]
+    removed: List[str]
+    downloaded: List[str]
+    failed: Dict[str, str]
+
+    @property
+    def changed(self) -> bool:
+        """Return True if any file was downloaded."""
+        return bool(self.downloaded)
+
+
+def connect_nasdaq_ftp() -> FTP:
+    """Open an anonymous session in the symbol directory of ftp.nasdaqtrader.com."""
+    ftp = FTP(config.SYMBOL_FTP_HOST, timeout=config.SYMBOL_FTP_TIMEOUT)
+    ftp.login()
+    ftp.cwd(config.SYMBOL_FTP_DIR)
+    return ftp
+
+
+def remote_stat(ftp: FTP, remote_name: str) -> Dict[str, Optional[str]]:
+    """Return size and modification time of a remote file.
+
+    Args:
+        ftp (FTP): open FTP session
+        remote_name (str): file name in the current remote directory
+
+    Returns:
+        Dict[str, Optional[str]]: "size" and "modified", None if the server doesn't
+            support the SIZE or MDTM command
+    """
+    stat: Dict[str, Optional[str]] = {"size": None, "modified": None}
+    try:
+        # SIZE is only well-defined for binary transfers
+        ftp.voidcmd("TYPE I")
+        size = ftp.size(remote_name)
+        stat["size"] = None if size is None else str(size)
+    except all_errors:
+        pass
+    try:
+        stat["modified"] = ftp.sendcmd(f"MDTM {remote_name}").split()[-1]
+    except all_errors:
+        pass
+    return stat
+
+
+def stream_download(
+    ftp: FTP, remote_name: str, path: Path, symbol_column: str
+) -> Set[str]:
+    """Download a directory file line by line while collecting its symbols.
+
+    The file is written to a temporary file first and only replaces path if it
+    arrived completely (including the footer line), so a broken transfer never
+    leaves a truncated directory behind.
+
+    Args:
+        ftp (FTP): open FTP session
+        remote_name (str): file name in the current remote directory
+        path (Path): local target file
+        symbol_column (str): header of the column holding the symbols
+
+    Raises:
+        ValueError: if the header lacks symbol_column or the footer is missing
+
+    Returns:
+        Set[str]: symbols listed in the file
+    """
+    symbols: Set[str] = set()
+    column: Optional[int] = None
+    complete = False
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+
+    def parse_line(line: str):
+        nonlocal column, complete
+        fh.write(line + "\n")
+        fields = line.split("|")
+        if column is None:
+            column = fields.index(symbol_column)
+        elif line.startswith(FOOTER):
+            complete = True
+        elif len(fields) > column and fields[column]:
+            symbols.add(fields[column])
+
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            ftp.retrlines(f"RETR {remote_name}", parse_line)
+        if not complete:
+            raise ValueError(f"{remote_name} is incomplete, its footer is missing")
+    except BaseException:
+        # the temporary file is missing if it could not be opened
+        with suppress(FileNotFoundError):
+            tmp_path.unlink()
+        raise
+    os.replace(tmp_path, path)
+    return symbols
+
+
+def listed_symbols(table: Optional[SymbolTable]) -> Dict[str, Set[str]]:
+    """Split the symbols of a table by the directory file listing them."""
+    if table is None:
+        return {remote_name: set() for remote_name in DIRECTORY_FILES}
+    nasdaq = table.mask(exchanges=[NASDAQ_EXCHANGE])
+    return {
+        "nasdaqlisted.txt": set(table.symbols(nasdaq).tolist()),
+        "otherlisted.txt": set(table.symbols(~nasdaq).tolist()),
+    }
+
+
+def current_table(data_api: Path, folder: Path) -> Optional[SymbolTable]:
+    """Return the saved symbol table, built from local files if it is missing."""
+    if saved_version(folder) is not None:
+        return SymbolTable.load(folder)
+    local_names = [local_name for local_name, _ in DIRECTORY_FILES.values()]
+    if all((data_api / local_name).exists() for local_name in local_names):
+        return build_symbol_table(data_api, folder)
+    return None
+
+
+def refresh_symbol_directory(
+    ftp_factory: Callable[[], FTP] = connect_nasdaq_ftp,
+    data_api: Path = config.DATA_API,
+    folder: Path = config.SYMBOL_FOLDER,
+    listeners: Sequence[Callable[[SymbolDiff], None]] = (),
+) -> SymbolDiff:
+    """Download changed directory files and apply their changes to the symbol table.
+
+    A file is skipped if its remote size and modification time match the last
+    download. Changed files are parsed while they stream in and the symbol table is
+    rebuilt, processes reopen it on their next get_symbol_table call. Listeners are
+    called with the diff if anything changed, e.g. to drop cached data of delisted
+    symbols.
+
+    Args:
+        ftp_factory (Callable[[], FTP]): returns an FTP session opened in the symbol
+            directory, replaceable by a local stand-in
+        data_api (Path): folder of the local directory files
+        folder (Path): folder of the symbol table
+        listeners (Sequence[Callable[[SymbolDiff], None]]): called after changes
+
+    Returns:
+        SymbolDiff: added and removed symbols, downloaded and failed files
+    """
+    metadata_path = data_api / METADATA_FILE
+    metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+    before = listed_symbols(current_table(data_api, folder))
+    after = {remote_name: set(symbols) for remote_name, symbols in before.items()}
+    downloaded: List[str] = []
+    failed: Dict[str, str] = {}
+
+    try:
+        ftp = ftp_factory()
+    except all_errors as error:
+        failed = {remote_name: str(error) for remote_name in DIRECTORY_FILES}
+        return SymbolDiff([], [], [], failed)
+
+    try:
+        for remote_name, (local_name, symbol_column) in DIRECTORY_FILES.items():
+            try:
+                stat = remote_stat(ftp, remote_name)
+                unchanged = (
+                    any(stat.values())
+                    and metadata.get(remote_name) == stat
+                    and (data_api / local_name).exists()
+                )
+                if unchanged:
+                    continue
+                after[remote_name] = stream_download(
+                    ftp, remote_name, data_api / local_name, symbol_column
+                )
+            except REFRESH_ERRORS as error:
+                failed[remote_name] = f"{type(error).__name__}: {error}"
+                continue
+            metadata[remote_name] = stat
+            downloaded.append(remote_name)
+    finally:
+        try:
+            ftp.quit()
+        except all_errors:
+            ftp.close()
+
+    if not downloaded:
+        return SymbolDiff([], [], [], failed)
+
+    metadata_path.write_text(json.dumps(metadata, indent=2))
+    build_symbol_table(data_api, folder)
+
+    old_symbols = set().union(*before.values())
+    new_symbols = set().union(*after.values())
+    diff = SymbolDiff(
+        added=sorted(new_symbols - old_symbols),
+        removed=sorted(old_symbols - new_symbols),
+        downloaded=downloaded,
+        failed=failed,
+    )
+    for listener in listeners:
+        listener(diff)
+    return diff
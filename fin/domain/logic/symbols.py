@@ -0,0 +1,479 @@
+"""Ticker symbol directory and search index."""
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from fin import config
+
+# exchange codes of the NASDAQ symbol directory
+EXCHANGES = {
+    "A": "NYSE American",
+    "N": "NYSE",
+    "P": "NYSE Arca",
+    "Q": "NASDAQ",
+    "V": "Investors' Exchange",
+    "Z": "Cboe BZX",
+}
+NASDAQ_EXCHANGE = "Q"
+
+# files of a saved symbol table, see SymbolTable.save
+TABLE_PARTS = ("records", "names", "slots")
+# file naming the version directory of the saved symbol table
+CURRENT_TABLE = "current"
+# saved versions kept, readers may still open the replaced version
+TABLE_VERSIONS = 2
+
+
+def record_dtype(symbol_width: int) -> np.dtype:
+    """Return the record layout of a symbol table with symbols of symbol_width."""
+    return np.dtype(
+        [
+            ("symbol", f"S{symbol_width}"),
+            ("exchange", "S1"),
+            ("etf", "?"),
+            ("test_issue", "?"),
+            ("name_start", "<i4"),
+            ("name_end", "<i4"),
+        ]
+    )
+
+
+def read_listings(data_api: Path = config.DATA_API) -> pd.DataFrame:
+    """Read NASDAQ and other listed securities from the NASDAQ symbol directory.
+
+    Args:
+        data_api (Path): folder containing nasdaqlisted.csv and otherlisted.csv
+
+    Returns:
+        pd.DataFrame: unique symbols with columns "symbol", "name", "exchange",
+            "etf" and "test_issue", in the order of the source files
+    """
+    # the last line of each file holds processing information ("File Creation
+    # Time"), it is dropped after parsing instead of using skipfooter, which would
+    # force the slow python parser engine
+    nasdaq_listed = pd.read_csv(
+        data_api / "nasdaqlisted.csv",
+        sep="|",
+        usecols=["Symbol", "Security Name", "ETF", "Test Issue"],
+        keep_default_na=False,
+    ).assign(Exchange=NASDAQ_EXCHANGE)
+    other_listed = pd.read_csv(
+        data_api / "otherlisted.csv",
+        sep="|",
+        usecols=["ACT Symbol", "Security Name", "Exchange", "ETF", "Test Issue"],
+        keep_default_na=False,
+    ).rename(columns={"ACT Symbol": "Symbol"})
+
+    listings = pd.concat([nasdaq_listed, other_listed], axis=0)
+    listings = listings[~listings.Symbol.str.startswith("File Creation Time")]
+    listings = listings.drop_duplicates("Symbol").reset_index(drop=True)
+    return pd.DataFrame(
+        {
+            "symbol": listings["Symbol"],
+            "name": listings["Security Name"],
+            "exchange": listings["Exchange"],
+            "etf": listings["ETF"] == "Y",
+            "test_issue": listings["Test Issue"] == "Y",
+        }
+    )
+
+
+def _slot(symbol: bytes, n_slots: int) -> int:
+    """Return the home slot of an encoded symbol in a hash table of n_slots."""
+    # crc32 is stable across processes, unlike the salted built-in hash
+    return zlib.crc32(symbol) & (n_slots - 1)
+
+
+class SymbolTable:
+    """A compact, memory-mappable table of ticker symbols and their metadata.
+
+    Records are stored in a numpy structured array with fixed-width ASCII symbols,
+    the exchange code, ETF and test issue flags and the byte offsets of the
+    security name. Names are kept as one UTF-8 blob, so long names don't widen all
+    records. Lookups use a precomputed open-addressing hash table.
+
+    Saved tables are opened with np.load(mmap_mode="r"), so all processes share
+    the operating system's page cache instead of holding their own copy. The table
+    is a read-only sequence of its symbols (``table[0]``, ``"AAPL" in table``).
+
+    Args:
+        records (np.ndarray): structured array of record_dtype(symbol_width)
+        names (np.ndarray): uint8 blob of newline-separated security names
+        slots (np.ndarray): hash table of record positions, -1 marks free slots
+    """
+
+    def __init__(self, records: np.ndarray, names: np.ndarray, slots: np.ndarray):
+        """Generate a symbol table."""
+        self.records = records
+        self.names_blob = names
+        self.slots = slots
+        self._names: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_listings(cls, listings: pd.DataFrame) -> "SymbolTable":
+        """Build a symbol table from the output of read_listings.
+
+        Args:
+            listings (pd.DataFrame): symbols and their metadata
+
+        Returns:
+            SymbolTable: in-memory symbol table, rows in the order of listings
+        """
+        symbols = listings["symbol"].to_numpy(dtype=str)
+        encoded = [name.encode("utf-8") for name in listings["name"].tolist()]
+        # names are separated by one newline byte
+        name_ends = np.cumsum([len(name) + 1 for name in encoded]) - 1
+        width = max((len(symbol) for symbol in symbols), default=1)
+
+        records = np.zeros(len(symbols), dtype=record_dtype(width))
+        records["symbol"] = np.char.encode(symbols, "ascii")
+        records["exchange"] = np.char.encode(
+            listings["exchange"].to_numpy(dtype=str), "ascii"
+        )
+        records["etf"] = listings["etf"].to_numpy(dtype=bool)
+        records["test_issue"] = listings["test_issue"].to_numpy(dtype=bool)
+        records["name_end"] = name_ends
+        records["name_start"] = name_ends - [len(name) for name in encoded]
+        names = np.frombuffer(b"\n".join(encoded), dtype=np.uint8)
+
+        # linear probing in a table at most half full
+        n_slots = 1 << max(len(symbols) * 2 - 1, 1).bit_length()
+        slots = np.full(n_slots, -1, dtype=np.int32)
+        for row, symbol in enumerate(records["symbol"].tolist()):
+            slot = _slot(symbol, n_slots)
+            while slots[slot] >= 0:
+                slot = (slot + 1) & (n_slots - 1)
+            slots[slot] = row
+        return cls(records, names, slots)
+
+    @classmethod
+    def load(cls, folder: Path = config.SYMBOL_FOLDER) -> "SymbolTable":
+        """Open a saved symbol table memory-mapped and read-only.
+
+        Args:
+            folder (Path): folder the table was saved to
+
+        Raises:
+            FileNotFoundError: if no table was saved to folder
+
+        Returns:
+            SymbolTable: symbol table backed by the saved files
+        """
+        version = saved_version(folder)
+        if version is None:
+            raise FileNotFoundError(f"no symbol table saved in {folder}")
+        return cls(
+            *(np.load(version / f"{part}.npy", mmap_mode="r") for part in TABLE_PARTS)
+        )
+
+    def save(self, folder: Path = config.SYMBOL_FOLDER):
+        """Store the table as .npy files of a new version directory.
+
+        The files are written completely before the pointer file CURRENT_TABLE is
+        replaced atomically, so readers always open records, names and slots of
+        the same version. Older versions beyond TABLE_VERSIONS are removed, open
+        memory maps of them stay valid.
+
+        Args:
+            folder (Path): target folder, created if missing
+        """
+        folder.mkdir(parents=True, exist_ok=True)
+        # versions sort by their creation time
+        version = f"v{time.time_ns():020d}-{os.getpid()}"
+        (folder / version).mkdir()
+        for part, array in zip(
+            TABLE_PARTS, (self.records, self.names_blob, self.slots)
+        ):
+            np.save(folder / version / f"{part}.npy", np.ascontiguousarray(array))
+        tmp_path = folder / f"{CURRENT_TABLE}.{os.getpid()}.tmp"
+        tmp_path.write_text(version)
+        os.replace(tmp_path, folder / CURRENT_TABLE)
+
+        versions = sorted(path.name for path in folder.glob("v*") if path.is_dir())
+        for old_version in versions[:-TABLE_VERSIONS]:
+            if old_version != version:
+                shutil.rmtree(folder / old_version, ignore_errors=True)
+
+    def __len__(self) -> int:
+        """Return the number of symbols."""
+        return len(self.records)
+
+    def __getitem__(self, row: int) -> str:
+        """Return the symbol at row."""
+        return self.records["symbol"][row].decode("ascii")
+
+    def __contains__(self, symbol: object) -> bool:
+        """Return True if the table holds symbol."""
+        return isinstance(symbol, str) and self.lookup(symbol) is not None
+
+    def lookup(self, symbol: str) -> Optional[int]:
+        """Find the row of a symbol in O(1).
+
+        Args:
+            symbol (str): ticker symbol
+
+        Returns:
+            Optional[int]: row of the symbol or None if it is unknown
+        """
+        try:
+            encoded = symbol.encode("ascii")
+        except UnicodeEncodeError:
+            return None
+        n_slots = len(self.slots)
+        slot = _slot(encoded, n_slots)
+        while True:
+            row = int(self.slots[slot])
+            if row < 0:
+                return None
+            if self.records["symbol"][row] == encoded:
+                return row
+            slot = (slot + 1) & (n_slots - 1)
+
+    def name(self, row: int) -> str:
+        """Return the security name at row."""
+        start, end = self.records[["name_start", "name_end"]][row].tolist()
+        return bytes(self.names_blob[start:end]).decode("utf-8")
+
+    def mask(
+        self,
+        etf: bool = None,
+        test_issue: bool = None,
+        exchanges: Sequence[str] = None,
+    ) -> np.ndarray:
+        """Select rows by their metadata without copying the records.
+
+        Args:
+            etf (bool, optional): keep only ETFs (True) or only non-ETFs (False)
+            test_issue (bool, optional): keep only test issues or only real ones
+            exchanges (Sequence[str], optional): keep only these exchange codes,
+                see EXCHANGES
+
+        Returns:
+            np.ndarray: boolean mask over the rows
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if etf is not None:
+            mask &= self.records["etf"] == etf
+        if test_issue is not None:
+            mask &= self.records["test_issue"] == test_issue
+        if exchanges is not None:
+            codes = np.array([code.encode("ascii") for code in exchanges], dtype="S1")
+            mask &= np.isin(self.records["exchange"], codes)
+        return mask
+
+    def symbols(self, rows: np.ndarray = None) -> np.ndarray:
+        """Return symbols as a str array, optionally only at rows (mask or indices)."""
+        column = self.records["symbol"]
+        return (column if rows is None else column[rows]).astype(str)
+
+    def names(self, rows: np.ndarray = None) -> np.ndarray:
+        """Return security names as a str array, optionally only at rows.
+
+        The names blob is decoded once, later calls index the decoded names.
+        """
+        if self._names is None:
+            names = bytes(self.names_blob).decode("utf-8").split("\n")
+            self._names = np.array(names[: len(self)], dtype=str)
+            self._names.setflags(write=False)
+        return self._names if rows is None else self._names[rows]
+
+
+class _SubstringIndex:
+    """Find substrings in many strings at once by scanning one joined string.
+
+    Args:
+        values (np.ndarray): strings to search in
+    """
+
+    def __init__(self, values: np.ndarray):
+        """Generate a substring index."""
+        upper = [value.upper() for value in values.tolist()]
+        self.haystack = "\n".join(upper)
+        lengths = np.array([len(value) + 1 for value in upper])
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    def find(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return rows containing query and the first match position within each."""
+        positions = np.fromiter(
+            (match.start() for match in re.finditer(re.escape(query), self.haystack)),
+            dtype=np.int64,
+        )
+        rows = np.searchsorted(self.offsets, positions, side="right") - 1
+        # positions are ascending, so the first occurrence per row is kept
+        rows, first = np.unique(rows, return_index=True)
+        return rows, positions[first] - self.offsets[rows]
+
+
+class SymbolIndex:
+    """A search index over ticker symbols and security names.
+
+    Symbols are kept sorted, so prefix matches are found by binary search, while
+    substring matches scan the joined, upper-cased symbols and names.
+
+    Args:
+        symbols (np.ndarray): ticker symbols
+        names (np.ndarray): security names in the same order as symbols
+    """
+
+    def __init__(self, symbols: np.ndarray, names: np.ndarray):
+        """Generate a search index."""
+        order = np.argsort(symbols)
+        self.symbols = np.asarray(symbols, dtype=str)[order]
+        self.names = np.asarray(names, dtype=str)[order]
+        self._symbols_upper = np.char.upper(self.symbols)
+        self._symbol_substrings = _SubstringIndex(self.symbols)
+        self._name_substrings = _SubstringIndex(self.names)
+
+    def __len__(self) -> int:
+        """Return the number of indexed symbols."""
+        return len(self.symbols)
+
+    def option(self, position: int) -> Dict[str, str]:
+        """Return a Dropdown option for the symbol at position."""
+        symbol, name = self.symbols[position], self.names[position]
+        return {"label": f"{symbol} - {name}" if name else symbol, "value": symbol}
+
+    def options(self, symbols: List[str]) -> List[Dict[str, str]]:
+        """Return Dropdown options for a list of symbols, unknown symbols included."""
+        positions = np.searchsorted(self.symbols, symbols)
+        options = []
+        for symbol, position in zip(symbols, positions):
+            if position < len(self) and self.symbols[position] == symbol:
+                options.append(self.option(position))
+            else:
+                options.append({"label": symbol, "value": symbol})
+        return options
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, str]]:
+        """Find the best matching symbols for a search string.
+
+        Matches are ranked: exact symbol, symbol prefix, name prefix, symbol
+        substring, name substring. Shorter symbols are ranked first within a group.
+
+        Args:
+            query (str): search string typed by the user
+            limit (int): maximum number of results
+
+        Returns:
+            List[Dict[str, str]]: Dropdown options of the matching symbols
+        """
+        query = query.strip().upper()
+        if not query:
+            return []
+
+        # symbol prefix matches form a contiguous block of the sorted symbols
+        first = np.searchsorted(self._symbols_upper, query, side="left")
+        last = np.searchsorted(self._symbols_upper, query + "\uffff", side="left")
+        rank = np.full(len(self), 5)
+        name_rows, name_found = self._name_substrings.find(query)
+        rank[name_rows] = np.where(name_found == 0, 2, 4)
+        symbol_rows, symbol_found = self._symbol_substrings.find(query)
+        rank[symbol_rows[symbol_found > 0]] = 3
+        rank[first:last] = 1
+        rank[first:last][self._symbols_upper[first:last] == query] = 0
+
+        matches = np.flatnonzero(rank < 5)
+        order = np.lexsort((np.char.str_len(self.symbols[matches]), rank[matches]))
+        return [self.option(position) for position in matches[order][:limit]]
+
+
+def saved_version(folder: Path = config.SYMBOL_FOLDER) -> Optional[Path]:
+    """Return the version directory of the saved symbol table.
+
+    Args:
+        folder (Path): folder the table was saved to
+
+    Returns:
+        Optional[Path]: directory of the current table files, None if no complete
+            table was saved
+    """
+    try:
+        version = folder / (folder / CURRENT_TABLE).read_text().strip()
+    except FileNotFoundError:
+        return None
+    if not all((version / f"{part}.npy").exists() for part in TABLE_PARTS):
+        return None
+    return version
+
+
+def _table_is_stale(folder: Path, data_api: Path) -> bool:
+    """Return True if the saved table is missing or older than its source files."""
+    if saved_version(folder) is None:
+        return True
+    built = (folder / CURRENT_TABLE).stat().st_mtime
+    return any(
+        (data_api / source).stat().st_mtime > built
+        for source in ("nasdaqlisted.csv", "otherlisted.csv")
+        if (data_api / source).exists()
+    )
+
+
+def build_symbol_table(
+    data_api: Path = config.DATA_API, folder: Path = config.SYMBOL_FOLDER
+) -> SymbolTable:
+    """Build the symbol table from the NASDAQ symbol directory and store it.
+
+    Args:
+        data_api (Path): folder containing nasdaqlisted.csv and otherlisted.csv
+        folder (Path): folder the table is saved to
+
+    Returns:
+        SymbolTable: the freshly built table
+    """
+    table = SymbolTable.from_listings(read_listings(data_api))
+    table.save(folder)
+    return table
+
+
+# process-wide table and index, reopened once another process saved a new table
+_table: Optional[Tuple[int, SymbolTable]] = None
+_index: Optional[Tuple[SymbolTable, SymbolIndex]] = None
+_table_lock = threading.Lock()
+_table_checked = 0.0
+# seconds the saved table is not checked for changes again
+TABLE_RECHECK = 1.0
+
+
+def get_symbol_table() -> SymbolTable:
+    """Return the process-wide symbol table, memory-mapped from disk.
+
+    The table is (re)built first if it is missing or older than the source files.
+    It is reopened when the modification time of its pointer file changed, so
+    tables saved by a symbol directory refresh in another process are picked up
+    within TABLE_RECHECK seconds.
+    """
+    global _table, _table_checked
+    with _table_lock:
+        now = time.monotonic()
+        if _table is not None and now - _table_checked < TABLE_RECHECK:
+            return _table[1]
+        if _table_is_stale(config.SYMBOL_FOLDER, config.DATA_API):
+            build_symbol_table()
+        saved = (config.SYMBOL_FOLDER / CURRENT_TABLE).stat().st_mtime_ns
+        if _table is None or _table[0] != saved:
+            _table = (saved, SymbolTable.load(config.SYMBOL_FOLDER))
+        _table_checked = now
+        return _table[1]
+
+
+def get_symbol_index() -> SymbolIndex:
+    """Return the process-wide symbol index of all real (non-test) issues.
+
+    The index is rebuilt whenever get_symbol_table returns a new table.
+    """
+    global _index
+    table = get_symbol_table()
+    index = _index
+    if index is None or index[0] is not table:
+        rows = np.flatnonzero(table.mask(test_issue=False))
+        index = (table, SymbolIndex(table.symbols(rows), table.names(rows)))
+        _index = index
+    return index[1]
@@ -0,0 +1,88 @@
+"""Bounded server-side store of the sessions of all users."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fin import config
+from fin.domain.logic.shared_cache import SQLiteCache
+from fin.domain.session.usersession import UserSession
+
+
+class SessionStore:
+    """A thread-safe LRU store of user sessions, keyed by user id.
+
+    Sessions are kept as compact JSON strings of a few hundred bytes, so memory is
+    bounded by maxsize times the session size. Sessions expire ttl seconds after
+    they were last saved.
+
+    With a shared cache the sessions are kept in its SQLite file instead of the
+    process memory, so every worker of a multi-process server restores them.
+    maxsize is then replaced by the size limit of the shared cache.
+
+    Args:
+        maxsize (int): maximum number of stored sessions
+        ttl (float): seconds until an unsaved session expires
+        shared (SQLiteCache, optional): cache shared by the server processes
+    """
+
+    def __init__(
+        self,
+        maxsize: int = config.SESSION_STORE_SIZE,
+        ttl: float = config.SESSION_TTL,
+        shared: Optional[SQLiteCache] = None,
+    ):
+        """Generate a store instance."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        # user id -> (save time, serialized session)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, user_id: str) -> Optional[UserSession]:
+        """Return the session of user_id or None if it is missing or expired."""
+        if self.shared is not None:
+            serialized = self.shared.get(user_id)
+        else:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                    del self._entries[user_id]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(user_id)
+                serialized = None if entry is None else entry[1]
+        if serialized is None:
+            return None
+        try:
+            return UserSession.from_json(serialized)
+        except ValueError:
+            # sessions saved by an older release may no longer validate
+            return None
+
+    def set(self, user_id: str, session: UserSession):
+        """Store the session of user_id and evict sessions beyond the size limit.
+
+        Args:
+            user_id (str): id of the user, see run_app
+            session (UserSession): settings of the user
+        """
+        serialized = session.to_json()
+        if self.shared is not None:
+            self.shared.set(user_id, serialized)
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), serialized)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored sessions and evictions."""
+        if self.shared is not None:
+            return dict(self.shared.stats(), evictions=self.shared.evictions)
+        with self._lock:
+            return {"size": len(self._entries), "evictions": self.evictions}
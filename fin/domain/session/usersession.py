@@ -1,7 +1,92 @@
-import joblib
+"""Validated chart settings of a user, compact enough to store per user."""
+import json
 from datetime import date
-from fin import config
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fin.domain.logic.resample import INTERVALS
+
+
+def _date(value: Any) -> str:
+    """Validate a date, also accepting date pickers' ISO datetimes."""
+    return date.fromisoformat(str(value)[:10]).isoformat()
+
+
+def _interval(value: Any) -> str:
+    if value not in INTERVALS:
+        raise ValueError(f"choose from {list(INTERVALS)}")
+    return value
+
+
+def _symbol(value: Any) -> Optional[str]:
+    if value is not None and not isinstance(value, str):
+        raise TypeError("expected a ticker symbol")
+    return value
+
+
+def _checklist(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if not isinstance(value, (list, tuple)) or not all(
+        isinstance(item, str) for item in value
+    ):
+        raise TypeError("expected a list of checklist values")
+    return list(value)
+
+
+def _periods(value: Any) -> int:
+    periods = float(value)
+    if periods != int(periods) or periods < 1:
+        raise ValueError("expected a positive integer")
+    return int(periods)
+
+
+def _number(value: Any) -> float:
+    """Convert to float, integers are kept, e.g. for input placeholders."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return float(value)
+
+
+def _positive(value: Any) -> float:
+    number = _number(value)
+    if not number > 0:
+        raise ValueError("expected a positive number")
+    return number
+
+
+def _percent(value: Any) -> float:
+    number = _number(value)
+    if not 0 <= number <= 100:
+        raise ValueError("expected a number between 0 and 100")
+    return number
+
+
+# default value (or factory) and validating converter of each session field
+FIELDS: Dict[str, Tuple[Any, Callable[[Any], Any]]] = {
+    "symbol": (None, _symbol),
+    "start_date": (str(date(2020, 1, 1)), _date),
+    "end_date": (lambda: str(date.today()), _date),
+    "interval": ("1d", _interval),
+    "bollinger_check": (["bollinger_bands"], _checklist),
+    "bollinger_periods": (20, _periods),
+    "boll_std": (2, _positive),
+    "macd_check": (["macd_check"], _checklist),
+    "macd_fast_period": (12, _periods),
+    "macd_slow_period": (26, _periods),
+    "macd_signal_period": (9, _periods),
+    "rsi_check": (["rsi_check"], _checklist),
+    "rsi_periods": (20, _periods),
+    "rsi_lower": (70, _percent),
+    "rsi_upper": (30, _percent),
+    "sma_check": (["sma_check"], _checklist),
+    "sma_periods": (20, _periods),
+}
+# data_store key of the fields not stored as "<field>_state", see run_app
+SETTING_KEYS = {
+    "symbol": "ticker_dropdown_state",
+    "start_date": "ticker_date_range_start_state",
+    "end_date": "ticker_date_range_end_state",
+}
 
 
 class UserSession:
@@ -10,57 +95,149 @@ class UserSession:
     The attributes listed below are derived from the cufflinks.QuantFig package.
     For further details see https://github.com/santosjorge/cufflinks
 
+    Sessions are slotted and hold validated plain values only, so they are small
+    and round-trip through JSON, e.g. into the data_store or a SessionStore. The
+    available ticker symbols are not part of a session, see ticker.
+
     Args:
-        ticker (List[str]):             list of available ticker symbols
+        symbol (str):                   selected ticker symbol, None for the default
         start_date (str):               first day the chart begins
         end_date (str):                 last day the chart ends
+        interval (str):                 bar interval, e.g. "1h", "1d" or "1wk"
         bollinger_check (List[str]):    checklist value for Bollinger feature
-        bollinger_periods (int):  periods setting for Bollinger feature
-        boll_std (int):   standard deviation setting for Bollinger feature
+        bollinger_periods (int):        periods setting for Bollinger feature
+        boll_std (float):               standard deviation setting for Bollinger feature
         macd_check (List[str]):         checklist value for MACD feature
         macd_fast_period (int):         fast periods setting for MACD feature
         macd_slow_period (int):         slow periods setting for MACD feature
         macd_signal_period (int):       signal period setting for MACD feature
         rsi_check (List[str]):          checklist value for RSI feature
         rsi_periods (int):              periods setting for RSI feature
-        rsi_lower (int):                lower setting for RSI feature
-        rsi_upper (int):                upper setting for RSI feature
+        rsi_lower (float):              lower setting for RSI feature
+        rsi_upper (float):              upper setting for RSI feature
         sma_check (List[str]):          checklist value for SMA feature
         sma_periods (int):              periods setting for SMA feature
     """
 
+    __slots__ = tuple(FIELDS)
+
+    # attribute types for type checkers, the values are set from FIELDS
+    symbol: Optional[str]
+    start_date: str
+    end_date: str
+    interval: str
+    bollinger_check: List[str]
+    bollinger_periods: int
+    boll_std: float
+    macd_check: List[str]
+    macd_fast_period: int
+    macd_slow_period: int
+    macd_signal_period: int
+    rsi_check: List[str]
+    rsi_periods: int
+    rsi_lower: float
+    rsi_upper: float
+    sma_check: List[str]
+    sma_periods: int
+
     def __init__(self, dictionary: Dict = None):
         """Generate a session instance.
 
         A UserSession object can be instantiated with default values for initial page
         load or customized using a dictionary whose key-value mapping results in a
-        attribute-value mapping.
+        attribute-value mapping. Missing attributes keep their default value.
+
+        Args:
+            dictionary (Dict, optional): attribute values. Defaults to None.
+
+        Raises:
+            ValueError: if an attribute is unknown or its value is invalid
+        """
+        dictionary = dictionary or {}
+        unknown = set(dictionary) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"unknown session attributes {sorted(unknown)}")
+        for name, (default, convert) in FIELDS.items():
+            if name in dictionary:
+                value = dictionary[name]
+            else:
+                value = default() if callable(default) else default
+            try:
+                setattr(self, name, convert(value))
+            except (TypeError, ValueError) as error:
+                raise ValueError(f"invalid {name} {value!r}: {error}") from None
+        if self.macd_slow_period < self.macd_fast_period:
+            raise ValueError("macd_slow_period cannot be less than macd_fast_period")
+
+    @property
+    def ticker(self):
+        """Return the table of available ticker symbols.
+
+        The memory-mapped symbol table is shared with the rest of the process, so
+        sessions stay small and a refreshed symbol directory is picked up.
+        """
+        from fin.domain.logic.symbols import get_symbol_table
+
+        return get_symbol_table()
+
+    def to_dict(self) -> Dict:
+        """Return the attributes as JSON serializable dict."""
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def to_json(self) -> str:
+        """Serialize the session compactly."""
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, serialized: str) -> "UserSession":
+        """Restore a session serialized by to_json."""
+        return cls(json.loads(serialized))
+
+    def to_settings(self) -> Dict:
+        """Return the session as chart settings, keyed like the data_store."""
+        return {
+            SETTING_KEYS.get(name, name + "_state"): value
+            for name, value in self.to_dict().items()
+        }
+
+    @classmethod
+    def from_settings(cls, settings_dict: Dict) -> "UserSession":
+        """Validate chart settings collected in the data_store.
 
         Args:
-            dictionary (Dict, optional): [description]. Defaults to None.
+            settings_dict (Dict): chart settings, missing settings keep their default
+
+        Raises:
+            ValueError: if a setting is invalid
+
+        Returns:
+            UserSession: session of the settings, unknown keys are ignored
         """
-        if dictionary is not None:
-            # create instance based on a provided dict
-            for key, value in dictionary.items():
-                setattr(self, key, value)
-        else:
-            self.ticker: List[str] = joblib.load(config.DATA_API / "tickers_list.lzma")
-            self.start_date: str = str(date(2020, 1, 1))
-            self.end_date: str = str(date.today())
-            self.bollinger_check: List[str] = ["bollinger_bands"]
-            self.bollinger_periods: int = 20
-            self.boll_std: int = 2
-            self.macd_check: List[str] = ["macd_check"]
-            self.macd_fast_period: int = 12
-            self.macd_slow_period: int = 26
-            self.macd_signal_period: int = 9
-            self.rsi_check: List[str] = ["rsi_check"]
-            self.rsi_periods: int = 20
-            self.rsi_lower: int = 70
-            self.rsi_upper: int = 30
-            self.sma_check: List[str] = ["sma_check"]
-            self.sma_periods: int = 20
+        return cls(
+            {
+                name: settings_dict[key]
+                for name, key in (
+                    (name, SETTING_KEYS.get(name, name + "_state")) for name in FIELDS
+                )
+                if key in settings_dict
+            }
+        )
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the attributes of two sessions."""
+        if not isinstance(other, UserSession):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        """Show the attributes."""
+        return f"{type(self).__name__}({self.to_dict()!r})"
 
 
 # create default session object for first page load
 session_default = UserSession()
+
+
+def default_settings() -> Dict:
+    """Return the default chart settings with all studies enabled."""
+    return session_default.to_settings()
@@ -1,26 +1,37 @@
 import dash_bootstrap_components as dbc
 import dash_html_components as html
 import dash_core_components as dcc
-import joblib
 from datetime import date, datetime
 from fin import config
+from fin.domain.logic.portfolio import VAR_LEVELS
+from fin.domain.logic.resample import INTERVAL_LABELS
+from fin.domain.logic.screener import ScreenResult
+from fin.domain.logic.sweep import METRICS, RULES
+from fin.domain.logic.symbols import get_symbol_index, get_symbol_table
 from fin.domain.session.usersession import session_default
 from typing import List, Tuple
 
+import pandas as pd
+
 
 def get_ticker_symbols(ticker_list: List[str] = None) -> dcc.Dropdown:
     """Generate a Dropdown list filled with Yahoo Finance ticker symbols.
 
+    Only a small default set of symbols is shipped with the layout, further symbols
+    are looked up on the server while typing (see run_app.search_ticker_symbols).
+
     Args:
-        ticker_list (List[str]): ticker symbols list
+        ticker_list (List[str]): initial ticker symbols, defaults to
+            config.DEFAULT_TICKERS
 
     Returns:
         dcc.Dropdown: dash Dropdown element containing ticker symbols
     """
-    ticker_list = joblib.load(config.DATA_API / "tickers_list.lzma")
+    if ticker_list is None:
+        ticker_list = [session_default.ticker[0]] + config.DEFAULT_TICKERS
     return dcc.Dropdown(
         id="ticker_dropdown",
-        options=[{"label": tick, "value": tick} for tick in ticker_list],
+        options=get_symbol_index().options(list(dict.fromkeys(ticker_list))),
         style={"width": "65%"},
         # set initial page load value
         value=session_default.ticker[0],
@@ -167,6 +178,7 @@ def stock_settings() -> html.Div:
     """
     # dropdown for stock selection and DatePickerRange for time window selection
     date_label, ticker_label = html.Label("Date Range"), html.Label("Dropdown")
+    interval_label = html.Label("Interval")
     ticker_dropdown = get_ticker_symbols()
     date_range_picker = dcc.DatePickerRange(
         id="ticker_date_range",
@@ -175,10 +187,258 @@ def stock_settings() -> html.Div:
         clearable=True,
         first_day_of_week=1,
     )
+    # bars coarser than a day or an hour are resampled on the server
+    interval_dropdown = dcc.Dropdown(
+        id="interval_dropdown",
+        options=[
+            {"label": label, "value": interval}
+            for interval, label in INTERVAL_LABELS.items()
+        ],
+        value=session_default.interval,
+        clearable=False,
+        style={"width": "65%"},
+    )
 
     # arrange elts in div
     ticker_selection = html.Div(
-        [ticker_label, ticker_dropdown, date_label, date_range_picker],
+        [
+            ticker_label,
+            ticker_dropdown,
+            date_label,
+            date_range_picker,
+            interval_label,
+            interval_dropdown,
+        ],
         style={"width": "350px", "display": "inline-block"},
     )
     return ticker_selection
+
+
+def compare_settings() -> html.Div:
+    """Generate web elts for comparing several stocks.
+
+    The compared stocks share the date range of the stock settings.
+
+    Returns:
+        html.Div: div elt containing multi-select dropdown, button, status and graph
+    """
+    compare_dropdown = dcc.Dropdown(
+        id="compare_dropdown",
+        options=get_symbol_index().options(config.DEFAULT_TICKERS),
+        value=config.DEFAULT_TICKERS[:3],
+        multi=True,
+        placeholder="Select ticker symbols to compare",
+    )
+    compare_button = dbc.Button(
+        "Compare stocks", id="compare_button", color="primary", block=True, size="sm"
+    )
+    compare_graph = dcc.Graph(id="compare-graph")
+
+    return html.Div(
+        [
+            html.Label("Compare"),
+            compare_dropdown,
+            compare_button,
+            html.Div(id="compare_status"),
+            compare_graph,
+        ],
+        style={"padding-top": "20px"},
+    )
+
+
+def sweep_settings() -> html.Div:
+    """Generate web elts for sweeping the parameters of a signal rule.
+
+    The sweep uses the ticker, date range, interval and indicator settings of the
+    stock settings.
+
+    The scores of the last sweep are kept in sweep_store, so choosing another
+    metric only redraws the heatmap.
+
+    Returns:
+        html.Div: div elt containing rule and metric dropdowns, button, status, store
+            and graph
+    """
+    rule_dropdown = dcc.Dropdown(
+        id="sweep_rule",
+        options=[
+            {"label": f"{rule} ({spec.x_name} x {spec.y_name})", "value": rule}
+            for rule, spec in RULES.items()
+        ],
+        value="sma_cross",
+        clearable=False,
+    )
+    metric_dropdown = dcc.Dropdown(
+        id="sweep_metric",
+        options=[
+            {"label": label, "value": metric} for metric, label in METRICS.items()
+        ],
+        value="sharpe",
+        clearable=False,
+    )
+    sweep_button = dbc.Button(
+        "Sweep parameters", id="sweep_button", color="primary", block=True, size="sm"
+    )
+    sweep_graph = dcc.Graph(id="sweep-graph")
+
+    return html.Div(
+        [
+            html.Label("Parameter sweep"),
+            rule_dropdown,
+            metric_dropdown,
+            sweep_button,
+            html.Div(id="sweep_status"),
+            dcc.Store(id="sweep_store"),
+            sweep_graph,
+        ],
+        style={"padding-top": "20px"},
+    )
+
+
+def portfolio_settings() -> html.Div:
+    """Generate web elts for the risk analysis of a weighted portfolio.
+
+    The portfolio uses the date range of the stock settings.
+
+    Returns:
+        html.Div: div elt containing weights, index and VaR inputs, button, graph
+            and summary table
+    """
+    weights_input = dcc.Textarea(
+        id="portfolio_weights",
+        value=", ".join(config.DEFAULT_TICKERS[:5]),
+        placeholder="Ticker symbols and weights, e.g. AAPL 40, MSFT 35, NVDA",
+        style={"width": "100%", "height": "80px"},
+    )
+    index_input = dbc.InputGroup(
+        [
+            dbc.InputGroupAddon("Index", addon_type="prepend"),
+            dbc.Input(id="portfolio_index", value=config.PORTFOLIO_INDEX, type="text"),
+        ],
+        size="sm",
+    )
+    level_dropdown = dcc.Dropdown(
+        id="portfolio_level",
+        options=[{"label": f"VaR {level:.0%}", "value": level} for level in VAR_LEVELS],
+        value=config.PORTFOLIO_VAR_LEVEL,
+        clearable=False,
+    )
+    portfolio_button = dbc.Button(
+        "Analyze portfolio",
+        id="portfolio_button",
+        color="primary",
+        block=True,
+        size="sm",
+    )
+    portfolio_graph = dcc.Graph(id="portfolio-graph")
+
+    return html.Div(
+        [
+            html.Label("Portfolio risk"),
+            weights_input,
+            index_input,
+            level_dropdown,
+            portfolio_button,
+            html.Div(id="portfolio_status"),
+            portfolio_graph,
+            html.Div(id="portfolio_summary"),
+        ],
+        style={"padding-top": "20px"},
+    )
+
+
+def portfolio_table(summary: pd.DataFrame) -> dbc.Table:
+    """Generate a table of the portfolio risk summary, see portfolio.summary_table.
+
+    Args:
+        summary (pd.DataFrame): formatted risk measures
+
+    Returns:
+        dbc.Table: one row for the portfolio and per listed stock
+    """
+    return dbc.Table.from_dataframe(
+        summary, striped=True, bordered=False, hover=True, size="sm"
+    )
+
+
+def screener_settings() -> html.Div:
+    """Generate web elts for screening the symbol universe.
+
+    The screener uses the indicator settings and date range of the chart page.
+
+    Returns:
+        html.Div: div elt containing universe options, button, progress and results
+    """
+    etf_check = dcc.Checklist(
+        id="screen_etf",
+        options=[{"label": "Include ETFs", "value": "etf"}],
+        value=["etf"],
+    )
+    limit_input = dbc.InputGroup(
+        [
+            dbc.InputGroupAddon("Max. symbols", addon_type="prepend"),
+            dbc.Input(
+                id="screen_limit",
+                type="number",
+                min=1,
+                step=1,
+                placeholder="all",
+                style={"width": "10%"},
+            ),
+        ],
+        style={"width": "350px"},
+    )
+    screen_button = dbc.Button(
+        "Screen symbols", id="screen_button", color="primary", block=True, size="sm"
+    )
+    screen_progress = html.Div(
+        [
+            dbc.Progress(id="screen_progress", value=0, style={"height": "4px"}),
+            html.Div(id="screen_status"),
+        ]
+    )
+
+    return html.Div(
+        [
+            html.Div(
+                "Screen all listed symbols with the indicator settings and date "
+                "range of the chart page."
+            ),
+            etf_check,
+            limit_input,
+            screen_button,
+            screen_progress,
+            html.Div(id="screen_results"),
+        ],
+        style={"padding-top": "20px"},
+    )
+
+
+def screen_table(results: List[ScreenResult]) -> dbc.Table:
+    """Generate a table of ranked screener results.
+
+    Args:
+        results (List[ScreenResult]): ranked results, best first
+
+    Returns:
+        dbc.Table: one row per symbol
+    """
+    table = get_symbol_table()
+    rows = []
+    for position, result in enumerate(results, start=1):
+        row = table.lookup(result.ticker)
+        rows.append(
+            {
+                "Rank": position,
+                "Symbol": result.ticker,
+                "Name": "" if row is None else table.name(row),
+                "Date": result.date,
+                "Close": round(result.close, 2),
+                "RSI": round(result.rsi, 1),
+                "Signals": ", ".join(result.signals),
+                "Bias": result.bias,
+            }
+        )
+    return dbc.Table.from_dataframe(
+        pd.DataFrame(rows), striped=True, bordered=False, hover=True, size="sm"
+    )
@@ -0,0 +1,204 @@
+"""Local background job executor with in-flight deduplication and progress."""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fin import config
+from fin.domain.logic.shared_cache import SQLiteCache
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+# prefix of the shared cache keys of published jobs
+JOB_KEY_PREFIX = "job:"
+# missed heartbeats after which an unfinished published job is considered dead
+MISSED_HEARTBEATS = 3
+
+
+class Job:
+    """A unit of background work reporting its progress.
+
+    Args:
+        job_id (str): identifier of the job, identical requests share one job id
+        publish (Callable[[Job], None], optional): called with the job whenever its
+            state changed
+    """
+
+    def __init__(self, job_id: str, publish: Callable[["Job"], None] = None):
+        """Generate a pending job."""
+        self.job_id = job_id
+        self.publish = publish
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = "Waiting for a free worker"
+        self.result: Any = None
+        # intermediate result of a running job, e.g. the ranking screened so far
+        self.partial: Any = None
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        """Return True if the job is done or failed."""
+        return self.status in (DONE, FAILED)
+
+    def report(self, progress: float, message: str, partial: Any = None):
+        """Update the progress of a running job.
+
+        Args:
+            progress (float): share of the finished work between 0 and 1
+            message (str): description of the current step
+            partial (Any, optional): intermediate result which can already be shown
+        """
+        self.progress, self.message = progress, message
+        if partial is not None:
+            self.partial = partial
+        if self.publish is not None:
+            self.publish(self)
+
+    def to_dict(self) -> Dict:
+        """Return the job state which can be shown in the UI."""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+        }
+
+    def snapshot(self) -> Dict:
+        """Return the full job state including its (partial) result."""
+        return dict(self.to_dict(), result=self.result, partial=self.partial)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> "Job":
+        """Restore a job published by another process from its snapshot."""
+        job = cls(snapshot["job_id"])
+        for key in ("status", "progress", "message", "error", "result", "partial"):
+            setattr(job, key, snapshot[key])
+        return job
+
+
+class JobQueue:
+    """A thread pool running jobs in the background of the web server.
+
+    Submitting a job whose id is still pending or running returns the existing job
+    instead of starting a duplicate. Finished jobs are kept for ttl seconds, so
+    polling clients can pick up their results.
+
+    With a shared cache every state change of a job is published to it, so clients
+    polling a job through another process of a multi-process server see it, too.
+    Results then have to be JSON serializable. Unfinished jobs are republished
+    every heartbeat seconds along with the id of the owning process. A published
+    job missing MISSED_HEARTBEATS heartbeats, e.g. of a killed worker, is treated
+    as unknown, so it is submitted again instead of being polled forever.
+
+    Args:
+        max_workers (int): maximum number of concurrently running jobs
+        ttl (float): seconds finished jobs are kept
+        shared (SQLiteCache, optional): cache shared by the server processes
+        heartbeat (float): seconds between republishing unfinished jobs
+    """
+
+    def __init__(
+        self,
+        max_workers: int = config.JOB_WORKERS,
+        ttl: float = config.JOB_TTL,
+        shared: Optional[SQLiteCache] = None,
+        heartbeat: float = config.JOB_HEARTBEAT,
+    ):
+        """Generate a job queue."""
+        self.ttl = ttl
+        self.shared = shared
+        self.heartbeat = heartbeat
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="fin-job"
+        )
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: str, func: Callable[[Job], Any]) -> Job:
+        """Run func(job) in the background unless an identical job is in flight.
+
+        Args:
+            job_id (str): identifier of the job, e.g. a hash of its settings
+            func (Callable[[Job], Any]): work to do, its return value is the result
+
+        Returns:
+            Job: new or already running job
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job is not None and not job.finished:
+                return job
+            publish = None if self.shared is None else self._publish
+            job = self._jobs[job_id] = Job(job_id, publish)
+            if publish is not None and self._heartbeat_thread is None:
+                self._heartbeat_thread = threading.Thread(
+                    target=self._beat, name="fin-job-heartbeat", daemon=True
+                )
+                self._heartbeat_thread.start()
+        self._publish(job)
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a known job, possibly published by another process, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.shared is not None:
+            serialized = self.shared.get(JOB_KEY_PREFIX + job_id)
+            if serialized is not None:
+                snapshot = json.loads(serialized)
+                if snapshot["status"] in (DONE, FAILED) or (
+                    time.time() - snapshot.get("published", 0.0)
+                    <= MISSED_HEARTBEATS * self.heartbeat
+                ):
+                    job = Job.from_snapshot(snapshot)
+        return job
+
+    def _publish(self, job: Job):
+        """Store the state of a job in the shared cache."""
+        if self.shared is None:
+            return
+        snapshot = dict(job.snapshot(), owner=os.getpid(), published=time.time())
+        self.shared.set(JOB_KEY_PREFIX + job.job_id, json.dumps(snapshot))
+
+    def _beat(self):
+        """Republish the unfinished jobs of this process every heartbeat."""
+        while True:
+            time.sleep(self.heartbeat)
+            with self._lock:
+                running = [job for job in self._jobs.values() if not job.finished]
+            for job in running:
+                self._publish(job)
+
+    def _run(self, job: Job, func: Callable[[Job], Any]):
+        job.status = RUNNING
+        self._publish(job)
+        try:
+            job.result = func(job)
+        except Exception as error:
+            job.error = f"{type(error).__name__}: {error}"
+            job.message, status = "Failed", FAILED
+        else:
+            job.report(1.0, "Done")
+            status = DONE
+        # finished_at has to be set before the status is visible to _prune
+        job.finished_at = time.monotonic()
+        job.status = status
+        if job.publish is not None:
+            job.publish(job)
+
+    def _prune(self):
+        """Drop finished jobs older than ttl, the caller holds the lock."""
+        now = time.monotonic()
+        for job_id in [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.ttl
+        ]:
+            del self._jobs[job_id]
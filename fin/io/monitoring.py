@@ -0,0 +1,167 @@
+"""Expose metrics of the Dash server and optionally profile callback requests."""
+import atexit
+import cProfile
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Optional
+
+from flask import Flask, Response, g, request
+
+from fin import config
+from fin.domain.logic.shared_cache import SQLiteCache
+from fin.metrics import Registry, registry
+
+CALLBACK_PATH = "/_dash-update-component"
+
+callback_latency = registry.histogram(
+    "fin_callback_seconds", "Latency of Dash callback requests.", "callback"
+)
+
+
+def callback_name() -> str:
+    """Return the first output ("id.property") of the current callback request."""
+    payload = request.get_json(silent=True) or {}
+    outputs = payload.get("outputs")
+    if isinstance(outputs, list) and outputs:
+        outputs = outputs[0]
+    if isinstance(outputs, dict):
+        return f"{outputs.get('id')}.{outputs.get('property')}"
+    return str(payload.get("output", "unknown"))
+
+
+class SharedMetrics:
+    """Metrics of all processes of a multi-process server, summed through SQLite.
+
+    Every process publishes the counters and histograms of its registry to the
+    shared cache every interval seconds and when it exits. Rendering adds the
+    snapshots of all other processes to the current values of this process, so
+    /metrics reports the totals of the server whichever worker answers. Snapshots
+    of exited workers are kept, so totals do not drop when gunicorn replaces a
+    worker, gunicorn.conf.py clears them when the server starts. Gauges are
+    sampled by the answering process.
+
+    Args:
+        shared (SQLiteCache): cache shared by the server processes
+        registry (Registry): metrics of this process
+        interval (float): seconds between publishing the metrics
+    """
+
+    def __init__(
+        self,
+        shared: SQLiteCache,
+        registry: Registry = registry,
+        interval: float = config.METRICS_PUBLISH_INTERVAL,
+    ):
+        """Generate the shared metrics and start publishing them."""
+        self.shared = shared
+        self.registry = registry
+        self.interval = interval
+        # process ids are reused, the start time keeps the snapshots of exited
+        # processes apart
+        self.process = f"{os.getpid()}-{time.time_ns()}"
+        threading.Thread(
+            target=self._run, name="fin-metrics-publisher", daemon=True
+        ).start()
+        atexit.register(self._try_publish)
+
+    def publish(self):
+        """Store the current counters and histograms of this process."""
+        self.shared.publish_metrics(self.process, json.dumps(self.registry.snapshot()))
+
+    def render(self) -> str:
+        """Return the metrics of all processes in the Prometheus text format."""
+        self.publish()
+        others = [
+            json.loads(snapshot)
+            for snapshot in self.shared.metric_snapshots(exclude=self.process)
+        ]
+        return self.registry.render(others)
+
+    def _try_publish(self):
+        """Publish the metrics unless the database is unavailable."""
+        try:
+            self.publish()
+        except sqlite3.Error:
+            # a busy or removed database skips this snapshot
+            pass
+
+    def _run(self):
+        """Publish the metrics every interval."""
+        while True:
+            time.sleep(self.interval)
+            self._try_publish()
+
+
+def _start_profile(mode: str):
+    """Start profiling the current request."""
+    if mode == "cpu":
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+    elif mode == "memory":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        g.memory_before = tracemalloc.take_snapshot()
+
+
+def _dump_profile(mode: str, folder: Path, name: str):
+    """Stop profiling the current request and write the result to folder.
+
+    cpu writes a pstats file (open it with `python -m pstats` or snakeviz), memory
+    writes the allocations of the request grouped by source line.
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    safe_name = re.sub(r"[^\w.-]", "_", name)
+    stem = folder / f"{int(time.time() * 1000)}-{safe_name}"
+    if mode == "cpu" and "profiler" in g:
+        g.profiler.disable()
+        g.profiler.dump_stats(f"{stem}.prof")
+    elif mode == "memory" and "memory_before" in g:
+        statistics = tracemalloc.take_snapshot().compare_to(g.memory_before, "lineno")
+        with open(f"{stem}.txt", "w") as fh:
+            fh.write("\n".join(str(stat) for stat in statistics[:50]) + "\n")
+
+
+def instrument(
+    server: Flask,
+    profile_mode: str = config.PROFILE_MODE,
+    profile_folder: Path = config.PROFILE_FOLDER,
+    shared: Optional[SQLiteCache] = None,
+):
+    """Record callback latencies and serve all metrics on the /metrics route.
+
+    With a shared cache the counters and histograms of all server processes are
+    summed, see SharedMetrics, otherwise /metrics reports the current process.
+
+    Args:
+        server (Flask): server of the Dash app
+        profile_mode (str): "cpu" or "memory" profiles every callback request,
+            an empty string disables profiling
+        profile_folder (Path): folder receiving the profile dumps
+        shared (SQLiteCache, optional): cache shared by the server processes
+    """
+    render = registry.render if shared is None else SharedMetrics(shared).render
+
+    @server.before_request
+    def start_timer():
+        if request.path == CALLBACK_PATH:
+            g.request_start = time.perf_counter()
+            _start_profile(profile_mode)
+
+    @server.after_request
+    def observe_latency(response: Response) -> Response:
+        if request.path == CALLBACK_PATH and "request_start" in g:
+            name = callback_name()
+            callback_latency.observe(name, time.perf_counter() - g.request_start)
+            if profile_mode:
+                _dump_profile(profile_mode, profile_folder, name)
+        return response
+
+    @server.route("/metrics")
+    def metrics() -> Response:
+        return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -1,20 +1,59 @@
 """Main web layout definition."""
+import json
+from typing import Dict, List, Optional, Tuple
+
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
-import joblib
-import plotly.graph_objects as go
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
-
-from fin import config
-from fin.domain.logic.stocks import get_stocks_data, stocks_chart
+from flask_compress import Compress
+
+from fin import config, metrics
+from fin.domain.logic.cache import FigureCache, settings_key
+from fin.domain.logic.compare import comparison_chart, get_multi_stocks_data
+from fin.domain.logic.encoding import DECODE_FIGURE_JS
+from fin.domain.logic.live import EXTEND_FIGURE_JS, poll_live, start_live
+from fin.domain.logic.portfolio import (
+    get_portfolio_risk,
+    parse_weights,
+    risk_chart,
+    summary_table,
+)
+from fin.domain.logic.screener import ScreenResult, rank, screen, universe
+from fin.domain.logic.shared_cache import SQLiteCache
+from fin.domain.logic.stocks import (
+    SHOW_STUDIES_JS,
+    STUDY_CHECKS,
+    get_stocks_data,
+    intraday_store,
+    ohlc_store,
+    stocks_chart,
+    symbol_listeners,
+    with_all_studies,
+)
+from fin.domain.logic.sweep import SweepResult, sweep_heatmap, sweep_ticker
+from fin.domain.logic.symbol_directory import SymbolDiff
+from fin.domain.logic.symbols import get_symbol_index
+from fin.domain.session.sessionstore import SessionStore
+from fin.domain.session.usersession import UserSession
 from fin.domain.web_layout import core_elements
+from fin.io import monitoring
+from fin.io.jobs import DONE, FAILED, Job, JobQueue
 
 # create app
 external_stylesheets = [dbc.themes.BOOTSTRAP]
-app = dash.Dash(external_stylesheets=external_stylesheets)
+app = dash.Dash(external_stylesheets=external_stylesheets, compress=False)
+# compress responses with brotli where the browser supports it, gzip otherwise.
+# Dash would enforce gzip only, so compression is set up here
+app.server.config.update(
+    COMPRESS_ALGORITHM=config.COMPRESS_ALGORITHM,
+    COMPRESS_LEVEL=config.COMPRESS_LEVEL,
+    COMPRESS_BR_LEVEL=config.COMPRESS_BR_LEVEL,
+    COMPRESS_MIN_SIZE=config.COMPRESS_MIN_SIZE,
+)
+Compress(app.server)
 
 # set static web elements
 headline = html.H1("Stock Market Analysis")
@@ -24,305 +63,904 @@ stocks_div = core_elements.stock_settings()
 # load input web elements (sma, rsi, bollinger, etc.)
 features1_div, feature2_div = core_elements.feature_settings()
 
+# multi-select stock comparison
+compare_div = core_elements.compare_settings()
+
+# parameter sweep of a signal rule, shown as heatmap
+sweep_div = core_elements.sweep_settings()
+
+# risk of a weighted portfolio, shown next to the stock chart
+portfolio_div = core_elements.portfolio_settings()
+
+# universe-wide indicator screener, shown on its own page
+screener_div = core_elements.screener_settings()
+
 # button element which generates the chart
 button = dbc.Button(
     "Generate chart", id="generate_button", color="primary", block=True, size="sm"
 )
 
-# load initial displayed figure
-fig = joblib.load(config.DATA_FOLDER / "plug_fig.lzma")
-graph = dcc.Graph(id="stock-graph", figure=fig)
+# state shared by the processes of a multi-process server, see wsgi.py
+shared_cache = SQLiteCache() if config.SHARED_CACHE_PATH else None
 
-# set up data store element in order to store current board settings
-data_store = dcc.Store(id="data_store")
+# callback latencies and the Prometheus /metrics route, summed over all processes
+monitoring.instrument(app.server, shared=shared_cache)
 
-# set id names in order to identify web elements
-dropdown_state = ["ticker_dropdown_state"]
-ticker_date_range_state = [
-    "ticker_date_range_start_state",
-    "ticker_date_range_end_state",
-]
-check_state = [
-    "bollinger_check_state",
-    "macd_check_state",
-    "rsi_check_state",
-    "sma_check_state",
-]
-input_state = [
-    "bollinger_periods_state",
-    "boll_std_state",
-    "macd_fast_period_state",
-    "macd_slow_period_state",
-    "macd_signal_period_state",
-    "rsi_periods_state",
-    "rsi_lower_state",
-    "rsi_upper_state",
-    "sma_periods_state",
-]
+# figures shared by all sessions, dropped as soon as new data arrives for a ticker
+figure_cache = FigureCache(shared=shared_cache)
+ohlc_store.subscribe(figure_cache.invalidate)
+intraday_store.subscribe(figure_cache.invalidate)
 
-state_ids = dropdown_state + ticker_date_range_state + check_state + input_state
 
-# create html.Div store objects whose ids indicate their corresponding source using
-# their id name followed by a trailing "_state"
+def invalidate_symbol_figures(diff: SymbolDiff):
+    """Drop cached figures of the symbols added or removed by a directory refresh."""
+    for ticker in diff.added + diff.removed:
+        figure_cache.invalidate(ticker)
 
-state_store = html.Div(
-    children=[html.Div(id=state, style={"display": "none"}) for state in state_ids]
+
+symbol_listeners.append(invalidate_symbol_figures)
+
+# chart settings of every user, restored on the next visit. Sessions get their own
+# SQLite file, as entries of a shared cache expire with its figures
+session_store = SessionStore(
+    shared=SQLiteCache(
+        config.SESSION_STORE_PATH,
+        max_bytes=config.SESSION_STORE_MAX_BYTES,
+        ttl=config.SESSION_TTL,
+    )
+    if config.SESSION_STORE_PATH
+    else None
 )
 
 
-@app.callback(
-    Output("bollinger_check_state", "children"),
-    Input("bollinger_check", "value"),
+def figure_cache_samples() -> List[metrics.Sample]:
+    """Sample the figure cache statistics for the /metrics route."""
+    stats = figure_cache.stats()
+    requests = stats["hits"] + stats["misses"]
+    return [
+        (
+            "fin_figure_cache_requests_total",
+            "counter",
+            "Figure cache lookups by result.",
+            {
+                metrics.format_labels("result", "hit"): stats["hits"],
+                metrics.format_labels("result", "miss"): stats["misses"],
+            },
+        ),
+        (
+            "fin_figure_cache_hit_ratio",
+            "gauge",
+            "Share of figure cache lookups served from the cache.",
+            {"": stats["hits"] / requests if requests else 0.0},
+        ),
+        (
+            "fin_figure_cache_evictions_total",
+            "counter",
+            "Figures evicted from the cache.",
+            {"": stats["evictions"]},
+        ),
+        (
+            "fin_figure_cache_entries",
+            "gauge",
+            "Figures held in the cache.",
+            {"": stats["size"]},
+        ),
+    ]
+
+
+metrics.registry.collect(figure_cache_samples)
+
+# load initial displayed figure, plain JSON is passed to the layout without having
+# to decompress and validate a plotly figure
+with open(config.DATA_FOLDER / "plug_fig.json") as fh:
+    fig = json.load(fh)
+graph = dcc.Graph(id="stock-graph", figure=fig)
+# compactly encoded chart figure, decoded in the browser into the graph
+figure_store = dcc.Store(id="figure_store")
+
+# set up data store element in order to store current board settings
+data_store = dcc.Store(id="data_store")
+# settings of the chart currently shown, used to re-render it on zoom
+chart_store = dcc.Store(id="chart_store")
+# random id of the browser, the key of its session in session_store
+user_id = dcc.Store(id="user_id", storage_type="local")
+
+# charts are generated by background jobs whose progress is polled
+chart_jobs = JobQueue(shared=shared_cache)
+job_store = dcc.Store(id="job_store")
+chart_interval = dcc.Interval(
+    id="chart_interval", interval=config.JOB_POLL_INTERVAL_MS, disabled=True
+)
+chart_progress = html.Div(
+    [
+        dbc.Progress(id="chart_progress", value=0, style={"height": "4px"}),
+        html.Div(id="chart_status"),
+    ]
 )
-def store_bollinger_check_state(check_state: list):
-    """Store current checkbox value in corresponding Div elt.
 
-    bollinger_check -> bollinger_check_state
-    """
-    return check_state
+# live mode appends new bars to the shown chart instead of regenerating it
+live_switch = html.Div(
+    [
+        dbc.Checklist(
+            id="live_switch",
+            options=[{"label": "Live", "value": "live"}],
+            value=[],
+            switch=True,
+        ),
+        html.Div(id="live_status"),
+    ]
+)
+live_store = dcc.Store(id="live_store")
+live_interval = dcc.Interval(
+    id="live_interval", interval=config.LIVE_INTERVAL_MS, disabled=True
+)
 
+# screens run one at a time, each spreads the symbols across a process pool
+screen_jobs = JobQueue(max_workers=1, shared=shared_cache)
+screen_store = dcc.Store(id="screen_store")
+screen_interval = dcc.Interval(
+    id="screen_interval", interval=config.JOB_POLL_INTERVAL_MS, disabled=True
+)
 
-@app.callback(
-    Output("macd_check_state", "children"),
-    Input("macd_check", "value"),
+# pages are switched by the URL path, both stay in the layout so the screener can
+# use the settings of the chart page
+location = dcc.Location(id="url")
+navigation = dbc.Nav(
+    [
+        dbc.NavLink("Chart", href="/", active="exact"),
+        dbc.NavLink("Screener", href="/screener", active="exact"),
+    ],
+    pills=True,
 )
-def store_macd_check_state(check_state: list):
-    """Store current checkbox value in corresponding Div elt.
 
-    macd_check -> macd_check_state
-    """
-    return check_state
+# map each chart setting onto the web element property it is read from. Settings
+# of numeric input fields fall back to their placeholder if no value was entered.
+# The "_state" suffix is kept for the keys in order to match stocks_chart settings
+setting_sources = [
+    ("ticker_dropdown_state", "ticker_dropdown", "value", False),
+    ("ticker_date_range_start_state", "ticker_date_range", "start_date", False),
+    ("ticker_date_range_end_state", "ticker_date_range", "end_date", False),
+    ("interval_state", "interval_dropdown", "value", False),
+    ("bollinger_check_state", "bollinger_check", "value", False),
+    ("macd_check_state", "macd_check", "value", False),
+    ("rsi_check_state", "rsi_check", "value", False),
+    ("sma_check_state", "sma_check", "value", False),
+    ("bollinger_periods_state", "bollinger_periods", "value", True),
+    ("boll_std_state", "boll_std", "value", True),
+    ("macd_fast_period_state", "macd_fast_period", "value", True),
+    ("macd_slow_period_state", "macd_slow_period", "value", True),
+    ("macd_signal_period_state", "macd_signal_period", "value", True),
+    ("rsi_periods_state", "rsi_periods", "value", True),
+    ("rsi_lower_state", "rsi_lower", "value", True),
+    ("rsi_upper_state", "rsi_upper", "value", True),
+    ("sma_periods_state", "sma_periods", "value", True),
+]
 
+setting_inputs = []
+for _, component_id, component_property, has_placeholder in setting_sources:
+    setting_inputs.append(Input(component_id, component_property))
+    if has_placeholder:
+        setting_inputs.append(Input(component_id, "placeholder"))
 
-@app.callback(
-    Output("rsi_check_state", "children"),
-    Input("rsi_check", "value"),
+# collect all settings in the browser into one data_store payload, so changing a
+# setting does not cost a request to the server
+app.clientside_callback(
+    """
+    function() {
+        const sources = %s;
+        const settings = {};
+        let i = 0;
+        for (const [name, hasPlaceholder] of sources) {
+            let value = arguments[i++];
+            if (hasPlaceholder) {
+                const placeholder = arguments[i++];
+                value = value || placeholder;
+            }
+            settings[name] = value;
+        }
+        return settings;
+    }
+    """
+    % json.dumps([[name, default] for name, _, _, default in setting_sources]),
+    Output("data_store", "data"),
+    setting_inputs,
 )
-def store_rsi_check_state(check_state: list):
-    """Store current checkbox value in corresponding Div elt.
 
-    rsi_check -> rsi_check_state
+
+def search_options(search_value: str, selected) -> List[Dict[str, str]]:
+    """Look up dropdown options for ticker symbols matching typed text.
+
+    Args:
+        search_value (str): text typed into a ticker dropdown
+        selected (str or List[str]): currently selected ticker symbol(s)
+
+    Raises:
+        PreventUpdate: keep current options if nothing was typed
+
+    Returns:
+        List[Dict[str, str]]: best matching dropdown options
     """
-    return check_state
+    if not search_value:
+        raise PreventUpdate
+    symbol_index = get_symbol_index()
+    options = symbol_index.search(search_value, limit=config.TICKER_SEARCH_LIMIT)
+    # selected symbols have to stay among the options in order to keep them shown
+    selected = [selected] if isinstance(selected, str) else selected or []
+    found = [option["value"] for option in options]
+    return options + symbol_index.options(
+        [ticker for ticker in selected if ticker not in found]
+    )
 
 
 @app.callback(
-    Output("sma_check_state", "children"),
-    Input("sma_check", "value"),
+    Output("ticker_dropdown", "options"),
+    Input("ticker_dropdown", "search_value"),
+    Input("ticker_dropdown", "value"),
+    State("ticker_dropdown", "options"),
 )
-def store_sma_check_state(check_state: list):
-    """Store current checkbox value in corresponding Div elt.
+def search_ticker_symbols(
+    search_value: str, selected: str, options: List[Dict[str, str]]
+) -> List[Dict[str, str]]:
+    """Look up ticker symbols matching the text typed into the dropdown.
 
-    sma_check -> sma_check_state
+    A symbol selected without typing, i.e. restored from the user session, is added
+    to the options in order to be shown.
+
+    ticker_dropdown (search_value, value) -> ticker_dropdown (options)
     """
-    return check_state
+    triggered = [item["prop_id"] for item in dash.callback_context.triggered]
+    if "ticker_dropdown.value" in triggered and not search_value:
+        if not selected or selected in [option["value"] for option in options]:
+            raise PreventUpdate
+        return options + get_symbol_index().options([selected])
+    return search_options(search_value, selected)
 
 
 @app.callback(
-    Output("bollinger_periods_state", "children"),
-    Input("bollinger_periods", "value"),
-    Input("bollinger_periods", "placeholder"),
+    Output("compare_dropdown", "options"),
+    Input("compare_dropdown", "search_value"),
+    State("compare_dropdown", "value"),
 )
-def store_boll_periods_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+def search_compare_symbols(
+    search_value: str, selected: List[str]
+) -> List[Dict[str, str]]:
+    """Look up ticker symbols matching the text typed into the compare dropdown.
 
-    bollinger_periods (value  or placeholder) -> bollinger_periods_state
+    compare_dropdown (search_value) -> compare_dropdown (options)
     """
-    return setting_val or setting_default
+    return search_options(search_value, selected)
 
 
 @app.callback(
-    Output("boll_std_state", "children"),
-    Input("boll_std", "value"),
-    Input("boll_std", "placeholder"),
+    Output("compare-graph", "figure"),
+    Output("compare_status", "children"),
+    Input("compare_button", "n_clicks"),
+    State("compare_dropdown", "value"),
+    State("data_store", "data"),
 )
-def store_boll_std_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+def compare_stocks(n_clicks: int, ticker_symbols: List[str], settings: Dict) -> Tuple:
+    """Generate comparison chart of the selected stocks on click event.
+
+    Args:
+        n_clicks (int): number the button was clicked
+        ticker_symbols (List[str]): selected ticker symbols
+        settings (Dict): chart settings collected in data_store
 
-    boll_std (value  or placeholder) -> boll_std_state
+    Raises:
+        PreventUpdate: prevent code execution on initial run or without selection
+
+    Returns:
+        Tuple: comparison chart figure, empty if no stock has data, and status
+            message naming the skipped stocks
     """
-    return setting_val or setting_default
+    if n_clicks is None or not ticker_symbols or settings is None:
+        raise PreventUpdate
+    # all stocks are requested concurrently and aligned on one trading calendar
+    closes, failed = get_multi_stocks_data(
+        ticker_symbols,
+        settings["ticker_date_range_start_state"],
+        settings["ticker_date_range_end_state"],
+    )
+    without_data = [
+        ticker
+        for ticker in dict.fromkeys(ticker_symbols)
+        if ticker not in failed and (closes.empty or ticker not in closes)
+    ]
+    messages = [f"Cannot load {ticker}, {error}" for ticker, error in failed.items()]
+    if without_data:
+        messages.append(f"No data of {', '.join(without_data)} in the date range")
+    status = html.Div([html.Div(message) for message in messages])
+    if closes.empty:
+        return {}, status
+    return comparison_chart(closes), status
 
 
 @app.callback(
-    Output("ticker_dropdown_state", "children"),
-    Input("ticker_dropdown", "value"),
+    Output("sweep_store", "data"),
+    Output("sweep_status", "children"),
+    Input("sweep_button", "n_clicks"),
+    State("sweep_rule", "value"),
+    State("data_store", "data"),
 )
-def ticker_dropdown_state(setting_val):
-    """Store current dropdown value in corresponding Div elt.
+def sweep_parameters(n_clicks: int, rule: str, settings: Dict) -> Tuple:
+    """Sweep the parameters of a signal rule on click event.
 
-    ticker_dropdown -> ticker_dropdown_state
+    Args:
+        n_clicks (int): number the button was clicked
+        rule (str): swept signal rule
+        settings (Dict): chart settings collected in data_store
+
+    Raises:
+        PreventUpdate: prevent code execution on initial run
+
+    Returns:
+        Tuple: scores of the sweep, see SweepResult.to_dict, and status message
     """
-    return setting_val
+    if n_clicks is None or settings is None:
+        raise PreventUpdate
+    try:
+        # the whole grid is scored in a few batched array operations
+        result = sweep_ticker(
+            settings["ticker_dropdown_state"],
+            rule,
+            settings,
+            settings["ticker_date_range_start_state"],
+            settings["ticker_date_range_end_state"],
+            settings.get("interval_state", "1d"),
+        )
+    except ValueError as error:
+        return None, f"Cannot sweep the parameters, {error}"
+    return result.to_dict(), ""
 
 
 @app.callback(
-    Output("ticker_date_range_start_state", "children"),
-    Input("ticker_date_range", "start_date"),
+    Output("sweep-graph", "figure"),
+    Input("sweep_store", "data"),
+    Input("sweep_metric", "value"),
 )
-def ticker_date_range_start_state(setting_val):
-    """Store current date range start value in corresponding Div elt.
+def show_sweep(sweep_data: Dict, metric: str):
+    """Draw the heatmap of the chosen metric from the stored sweep scores.
 
-    ticker_date_range (start_date) -> ticker_date_range_start_state
+    Args:
+        sweep_data (Dict): scores of the last sweep, see SweepResult.to_dict
+        metric (str): metric shown in the heatmap
+
+    Returns:
+        go.Figure: heatmap of the metric over the parameter grid, empty without
+            scores
     """
-    return setting_val
+    if sweep_data is None:
+        return {}
+    return sweep_heatmap(SweepResult.from_dict(sweep_data), metric)
 
 
 @app.callback(
-    Output("ticker_date_range_end_state", "children"),
-    Input("ticker_date_range", "end_date"),
+    Output("portfolio-graph", "figure"),
+    Output("portfolio_summary", "children"),
+    Output("portfolio_status", "children"),
+    Input("portfolio_button", "n_clicks"),
+    State("portfolio_weights", "value"),
+    State("portfolio_index", "value"),
+    State("portfolio_level", "value"),
+    State("data_store", "data"),
 )
-def ticker_date_range_end_state(setting_val):
-    """Store current date range end value in corresponding Div elt.
+def analyze_portfolio(
+    n_clicks: int, weights_text: str, index_symbol: str, level: float, settings: Dict
+) -> Tuple:
+    """Analyze the risk of the entered portfolio on click event.
 
-    ticker_date_range (end_date) -> ticker_date_range_end_state
+    Args:
+        n_clicks (int): number the button was clicked
+        weights_text (str): ticker symbols and weights, see portfolio.parse_weights
+        index_symbol (str): ticker symbol of the index betas refer to
+        level (float): VaR confidence level
+        settings (Dict): chart settings collected in data_store
+
+    Raises:
+        PreventUpdate: prevent code execution on initial run
+
+    Returns:
+        Tuple: risk chart, summary table and status message naming the skipped
+            stocks
     """
-    return setting_val
+    if n_clicks is None or settings is None:
+        raise PreventUpdate
+    index_symbol = (index_symbol or config.PORTFOLIO_INDEX).strip().upper()
+    try:
+        weights = parse_weights(weights_text)
+        # all stocks are requested concurrently, the measures are computed on one
+        # aligned panel of returns
+        risk, failed = get_portfolio_risk(
+            weights,
+            settings["ticker_date_range_start_state"],
+            settings["ticker_date_range_end_state"],
+            index_symbol,
+            level=level,
+        )
+    except ValueError as error:
+        return dash.no_update, dash.no_update, f"Cannot analyze the portfolio, {error}"
+    # stocks without a return in the date range have no measures
+    no_returns = risk.assets.index[risk.assets["annual_return"].isna()]
+    without_data = [ticker for ticker in no_returns if ticker not in failed]
+    messages = [f"Cannot load {ticker}, {error}" for ticker, error in failed.items()]
+    if without_data:
+        messages.append(f"No data of {', '.join(without_data)} in the date range")
+    return (
+        risk_chart(risk, index_symbol),
+        core_elements.portfolio_table(summary_table(risk)),
+        html.Div([html.Div(message) for message in messages]),
+    )
+
+
+def relayout_x_range(relayout_data: Dict) -> Optional[Tuple[str, str]]:
+    """Extract the visible x axis range from a graph's relayoutData.
 
+    Args:
+        relayout_data (Dict): relayoutData of the stock graph
 
-@app.callback(
-    Output("macd_fast_period_state", "children"),
-    Input("macd_fast_period", "value"),
-    Input("macd_fast_period", "placeholder"),
-)
-def macd_fast_period_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+    Raises:
+        PreventUpdate: the x axis range did not change (e.g. y axis zoom, autosize)
 
-    macd_fast_period (value or placeholder) -> macd_fast_period_state
+    Returns:
+        Optional[Tuple[str, str]]: first and last visible date, None if the whole
+            range is shown
     """
-    return setting_val or setting_default
+    relayout_data = relayout_data or {}
+    if relayout_data.get("xaxis.autorange"):
+        return None
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        return relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    if "xaxis.range" in relayout_data:
+        return tuple(relayout_data["xaxis.range"][:2])
+    raise PreventUpdate
 
 
-@app.callback(
-    Output("macd_slow_period_state", "children"),
-    Input("macd_slow_period", "value"),
-    Input("macd_slow_period", "placeholder"),
-)
-def macd_slow_period_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+def render_chart(
+    job: Job, kwargs_dict: Dict, x_range: Optional[Tuple[str, str]]
+) -> str:
+    """Fetch stock data and generate the chart figure in a background job.
 
-    macd_slow_period (value or placeholder) -> macd_slow_period_state
+    Args:
+        job (Job): job reporting the progress to the UI
+        kwargs_dict (Dict): chart settings collected in data_store
+        x_range (Tuple[str, str], optional): zoomed window shown in full resolution
+
+    Returns:
+        str: serialized chart figure, also stored in the figure cache
     """
-    return setting_val or setting_default
+    job.report(0.1, "Loading stock data")
+    # request stock data from yf API
+    with metrics.span("fetch"):
+        stocks_df = get_stocks_data(
+            kwargs_dict["ticker_dropdown_state"],
+            kwargs_dict["ticker_date_range_start_state"],
+            kwargs_dict["ticker_date_range_end_state"],
+            kwargs_dict.get("interval_state", "1d"),
+        )
+    # generate graph, the indicators and figure spans are recorded by stocks_chart
+    job.report(0.6, "Generating chart")
+    fig = stocks_chart(stocks_df, kwargs_dict, x_range=x_range)
+    job.report(0.9, "Serializing chart")
+    with metrics.span("serialize"):
+        return figure_cache.set(dict(kwargs_dict, x_range=x_range), fig)
 
 
-@app.callback(
-    Output("macd_signal_period_state", "children"),
-    Input("macd_signal_period", "value"),
-    Input("macd_signal_period", "placeholder"),
-)
-def macd_signal_period_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+def chart_response(chart_request: Dict, polling: bool) -> Tuple:
+    """Serve a chart request from the figure cache or through a background job.
+
+    Identical requests share one job id (the hash of their settings), so they attach
+    to the same in-flight job instead of starting a duplicate. Charts always contain
+    all studies, the study checklists only toggle them in the browser.
+
+    Args:
+        chart_request (Dict): chart settings ("settings") and zoom window ("x_range")
+        polling (bool): True if the request is polled by chart_interval
 
-    macd_signal_period (value or placeholder) -> macd_signal_period_state
+    Returns:
+        Tuple: outputs of store_chart_settings
     """
-    return setting_val or setting_default
+    settings = with_all_studies(chart_request["settings"])
+    x_range = chart_request["x_range"]
+    cache_settings = dict(settings, x_range=x_range)
+    job_id = settings_key(cache_settings)
+
+    job = chart_jobs.get(job_id)
+    if job is None or (job.finished and not polling):
+        serialized = figure_cache.get(cache_settings)
+        if serialized is not None:
+            return json.loads(serialized), settings, None, True, 100, ""
+        job = chart_jobs.submit(
+            job_id, lambda job: render_chart(job, settings, tuple_or_none(x_range))
+        )
+
+    if job.status == DONE:
+        return json.loads(job.result), settings, None, True, 100, ""
+    if job.status == FAILED:
+        message = f"Generating the chart failed ({job.error})"
+        return dash.no_update, dash.no_update, None, True, 0, message
+    # keep polling while the job is pending or running
+    progress = int(job.progress * 100)
+    return dash.no_update, dash.no_update, chart_request, False, progress, job.message
+
+
+def tuple_or_none(x_range: Optional[List[str]]) -> Optional[Tuple[str, str]]:
+    """Restore a zoom window after its round trip through a JSON store."""
+    return None if x_range is None else (x_range[0], x_range[1])
 
 
 @app.callback(
-    Output("rsi_periods_state", "children"),
-    Input("rsi_periods", "value"),
-    Input("rsi_periods", "placeholder"),
+    Output(component_id="figure_store", component_property="data"),
+    Output(component_id="chart_store", component_property="data"),
+    Output(component_id="job_store", component_property="data"),
+    Output(component_id="chart_interval", component_property="disabled"),
+    Output(component_id="chart_progress", component_property="value"),
+    Output(component_id="chart_status", component_property="children"),
+    Input(component_id="generate_button", component_property="n_clicks"),
+    Input(component_id="stock-graph", component_property="relayoutData"),
+    Input(component_id="chart_interval", component_property="n_intervals"),
+    State(component_id="data_store", component_property="data"),
+    State(component_id="chart_store", component_property="data"),
+    State(component_id="job_store", component_property="data"),
+    State(component_id="user_id", component_property="data"),
 )
-def rsi_periods_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+def store_chart_settings(
+    n_clicks: int,
+    relayout_data: Dict,
+    n_intervals: int,
+    kwargs_dict: Dict,
+    chart_settings: Dict,
+    chart_request: Dict,
+    user: str,
+) -> Tuple:
+    """Generate chart on click event based on data_store settings.
+
+    Charts are generated by a background job, chart_interval polls the job until
+    the figure is ready. Zooming into the chart re-generates the shown chart with the
+    zoomed window in full resolution, while the overview stays downsampled. The
+    settings of a click are validated and saved as session of the user.
 
-    rsi_period (value or placeholder) -> rsi_period_state
+    Args:
+        n_clicks (int): number the button was clicked
+        relayout_data (Dict): zoom and pan events of the stock graph
+        n_intervals (int): number of polls of the running job
+        kwargs_dict (Dict): chart settings collected in data_store
+        chart_settings (Dict): settings of the currently shown chart
+        chart_request (Dict): chart request of the running job
+        user (str): id of the user, see user_id
+
+    Raises:
+        PreventUpdate: prevent code execution on initial run
+
+    Returns:
+        Tuple: chart figure, settings of the shown chart, running chart request,
+            whether polling is disabled, progress in percent and status message
     """
-    return setting_val or setting_default
+    triggered = [item["prop_id"] for item in dash.callback_context.triggered]
+    if "chart_interval.n_intervals" in triggered:
+        if chart_request is None:
+            raise PreventUpdate
+        return chart_response(chart_request, polling=True)
+    if "stock-graph.relayoutData" in triggered:
+        if chart_settings is None:
+            raise PreventUpdate
+        # zoom into the shown chart, ignoring unapplied changes of the settings
+        x_range = relayout_x_range(relayout_data)
+        return chart_response(
+            {"settings": chart_settings, "x_range": x_range}, polling=False
+        )
+    if n_clicks is None or kwargs_dict is None:
+        # prevent execution on init run
+        raise PreventUpdate
+    try:
+        session = UserSession.from_settings(kwargs_dict)
+    except ValueError as error:
+        message = f"Cannot generate the chart, {error}"
+        return dash.no_update, dash.no_update, None, True, 0, message
+    if user:
+        session_store.set(user, session)
+    return chart_response(
+        {"settings": session.to_settings(), "x_range": None}, polling=False
+    )
+
+
+# assign every browser a random id once, kept in its local storage
+app.clientside_callback(
+    """
+    function(pathname, user) {
+        if (user) {
+            return window.dash_clientside.no_update;
+        }
+        const bytes = new Uint8Array(16);
+        window.crypto.getRandomValues(bytes);
+        return Array.from(bytes, b => b.toString(16).padStart(2, "0")).join("");
+    }
+    """,
+    Output("user_id", "data"),
+    Input("url", "pathname"),
+    State("user_id", "data"),
+)
 
 
 @app.callback(
-    Output("rsi_lower_state", "children"),
-    Input("rsi_lower", "value"),
-    Input("rsi_lower", "placeholder"),
+    [Output(component_id, prop) for _, component_id, prop, _ in setting_sources],
+    Input("user_id", "data"),
 )
-def rsi_lower_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+def restore_session(user: str) -> List:
+    """Restore the settings the user generated their last chart with.
+
+    user_id (data) -> setting web elements (value, start_date, end_date)
 
-    rsi_lower (value or placeholder) -> rsi_lower_state
+    Raises:
+        PreventUpdate: keep the defaults if no session of the user is stored
     """
-    return setting_val or setting_default
+    session = session_store.get(user) if user else None
+    if session is None:
+        raise PreventUpdate
+    settings = session.to_settings()
+    return [settings[name] for name, _, _, _ in setting_sources]
+
+
+def live_message(live_state: Dict) -> str:
+    """Describe the newest bar of a live chart."""
+    forming = live_state["forming"]
+    if forming is None:
+        return "Live, waiting for new bars"
+    return f"Live, forming bar {forming['date']}: close {forming['close']:.2f}"
 
 
 @app.callback(
-    Output("rsi_upper_state", "children"),
-    Input("rsi_upper", "value"),
-    Input("rsi_upper", "placeholder"),
+    Output("live_store", "data"),
+    Output("live_interval", "disabled"),
+    Output("live_status", "children"),
+    Input("live_switch", "value"),
+    Input("live_interval", "n_intervals"),
+    Input("figure_store", "modified_timestamp"),
+    State("chart_store", "data"),
+    State("live_store", "data"),
 )
-def rsi_upper_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+def follow_live_chart(
+    live: List[str],
+    n_intervals: int,
+    revision: int,
+    chart_settings: Dict,
+    live_state: Dict,
+) -> Tuple:
+    """Poll the bars following the shown chart while live mode is on.
+
+    The live state is rebuilt whenever a new figure is shown, e.g. after zooming,
+    and otherwise advanced by the bars that arrived since the previous poll. The
+    completed bars are applied to the graph by a clientside callback.
+
+    Args:
+        live (List[str]): ["live"] if live mode is on
+        n_intervals (int): number of polls
+        revision (int): modification time of the shown figure
+        chart_settings (Dict): settings of the currently shown chart
+        live_state (Dict): live state of the previous poll
 
-    rsi_upper (value or placeholder) -> rsi_upper_state
+    Returns:
+        Tuple: live state, whether polling is disabled and status message
     """
-    return setting_val or setting_default
+    if not live:
+        return None, True, ""
+    if chart_settings is None:
+        return None, True, "Generate a chart to follow it live"
+    if live_state is None or live_state.get("revision") != revision:
+        live_state = start_live(chart_settings)
+    if live_state["since"] is not None:
+        live_state = poll_live(live_state, chart_settings)
+    live_state["revision"] = revision
+    return live_state, False, live_message(live_state)
 
 
-@app.callback(
-    Output("sma_periods_state", "children"),
-    Input("sma_periods", "value"),
-    Input("sma_periods", "placeholder"),
-)
-def sma_periods_state(setting_val, setting_default):
-    """Store current input value in corresponding Div elt.
+def run_screen(job: Job, tickers: List[str], settings: Dict) -> List[ScreenResult]:
+    """Screen symbols in a background job, publishing the ranking so far.
+
+    Args:
+        job (Job): job reporting the progress and partial ranking to the UI
+        tickers (List[str]): ticker symbols to screen
+        settings (Dict): chart settings collected in data_store
 
-    sma_periods (value or placeholder) -> sma_periods_state
+    Returns:
+        List[ScreenResult]: final ranking
     """
-    return setting_val or setting_default
+    job.report(0.0, "Starting worker processes")
+    ranked: List[ScreenResult] = []
+    screened = failed = 0
+    for chunk in screen(
+        tickers,
+        settings,
+        settings["ticker_date_range_start_state"],
+        settings["ticker_date_range_end_state"],
+    ):
+        # the top results of all chunks so far are among ranked and the new chunk
+        ranked = rank(ranked + chunk)
+        screened += len(chunk)
+        failed += sum(result.error is not None for result in chunk)
+        job.report(
+            screened / len(tickers),
+            f"Screened {screened} of {len(tickers)} symbols, {failed} without data",
+            partial=ranked,
+        )
+    return ranked
+
+
+def screen_response(job: Job) -> Tuple:
+    """Show the ranking of a screen job and keep polling while it runs.
 
+    Args:
+        job (Job): running or finished screen job
 
-states = [State(state_id, "children") for state_id in state_ids]
+    Returns:
+        Tuple: outputs of screen_symbols
+    """
+    ranked = job.result if job.status == DONE else job.partial
+    # jobs published by another server process arrive as plain JSON lists
+    ranked = [ScreenResult(*result) for result in ranked or []]
+    results = (
+        core_elements.screen_table(ranked)
+        if ranked
+        else html.Div("No symbol matched yet.")
+    )
+    if job.status == FAILED:
+        message = f"Screening failed ({job.error})"
+        return results, None, True, 0, message
+    if job.status == DONE:
+        return results, None, True, 100, f"Done, {len(ranked)} top symbols shown"
+    return results, job.job_id, False, int(job.progress * 100), job.message
 
 
 @app.callback(
-    Output(component_id="stock-graph", component_property="figure"),
-    Input(component_id="generate_button", component_property="n_clicks"),
-    states,
+    Output("screen_results", "children"),
+    Output("screen_store", "data"),
+    Output("screen_interval", "disabled"),
+    Output("screen_progress", "value"),
+    Output("screen_status", "children"),
+    Input("screen_button", "n_clicks"),
+    Input("screen_interval", "n_intervals"),
+    State("data_store", "data"),
+    State("screen_etf", "value"),
+    State("screen_limit", "value"),
+    State("screen_store", "data"),
 )
-def store_chart_settings(n_clicks: int, *args) -> go.Figure:
-    """Generate chart on click event based on states settings.
+def screen_symbols(
+    n_clicks: int,
+    n_intervals: int,
+    settings: Dict,
+    etf: List[str],
+    limit: int,
+    job_id: str,
+) -> Tuple:
+    """Screen the symbol universe on click event based on data_store settings.
+
+    The screen runs in a background job, screen_interval polls the job and shows
+    the ranking of the symbols screened so far.
 
     Args:
         n_clicks (int): number the button was clicked
+        n_intervals (int): number of polls of the running job
+        settings (Dict): chart settings collected in data_store
+        etf (List[str]): ["etf"] if ETFs are screened as well
+        limit (int): maximum number of screened symbols, None screens all
+        job_id (str): id of the running screen job
 
     Raises:
         PreventUpdate: prevent code execution on initial run
 
     Returns:
-        go.Figure: chart figure
+        Tuple: results table, running job id, whether polling is disabled,
+            progress in percent and status message
     """
-    # TODO: Add docstring
-    # TODO: read out chart settings
-    if n_clicks is None:
-        # prevent execution on init run
+    triggered = [item["prop_id"] for item in dash.callback_context.triggered]
+    if "screen_interval.n_intervals" in triggered:
+        job = screen_jobs.get(job_id) if job_id else None
+        if job is None:
+            raise PreventUpdate
+        return screen_response(job)
+    if n_clicks is None or settings is None:
         raise PreventUpdate
-    else:
-        # make component properties  values accessable by their component id name
-        input_names = [state_item.component_id for state_item in states]
-        kwargs_dict = dict(zip(input_names, args))
 
-        # request stock data from yf API
-        stocks_df = get_stocks_data(
-            kwargs_dict["ticker_dropdown_state"],
-            kwargs_dict["ticker_date_range_start_state"],
-            kwargs_dict["ticker_date_range_end_state"],
-        )
-        # generate graph
-        fig = stocks_chart(stocks_df, kwargs_dict)
+    tickers = universe(etf=None if etf else False)[:limit]
+    job = screen_jobs.submit(
+        settings_key(dict(settings, screen_etf=bool(etf), screen_limit=limit)),
+        lambda job: run_screen(job, tickers, settings),
+    )
+    return screen_response(job)
 
-    return fig
+
+@app.callback(
+    Output("chart_page", "style"),
+    Output("screener_page", "style"),
+    Input("url", "pathname"),
+)
+def display_page(pathname: str) -> Tuple[Dict, Dict]:
+    """Show the page selected by the URL path.
+
+    url (pathname) -> chart_page (style), screener_page (style)
+    """
+    hidden = {"display": "none"}
+    if pathname == "/screener":
+        return hidden, {}
+    return {}, hidden
+
+
+# decode the typed arrays of a new figure in the browser, see
+# fin.domain.logic.encoding, and show the studies selected by the checklists.
+# Toggling a study only changes the shown figure, without a request to the server.
+# The completed bars of a live poll are applied to the shown figure, without
+# re-sending the shown history
+app.clientside_callback(
+    """
+    function(encoded, ...args) {
+        const figure = args.pop();
+        const revision = args.pop();
+        const live = args.pop();
+        const studies = %s;
+        const checks = {};
+        studies.forEach((study, i) => {
+            checks[study] = Boolean((args[i] || []).length);
+        });
+        const triggered = window.dash_clientside.callback_context.triggered
+            .map(item => item.prop_id);
+        let shown = figure;
+        if (encoded && (!figure || triggered.includes("figure_store.data"))) {
+            shown = (%s)(encoded);
+        } else if (triggered.includes("live_store.data")) {
+            shown = (%s)(figure, live, revision);
+        }
+        if (!shown || shown === window.dash_clientside.no_update) {
+            return window.dash_clientside.no_update;
+        }
+        return (%s)(shown, checks);
+    }
+    """
+    % (
+        json.dumps(list(STUDY_CHECKS)),
+        DECODE_FIGURE_JS,
+        EXTEND_FIGURE_JS,
+        SHOW_STUDIES_JS,
+    ),
+    Output("stock-graph", "figure"),
+    Input("figure_store", "data"),
+    [Input(key[: -len("_state")], "value") for key in STUDY_CHECKS.values()],
+    Input("live_store", "data"),
+    State("figure_store", "modified_timestamp"),
+    State("stock-graph", "figure"),
+)
 
 
 test_div = html.Div(id="store_point")
-app.layout = html.Div(
+chart_page = html.Div(
+    id="chart_page",
     children=[
-        headline,
         description,
         html.Div(children=[stocks_div, features1_div, feature2_div]),
         button,
-        graph,
+        chart_progress,
+        live_switch,
+        dbc.Row([dbc.Col(graph, lg=8), dbc.Col(portfolio_div, lg=4)], no_gutters=True),
+        compare_div,
+        sweep_div,
         test_div,
-        state_store,
+    ],
+)
+screener_page = html.Div(id="screener_page", children=[screener_div])
+app.layout = html.Div(
+    children=[
+        location,
+        headline,
+        navigation,
+        chart_page,
+        screener_page,
         data_store,
+        figure_store,
+        chart_store,
+        user_id,
+        job_store,
+        chart_interval,
+        live_store,
+        live_interval,
+        screen_store,
+        screen_interval,
     ]
 )
@@ -0,0 +1,240 @@
+"""In-process metrics rendered in the Prometheus text exposition format."""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+# upper bounds of the latency histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# collectors return samples as (metric name, type, help, {label set: value}), the
+# label set may be preceded by a suffix of the metric name, e.g. "_sum"
+Sample = Tuple[str, str, str, Dict[str, float]]
+# types whose samples of several processes add up to the samples of all processes
+ADDITIVE_TYPES = ("counter", "histogram")
+
+
+def format_labels(label: str, value: str, **extra: str) -> str:
+    """Format a Prometheus label set, omitting an empty main label."""
+    pairs = ([(label, value)] if label else []) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(val).replace("\\", "\\\\").replace('"', '\\"')) for key, val in pairs
+    )
+    return "{" + ",".join(f'{key}="{val}"' for key, val in escaped) + "}"
+
+
+def render_sample(sample: Sample) -> List[str]:
+    """Return the exposition lines of a sample."""
+    name, kind, help_text, values = sample
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    return lines + [f"{name}{labels} {value}" for labels, value in values.items()]
+
+
+def merge_samples(
+    samples: List[Sample], others: Iterable[List[Sample]]
+) -> List[Sample]:
+    """Add up the counters and histograms of several processes.
+
+    Args:
+        samples (List[Sample]): samples of this process
+        others (Iterable[List[Sample]]): samples of the other processes, their
+            samples of other types are ignored
+
+    Returns:
+        List[Sample]: samples of this process, counters and histograms summed
+    """
+    merged = {
+        name: (name, kind, help_text, dict(values))
+        for name, kind, help_text, values in samples
+    }
+    for other in others:
+        for name, kind, help_text, values in other:
+            if kind not in ADDITIVE_TYPES:
+                continue
+            total = merged.setdefault(name, (name, kind, help_text, {}))
+            if total[1] != kind:
+                continue
+            for labels, value in values.items():
+                total[3][labels] = total[3].get(labels, 0) + value
+    return list(merged.values())
+
+
+class Counter:
+    """A monotonically increasing count per label value.
+
+    Args:
+        name (str): metric name, should end with "_total"
+        help_text (str): description shown by Prometheus
+        label (str): name of the label distinguishing the counts, may be empty
+    """
+
+    def __init__(self, name: str, help_text: str, label: str = ""):
+        """Generate a counter."""
+        self.name, self.help_text, self.label = name, help_text, label
+        self._values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str = "", amount: float = 1):
+        """Increase the count of label_value by amount."""
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def sample(self) -> Sample:
+        """Return the current counts."""
+        with self._lock:
+            values = {
+                format_labels(self.label, label_value): value
+                for label_value, value in sorted(self._values.items())
+            }
+        return self.name, "counter", self.help_text, values
+
+
+class Histogram:
+    """A cumulative histogram of observed durations per label value.
+
+    Args:
+        name (str): metric name, should end with the unit, e.g. "_seconds"
+        help_text (str): description shown by Prometheus
+        label (str): name of the label distinguishing the series, may be empty
+        buckets (Tuple[float, ...]): ascending upper bounds of the buckets
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label: str = "",
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        """Generate a histogram."""
+        self.name, self.help_text, self.label = name, help_text, label
+        self.buckets = tuple(buckets)
+        # per label value: count per bucket (the last one is +Inf), sum
+        self._series: Dict[str, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float):
+        """Record one observation of label_value."""
+        with self._lock:
+            counts, total = self._series.setdefault(
+                label_value, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            # buckets are inclusive upper bounds
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def sample(self) -> Sample:
+        """Return the cumulative bucket counts, sum and count of every series."""
+        values: Dict[str, float] = {}
+        with self._lock:
+            for label_value, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = format_labels(self.label, label_value, le=le)
+                    values[f"_bucket{labels}"] = cumulative
+                labels = format_labels(self.label, label_value)
+                values[f"_sum{labels}"] = total[0]
+                values[f"_count{labels}"] = cumulative
+        return self.name, "histogram", self.help_text, values
+
+
+class Registry:
+    """A set of metrics and collectors rendered together on the /metrics route."""
+
+    def __init__(self):
+        """Generate an empty registry."""
+        self._metrics: Dict[str, Union[Counter, Histogram]] = {}
+        self._collectors: List[Callable[[], List[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, label: str = "") -> Counter:
+        """Return the counter called name, created on first use.
+
+        Raises:
+            TypeError: if name is registered as another kind of metric
+        """
+        with self._lock:
+            metric = self._metrics.setdefault(name, Counter(name, help_text, label))
+        if not isinstance(metric, Counter):
+            raise TypeError(f"{name} is registered as {type(metric).__name__}")
+        return metric
+
+    def histogram(self, name: str, help_text: str, label: str = "") -> Histogram:
+        """Return the histogram called name, created on first use.
+
+        Raises:
+            TypeError: if name is registered as another kind of metric
+        """
+        with self._lock:
+            metric = self._metrics.setdefault(name, Histogram(name, help_text, label))
+        if not isinstance(metric, Histogram):
+            raise TypeError(f"{name} is registered as {type(metric).__name__}")
+        return metric
+
+    def collect(self, collector: Callable[[], List[Sample]]):
+        """Register a function sampling externally kept values at render time."""
+        self._collectors.append(collector)
+
+    def samples(self) -> List[Sample]:
+        """Return the samples of all metrics and collectors."""
+        samples = [metric.sample() for metric in list(self._metrics.values())]
+        for collector in self._collectors:
+            samples.extend(collector())
+        return samples
+
+    def snapshot(self) -> List[Sample]:
+        """Return the samples of the counters and histograms, see merge_samples."""
+        return [sample for sample in self.samples() if sample[1] in ADDITIVE_TYPES]
+
+    def render(self, others: Iterable[List[Sample]] = ()) -> str:
+        """Return all metrics in the Prometheus text exposition format.
+
+        Args:
+            others (Iterable[List[Sample]]): snapshots of other processes whose
+                counters and histograms are added to the ones of this process
+
+        Returns:
+            str: exposition of all metrics
+        """
+        lines: List[str] = []
+        for sample in merge_samples(self.samples(), others):
+            lines.extend(render_sample(sample))
+        return "\n".join(lines) + "\n"
+
+
+# process-wide registry
+registry = Registry()
+spans = registry.histogram(
+    "fin_span_seconds", "Duration of the phases of a chart request.", "span"
+)
+upstream_errors = registry.counter(
+    "fin_upstream_errors_total", "Failed requests to the market data provider.", "error"
+)
+upstream_calls = registry.counter(
+    "fin_upstream_calls_total", "Calls to the market data provider.", "result"
+)
+coalesced_fetches = registry.counter(
+    "fin_coalesced_fetches_total", "Fetches served by another fetch's upstream call."
+)
+stale_reads = registry.counter(
+    "fin_stale_reads_total", "Reads served from stored bars after upstream failed."
+)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Record the duration of the enclosed block in the fin_span_seconds histogram.
+
+    Args:
+        name (str): phase of the request, e.g. "fetch" or "serialize"
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.observe(name, time.perf_counter() - start)
@@ -0,0 +1,20 @@
+"""Gunicorn settings of the production server, see wsgi.py."""
+from fin import config
+from fin.domain.logic.shared_cache import SQLiteCache
+
+bind = config.WEB_BIND
+workers = config.WEB_WORKERS
+# threads serve the polling requests while charts are generated in the background
+threads = config.WEB_THREADS
+timeout = config.WEB_TIMEOUT
+# every worker imports the app itself, so no SQLite connection or thread pool is
+# inherited through fork
+preload_app = False
+accesslog = "-"
+
+
+def on_starting(server):
+    """Drop the metrics of the previous server run, see fin.io.monitoring."""
+    if config.SHARED_CACHE_PATH:
+        # the connection is closed with the cache instance, before workers fork
+        SQLiteCache().clear_metrics()
@@ -0,0 +1,277 @@
+"""Coalescing, retries and stale reads of the fetch gateway with a local provider."""
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+import pytest
+
+from fin import metrics
+from fin.domain.logic.datastore import OHLCStore
+from fin.domain.logic.gateway import FetchGateway, TokenBucket, UpstreamError
+from fin.domain.logic.providers import (
+    OHLC_COLUMNS,
+    MarketDataProvider,
+    PartialFetchError,
+    YFinanceProvider,
+)
+from fin.domain.logic.shared_cache import SQLiteCache
+
+
+def bars(date_start: str, date_end: str) -> pd.DataFrame:
+    """Return business day bars in [date_start, date_end) closing at 1, 2, ..."""
+    index = pd.bdate_range(date_start, date_end, name="Date")
+    index = index[index < pd.Timestamp(date_end)]
+    close = [float(day + 1) for day in range(len(index))]
+    return pd.DataFrame({column: close for column in OHLC_COLUMNS}, index=index)
+
+
+class FakeProvider(MarketDataProvider):
+    """Provider recording its calls, failing the first failures calls.
+
+    Args:
+        batch_size (int): maximum number of symbols per call
+        failures (int): number of calls failing before the provider recovers
+        failing_symbols (Tuple[str, ...]): symbols failing within every batch
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        batch_size: int = 1,
+        failures: int = 0,
+        failing_symbols: Tuple[str, ...] = (),
+    ):
+        """Generate a provider answering immediately."""
+        self.batch_size = batch_size
+        self.failures = failures
+        self.failing_symbols = list(failing_symbols)
+        self.calls: List[List[str]] = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def fetch(
+        self, ticker_symbol: str, date_start: str, date_end: str, interval: str = "1d"
+    ) -> pd.DataFrame:
+        """Return the bars of one symbol."""
+        return self.fetch_many([ticker_symbol], date_start, date_end, interval)[
+            ticker_symbol
+        ]
+
+    def fetch_many(
+        self,
+        ticker_symbols: List[str],
+        date_start: str,
+        date_end: str,
+        interval: str = "1d",
+    ) -> Dict[str, pd.DataFrame]:
+        """Return the bars of several symbols once release is set."""
+        self.calls.append(list(ticker_symbols))
+        self.release.wait(5)
+        if len(self.calls) <= self.failures:
+            raise ConnectionError("upstream unavailable")
+        frames = {symbol: bars(date_start, date_end) for symbol in ticker_symbols}
+        failed = {
+            symbol: "No data found, symbol may be delisted"
+            for symbol in ticker_symbols
+            if symbol in self.failing_symbols and len(ticker_symbols) > 1
+        }
+        if failed:
+            raise PartialFetchError(
+                failed,
+                {
+                    symbol: frame
+                    for symbol, frame in frames.items()
+                    if symbol not in failed
+                },
+            )
+        return frames
+
+
+def gateway(provider: FakeProvider, retries: int = 2) -> FetchGateway:
+    """Return a gateway without rate limit and waits between retries."""
+    return FetchGateway(
+        provider, rate=0, retries=retries, backoff=0.0, window=0.05, fresh=0.0
+    )
+
+
+def test_contained_fetch_is_coalesced():
+    """A fetch within a running call's date range waits for that call."""
+    provider = FakeProvider()
+    provider.release.clear()
+    fetch = gateway(provider)
+    results = {}
+    wide = threading.Thread(
+        target=lambda: results.update(wide=fetch("AAPL", "2021-01-04", "2021-02-01"))
+    )
+    wide.start()
+    while not provider.calls:
+        time.sleep(0.001)
+    narrow = threading.Thread(
+        target=lambda: results.update(narrow=fetch("AAPL", "2021-01-11", "2021-01-18"))
+    )
+    narrow.start()
+    time.sleep(0.05)
+    provider.release.set()
+    wide.join(5)
+    narrow.join(5)
+    assert provider.calls == [["AAPL"]]
+    assert fetch.coalesced == 1
+    assert len(results["wide"]) == 20
+    assert list(results["narrow"].index) == list(
+        pd.bdate_range("2021-01-11", "2021-01-15")
+    )
+
+
+def test_fetches_of_one_range_are_batched():
+    """Symbols requested for the same dates within the window share one call."""
+    provider = FakeProvider(batch_size=3)
+    fetch = gateway(provider)
+    threads = [
+        threading.Thread(target=fetch, args=(symbol, "2021-01-04", "2021-01-11"))
+        for symbol in ("AAPL", "MSFT", "NVDA")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert [sorted(call) for call in provider.calls] == [["AAPL", "MSFT", "NVDA"]]
+
+
+def test_failed_calls_are_retried():
+    """Failed upstream calls are retried until one succeeds."""
+    provider = FakeProvider(failures=2)
+    fetch = gateway(provider)
+    stocks_df = fetch("AAPL", "2021-01-04", "2021-01-11")
+    assert len(stocks_df) == 5
+    assert len(provider.calls) == fetch.calls == 3
+
+
+def test_calls_failing_on_every_attempt_raise():
+    """UpstreamError is raised after the last retry."""
+    provider = FakeProvider(failures=10)
+    fetch = gateway(provider, retries=2)
+    with pytest.raises(UpstreamError, match="upstream unavailable"):
+        fetch("AAPL", "2021-01-04", "2021-01-11")
+    assert len(provider.calls) == 3
+
+
+def test_failed_symbols_of_a_batch_are_retried_alone():
+    """Symbols failing within a batch are retried one by one, the others are kept."""
+    provider = FakeProvider(batch_size=2, failing_symbols=("MSFT",))
+    fetch = gateway(provider)
+    results = {}
+    threads = [
+        threading.Thread(
+            target=lambda symbol=symbol: results.update(
+                {symbol: fetch(symbol, "2021-01-04", "2021-01-11")}
+            )
+        )
+        for symbol in ("AAPL", "MSFT")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert [sorted(call) for call in provider.calls] == [["AAPL", "MSFT"], ["MSFT"]]
+    assert len(results["AAPL"]) == len(results["MSFT"]) == 5
+
+
+def fake_download() -> Callable[..., pd.DataFrame]:
+    """Return a stand-in of yf.download 0.1.55 filling yfinance's global registries.
+
+    Once the first download stored its first symbol, the second resets the
+    registries before the first goes on, unless downloads are serialized. Symbols
+    starting with "GONE" are left out of the download without an error.
+    """
+    from yfinance import shared
+
+    calls: List[str] = []
+    stored, reset = threading.Event(), threading.Event()
+
+    def download(tickers, start, end, **kwargs) -> pd.DataFrame:
+        calls.append(start)
+        first = len(calls) == 1
+        if not first:
+            stored.wait(0.2)
+        shared._DFS, shared._ERRORS = {}, {}
+        if not first:
+            reset.set()
+        for ticker in tickers:
+            if not ticker.startswith("GONE"):
+                shared._DFS[ticker] = bars(start, end)
+            if first:
+                stored.set()
+                reset.wait(0.2)
+        return pd.concat(shared._DFS, axis=1)
+
+    return download
+
+
+def test_concurrent_batches_keep_their_symbols(monkeypatch):
+    """Batches of different date ranges downloading at once get their own bars."""
+    import yfinance
+
+    monkeypatch.setattr(yfinance, "download", fake_download())
+    fetch = FetchGateway(
+        YFinanceProvider(), rate=0, retries=0, backoff=0.0, window=0.05, fresh=0.0
+    )
+    requests = {
+        "AAPL": ("2021-01-04", "2021-01-11"),
+        "MSFT": ("2021-01-04", "2021-01-11"),
+        "NVDA": ("2021-02-01", "2021-02-15"),
+        "GONE": ("2021-02-01", "2021-02-15"),
+    }
+    results = {}
+
+    def request(symbol: str):
+        try:
+            results[symbol] = fetch(symbol, *requests[symbol])
+        except UpstreamError as error:
+            results[symbol] = error
+
+    threads = [threading.Thread(target=request, args=(symbol,)) for symbol in requests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    for symbol in ("AAPL", "MSFT", "NVDA"):
+        assert isinstance(results[symbol], pd.DataFrame), results[symbol]
+    assert len(results["AAPL"]) == len(results["MSFT"]) == 5
+    assert len(results["NVDA"]) == 10
+    # a symbol missing from the download is a failure, not a range without bars
+    assert isinstance(results["GONE"], UpstreamError)
+    assert "missing from the download" in str(results["GONE"])
+
+
+def test_stale_bars_are_served_if_upstream_fails(tmp_path):
+    """Stored bars are served while upstream fails, the gap is not marked covered."""
+    provider = FakeProvider()
+    store = OHLCStore(fetch=gateway(provider, retries=0), folder=tmp_path)
+    assert len(store.read("AAPL", "2021-01-04", "2021-01-11")) == 5
+
+    provider.failures = len(provider.calls) + 10
+    stale_reads = metrics.stale_reads._values.get("", 0)
+    stocks_df = store.read("AAPL", "2021-01-04", "2021-01-18")
+    assert len(stocks_df) == 5
+    assert metrics.stale_reads._values[""] == stale_reads + 1
+    _, coverage = store.load("AAPL")
+    assert coverage == [(pd.Timestamp("2021-01-04"), pd.Timestamp("2021-01-11"))]
+    # without any stored bar in the range the failure is raised
+    with pytest.raises(UpstreamError):
+        store.read("AAPL", "2021-02-01", "2021-02-08")
+
+    provider.failures = 0
+    assert len(store.read("AAPL", "2021-01-04", "2021-01-18")) == 10
+
+
+def test_shared_bucket_limits_all_processes(tmp_path):
+    """Buckets sharing a cache file take their tokens from one bucket."""
+    shared = SQLiteCache(tmp_path / "shared.sqlite")
+    first = TokenBucket(rate=20, burst=1, shared=shared, name="fetch:fake")
+    second = TokenBucket(rate=20, burst=1, shared=shared, name="fetch:fake")
+    other = TokenBucket(rate=20, burst=1, shared=shared, name="fetch:other")
+    assert first.acquire() == 0
+    assert second.acquire() == pytest.approx(0.05, abs=0.02)
+    assert other.acquire() == 0
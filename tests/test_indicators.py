@@ -0,0 +1,139 @@
+"""Equivalence of the NumPy indicator engine and the cufflinks studies."""
+
+import cufflinks as cf
+import numpy as np
+import pandas as pd
+import pytest
+
+from fin.domain.logic import indicators
+
+
+def _frame(close: np.ndarray) -> pd.DataFrame:
+    """Wrap close prices in a DataFrame of daily bars like cufflinks expects."""
+    index = pd.date_range("2000-01-03", periods=len(close), freq="B")
+    return pd.DataFrame({"Close": close}, index=index)
+
+
+def _random_walk(length: int = 600, seed: int = 0) -> np.ndarray:
+    """Return positive close prices of a seeded geometric random walk."""
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0.0, 0.02, length)))
+
+
+def _assert_close(actual: np.ndarray, expected: np.ndarray):
+    np.testing.assert_allclose(
+        actual, np.asarray(expected, dtype=float), rtol=1e-7, atol=1e-8
+    )
+
+
+@pytest.fixture(scope="module")
+def close() -> np.ndarray:
+    """Close prices shared by the equivalence tests."""
+    return _random_walk()
+
+
+@pytest.mark.parametrize("periods", [2, 5, 20, 50, 200])
+@pytest.mark.parametrize("boll_std", [1, 2, 2.5])
+def test_bollinger_bands(close, periods, boll_std):
+    """Middle, upper and lower band match cf.ta.boll."""
+    expected = cf.ta.boll(
+        _frame(close), periods=periods, boll_std=boll_std, column="Close", include=False
+    )
+    actual = indicators.bollinger_bands(close, periods, boll_std)
+    for key, line in zip(("sma", "upper", "lower"), expected.to_numpy().T):
+        _assert_close(actual[key], line)
+
+
+@pytest.mark.parametrize(
+    "fast_period,slow_period,signal_period",
+    [(12, 26, 9), (5, 35, 5), (3, 10, 16), (8, 8, 1), (1, 2, 2)],
+)
+def test_macd(close, fast_period, slow_period, signal_period):
+    """MACD and signal line match cf.ta.macd."""
+    expected = cf.ta.macd(
+        _frame(close),
+        fast_period,
+        slow_period,
+        signal_period,
+        column="Close",
+        include=False,
+    )
+    actual = indicators.macd(close, fast_period, slow_period, signal_period)
+    for key, line in zip(("macd", "signal"), expected.to_numpy().T):
+        _assert_close(actual[key], line)
+
+
+def test_macd_rejects_slow_period_below_fast_period(close):
+    """The slow EMA cannot be faster than the fast EMA."""
+    with pytest.raises(ValueError):
+        indicators.macd(close, fast_period=26, slow_period=12)
+
+
+@pytest.mark.parametrize("periods", [2, 5, 14, 20, 50])
+def test_rsi(close, periods):
+    """RSI matches cf.ta.rsi."""
+    expected = cf.ta.rsi(_frame(close), periods=periods, column="Close", include=False)
+    _assert_close(indicators.rsi(close, periods), expected.to_numpy().ravel())
+
+
+@pytest.mark.parametrize("periods", [1, 2, 20, 100])
+def test_sma(close, periods):
+    """SMA matches cf.ta.sma."""
+    expected = cf.ta.sma(_frame(close), periods=periods, column="Close", include=False)
+    _assert_close(indicators.rolling_mean(close, periods), expected.to_numpy().ravel())
+
+
+@pytest.mark.parametrize("length", [0, 1, 4, 5])
+def test_series_shorter_than_window(length):
+    """Windows longer than the series give NaN of the series' length."""
+    close = _random_walk(length)
+    studies = [
+        indicators.rolling_mean(close, 6),
+        indicators.rolling_std(close, 6),
+        indicators.bollinger_bands(close, 6)["upper"],
+        indicators.rsi(close, 6),
+    ]
+    for values in studies:
+        assert len(values) == length
+        assert np.isnan(values).all()
+    if length:
+        _assert_close(
+            indicators.bollinger_bands(close, 6)["sma"],
+            cf.ta.boll(_frame(close), periods=6, column="Close", include=False).iloc[
+                :, 0
+            ],
+        )
+
+
+def test_rsi_of_constant_series_is_nan():
+    """Without any change, gains and losses are 0 and the RSI is undefined."""
+    close = np.full(30, 42.0)
+    assert np.isnan(indicators.rsi(close, 5)).all()
+    assert np.isnan(
+        cf.ta.rsi(_frame(close), periods=5, column="Close", include=False)
+    ).all(None)
+
+
+def test_rsi_of_rising_series_is_100():
+    """Without any loss, the RSI of complete windows is 100."""
+    close = np.arange(1.0, 31.0)
+    values = indicators.rsi(close, 5)
+    assert np.isnan(values[:4]).all()
+    np.testing.assert_array_equal(values[4:], 100.0)
+
+
+def test_compute_indicators_omits_deselected_studies(close):
+    """Deselected checklists are empty lists and skip their study."""
+    settings = {
+        "bollinger_check_state": [],
+        "macd_check_state": ["macd_check"],
+        "rsi_check_state": [],
+        "sma_check_state": ["sma_check"],
+        "macd_fast_period_state": 12,
+        "macd_slow_period_state": 26,
+        "macd_signal_period_state": 9,
+        "sma_periods_state": "20",
+    }
+    studies = indicators.compute_indicators(close, settings)
+    assert set(studies) == {"macd", "sma"}
+    _assert_close(studies["sma"]["sma"], indicators.rolling_mean(close, 20))
@@ -0,0 +1,60 @@
+"""Metrics of several server processes summed through the shared cache."""
+from fin.domain.logic.shared_cache import SQLiteCache
+from fin.io.monitoring import SharedMetrics
+from fin.metrics import Registry
+
+
+def worker(shared: SQLiteCache) -> SharedMetrics:
+    """Return the shared metrics of a simulated server process."""
+    registry = Registry()
+    registry.counter("fin_calls_total", "Calls.", "result")
+    registry.histogram("fin_latency_seconds", "Latency.", "span")
+    registry.collect(lambda: [("fin_entries", "gauge", "Entries.", {"": 3})])
+    return SharedMetrics(shared, registry, interval=3600)
+
+
+def sample_values(exposition: str) -> dict:
+    """Parse the sample lines of an exposition into {name and labels: value}."""
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in exposition.splitlines()
+        if not line.startswith("#")
+    }
+
+
+def test_counters_and_histograms_are_summed(tmp_path):
+    """Every process reports the totals of all processes, gauges stay local."""
+    shared = SQLiteCache(tmp_path / "shared.sqlite")
+    first, second = worker(shared), worker(shared)
+    for metrics, results in ((first, ["ok", "ok", "error"]), (second, ["ok"])):
+        calls = metrics.registry.counter("fin_calls_total", "Calls.", "result")
+        for result in results:
+            calls.inc(result)
+    first.registry.histogram("fin_latency_seconds", "", "span").observe("fetch", 0.2)
+    second.registry.histogram("fin_latency_seconds", "", "span").observe("fetch", 3)
+    second.registry.histogram("fin_latency_seconds", "", "span").observe("plot", 0.01)
+    second.publish()
+
+    values = sample_values(first.render())
+    assert values['fin_calls_total{result="ok"}'] == 3
+    assert values['fin_calls_total{result="error"}'] == 1
+    assert values['fin_latency_seconds_bucket{span="fetch",le="0.25"}'] == 1
+    assert values['fin_latency_seconds_bucket{span="fetch",le="+Inf"}'] == 2
+    assert values['fin_latency_seconds_sum{span="fetch"}'] == 3.2
+    # series observed by another process only are reported, too
+    assert values['fin_latency_seconds_count{span="plot"}'] == 1
+    assert values["fin_entries"] == 3
+    assert sample_values(second.render()) == values
+
+
+def test_counts_of_exited_processes_are_kept(tmp_path):
+    """A replaced worker's counts stay in the totals until the server restarts."""
+    shared = SQLiteCache(tmp_path / "shared.sqlite")
+    exited = worker(shared)
+    exited.registry.counter("fin_calls_total", "Calls.", "result").inc("ok", 5)
+    exited.publish()
+    replacement = worker(shared)
+    assert sample_values(replacement.render())['fin_calls_total{result="ok"}'] == 5
+
+    shared.clear_metrics()
+    assert 'fin_calls_total{result="ok"}' not in sample_values(replacement.render())
@@ -0,0 +1,177 @@
+"""Portfolio weights, the risk measures against pandas and loading of the closes."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from fin.domain.logic import portfolio
+from fin.domain.logic.portfolio import (
+    VAR_LEVELS,
+    beta,
+    drawdown,
+    get_portfolio_risk,
+    parse_weights,
+    portfolio_returns,
+    rolling_beta,
+    rolling_volatility,
+    value_at_risk,
+)
+
+
+def _returns(length: int = 300, seed: int = 0) -> pd.DataFrame:
+    """Return seeded daily returns of four stocks, listed 40 days apart."""
+    rng = np.random.default_rng(seed)
+    returns = pd.DataFrame(rng.normal(0.0005, 0.02, (length, 4)))
+    for column in returns:
+        returns.iloc[: 40 * column, column] = np.nan
+    return returns
+
+
+def _index_returns(returns: pd.DataFrame, seed: int = 0) -> pd.Series:
+    """Return index returns correlated with the first stock, missing on some days."""
+    rng = np.random.default_rng(seed + 100)
+    index_returns = 0.5 * returns[0] + rng.normal(0.0, 0.01, len(returns))
+    index_returns.iloc[[3, 50, 51, 200]] = np.nan
+    return index_returns
+
+
+def _assert_close(actual: np.ndarray, expected):
+    np.testing.assert_allclose(
+        actual, np.asarray(expected, dtype=float), rtol=1e-7, atol=1e-10
+    )
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("AAPL, msft", {"AAPL": 0.5, "MSFT": 0.5}),
+        ("AAPL 60, MSFT 40", {"AAPL": 0.6, "MSFT": 0.4}),
+        ("AAPL 0.75 MSFT 0.25", {"AAPL": 0.75, "MSFT": 0.25}),
+        ("AAPL 3, MSFT 1, NVDA", {"AAPL": 3 / 6, "MSFT": 1 / 6, "NVDA": 2 / 6}),
+        ("AAPL 1, MSFT", {"AAPL": 0.5, "MSFT": 0.5}),
+        ("AAPL 45, MSFT:15, NVDA", {"AAPL": 3 / 6, "MSFT": 1 / 6, "NVDA": 2 / 6}),
+    ],
+)
+def test_weights_are_normalized(text, expected):
+    """Unweighted symbols get the mean of the given weights."""
+    assert parse_weights(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", ["", None, "AAPL 0, MSFT 0", "AAPL 0, MSFT"])
+def test_invalid_weights_are_rejected(text):
+    """Input without symbols or a positive total weight is rejected."""
+    with pytest.raises(ValueError):
+        parse_weights(text)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize(
+    "weights", [[0.25, 0.25, 0.25, 0.25], [0.1, 0.2, 0.3, 0.4], [0.0, 0.0, 0.5, 0.5]]
+)
+def test_portfolio_returns(seed, weights):
+    """Weights of unlisted stocks are spread over the listed ones."""
+    returns = _returns(seed=seed)
+    weights = pd.Series(weights)
+    listed_weight = returns.notna().mul(weights).sum(axis=1)
+    expected = returns.mul(weights).sum(axis=1) / listed_weight.where(listed_weight > 0)
+    _assert_close(portfolio_returns(returns.to_numpy(), weights.to_numpy()), expected)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("window", [2, 5, 20, 63])
+def test_rolling_volatility(seed, window):
+    """Rolling volatility matches the annualized pandas rolling std."""
+    returns = _returns(seed=seed)
+    expected = returns.rolling(window).std() * np.sqrt(252)
+    _assert_close(rolling_volatility(returns.to_numpy(), window, 252), expected)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("window", [2, 5, 20, 63])
+def test_rolling_beta(seed, window):
+    """Rolling beta matches the pandas rolling covariance over the index variance."""
+    returns = _returns(seed=seed)[0]
+    index_returns = _index_returns(_returns(seed=seed), seed)
+    expected = (
+        returns.rolling(window).cov(index_returns)
+        / index_returns.where(returns.notna()).rolling(window).var()
+    )
+    actual = rolling_beta(returns.to_numpy(), index_returns.to_numpy(), window)
+    _assert_close(actual, expected)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_drawdown(seed):
+    """Drawdown is the loss from the running maximum of the compounded returns."""
+    returns = _returns(seed=seed)
+    wealth = (1 + returns.fillna(0.0)).cumprod()
+    _assert_close(drawdown(returns.to_numpy()), 1 - wealth / wealth.cummax())
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("level", list(VAR_LEVELS))
+def test_value_at_risk(seed, level):
+    """Historical VaR matches the pandas quantile, parametric VaR the normal one."""
+    returns = _returns(seed=seed)
+    historical, parametric = value_at_risk(returns.to_numpy(), level)
+    _assert_close(historical, -returns.quantile(1 - level))
+    _assert_close(parametric, VAR_LEVELS[level] * returns.std() - returns.mean())
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_beta(seed):
+    """Beta matches the pandas covariance over the index variance of paired days."""
+    returns = _returns(seed=seed)
+    index_returns = _index_returns(returns, seed)
+    expected = []
+    for column in returns:
+        paired = returns[column].notna() & index_returns.notna()
+        expected.append(
+            returns[column][paired].cov(index_returns[paired])
+            / index_returns[paired].var()
+        )
+    _assert_close(beta(returns.to_numpy(), index_returns.to_numpy()), expected)
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    """Load rising closes of all symbols except those starting with "BAD"."""
+
+    def get_multi_stocks_data(ticker_symbols, date_start, date_end):
+        index = pd.bdate_range(date_start, periods=30, name="Date")
+        closes = pd.DataFrame(
+            {
+                symbol: np.linspace(100.0, 130.0, len(index))
+                for symbol in ticker_symbols
+                if not symbol.startswith("BAD")
+            },
+            index=index,
+        )
+        failed = {
+            symbol: ConnectionError("upstream unavailable")
+            for symbol in ticker_symbols
+            if symbol.startswith("BAD")
+        }
+        return closes, failed
+
+    monkeypatch.setattr(portfolio, "get_multi_stocks_data", get_multi_stocks_data)
+
+
+def test_failed_symbols_are_reported(loader):
+    """Failing symbols are returned with their error, the others are analyzed."""
+    risk, failed = get_portfolio_risk(
+        {"AAPL": 0.5, "BAD": 0.5}, "2021-01-04", "2021-03-01", "^GSPC"
+    )
+    assert list(failed) == ["BAD"]
+    assert not np.isnan(risk.assets.loc["AAPL", "annual_return"])
+    assert np.isnan(risk.assets.loc["BAD", "annual_return"])
+    assert risk.summary["beta"] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    "weights, index_symbol",
+    [({"BAD": 0.5, "BADDER": 0.5}, "^GSPC"), ({"AAPL": 1.0}, "BAD")],
+)
+def test_failed_portfolio_or_index_raise(loader, weights, index_symbol):
+    """The analysis fails if no symbol of the portfolio or the index loads."""
+    with pytest.raises(ValueError, match="cannot load"):
+        get_portfolio_risk(weights, "2021-01-04", "2021-03-01", index_symbol)
@@ -0,0 +1,179 @@
+"""Refresh of the symbol directory against a local FTP stand-in."""
+from ftplib import error_perm
+from typing import Dict, List, Tuple
+
+import pytest
+
+from fin.domain.logic.symbol_directory import refresh_symbol_directory
+from fin.domain.logic.symbols import SymbolTable
+
+NASDAQ_HEADER = (
+    "Symbol|Security Name|Market Category|Test Issue|Financial Status|"
+    "Round Lot Size|ETF|NextShares"
+)
+OTHER_HEADER = (
+    "ACT Symbol|Security Name|Exchange|CQS Symbol|ETF|Round Lot Size|Test Issue|"
+    "NASDAQ Symbol"
+)
+FOOTER = "File Creation Time: 0208202115:43|||||||"
+
+
+def nasdaq_listed(*symbols: str, footer: bool = True) -> List[str]:
+    """Return the lines of a nasdaqlisted.txt listing symbols."""
+    lines = [NASDAQ_HEADER]
+    lines += [
+        f"{symbol}|{symbol} Inc. Common Stock|Q|N|N|100|N|N" for symbol in symbols
+    ]
+    return lines + [FOOTER] if footer else lines
+
+
+def other_listed(*symbols: str, footer: bool = True) -> List[str]:
+    """Return the lines of an otherlisted.txt listing symbols."""
+    lines = [OTHER_HEADER]
+    lines += [
+        f"{symbol}|{symbol} Corp. Common Stock|N|{symbol}|N|100|N|{symbol}"
+        for symbol in symbols
+    ]
+    return lines + [FOOTER] if footer else lines
+
+
+class FakeFTP:
+    """Stand-in of an FTP session serving files from memory.
+
+    Args:
+        files (Dict[str, Tuple[List[str], str]]): lines and MDTM timestamp per file
+    """
+
+    def __init__(self, files: Dict[str, Tuple[List[str], str]]):
+        """Generate a session."""
+        self.files = files
+        self.retrieved: List[str] = []
+        self.closed = False
+
+    def voidcmd(self, command: str) -> str:
+        """Accept TYPE commands."""
+        return "200 OK"
+
+    def size(self, remote_name: str) -> int:
+        """Return the size of a file in bytes."""
+        lines, _ = self._file(remote_name)
+        return sum(len(line) + 2 for line in lines)
+
+    def sendcmd(self, command: str) -> str:
+        """Answer MDTM commands."""
+        verb, remote_name = command.split(" ", 1)
+        if verb != "MDTM":
+            raise error_perm(f"502 {verb} not implemented")
+        return f"213 {self._file(remote_name)[1]}"
+
+    def retrlines(self, command: str, callback):
+        """Pass the lines of a file to callback."""
+        remote_name = command.split(" ", 1)[1]
+        self.retrieved.append(remote_name)
+        for line in self._file(remote_name)[0]:
+            callback(line)
+        return "226 Transfer complete"
+
+    def quit(self):
+        """End the session."""
+        self.closed = True
+
+    def close(self):
+        """End the session."""
+        self.closed = True
+
+    def _file(self, remote_name: str) -> Tuple[List[str], str]:
+        if remote_name not in self.files:
+            raise error_perm(f"550 {remote_name}: no such file")
+        return self.files[remote_name]
+
+
+@pytest.fixture
+def server():
+    """Remote files of the stand-in, changed by the tests between refreshes."""
+    return {
+        "nasdaqlisted.txt": (nasdaq_listed("AAPL", "MSFT"), "20210208154300"),
+        "otherlisted.txt": (other_listed("IBM", "KO"), "20210208154300"),
+    }
+
+
+@pytest.fixture
+def refresh(server, tmp_path):
+    """Refresh the symbol directory in tmp_path, returning the diff and session."""
+    data_api, folder = tmp_path / "api", tmp_path / "api" / "symbols"
+    data_api.mkdir()
+
+    def refresh_directory(listeners=()):
+        ftp = FakeFTP(server)
+        diff = refresh_symbol_directory(lambda: ftp, data_api, folder, listeners)
+        return diff, ftp
+
+    refresh_directory.data_api = data_api
+    refresh_directory.folder = folder
+    return refresh_directory
+
+
+def test_first_refresh_downloads_all_files(refresh):
+    """Without local files every file is downloaded and every symbol is new."""
+    diff, ftp = refresh()
+    assert sorted(diff.downloaded) == ["nasdaqlisted.txt", "otherlisted.txt"]
+    assert diff.added == ["AAPL", "IBM", "KO", "MSFT"]
+    assert diff.removed == [] and diff.failed == {}
+    assert ftp.closed
+    table = SymbolTable.load(refresh.folder)
+    assert sorted(table.symbols().tolist()) == diff.added
+    assert table.name(table.lookup("KO")) == "KO Corp. Common Stock"
+
+
+def test_unchanged_files_are_skipped(refresh):
+    """Files whose size and modification time did not change are not retrieved."""
+    refresh()
+    listener_calls = []
+    diff, ftp = refresh([listener_calls.append])
+    assert ftp.retrieved == []
+    assert not diff.changed
+    assert (diff.added, diff.removed, diff.failed) == ([], [], {})
+    assert listener_calls == []
+
+
+def test_changed_file_yields_diff(refresh, server):
+    """Only the changed file is retrieved and its symbol changes are reported."""
+    refresh()
+    server["nasdaqlisted.txt"] = (nasdaq_listed("AAPL", "NVDA"), "20210209154300")
+    listener_calls = []
+    diff, ftp = refresh([listener_calls.append])
+    assert ftp.retrieved == ["nasdaqlisted.txt"]
+    assert (diff.added, diff.removed) == (["NVDA"], ["MSFT"])
+    assert listener_calls == [diff]
+    table = SymbolTable.load(refresh.folder)
+    assert "NVDA" in table and "MSFT" not in table and "KO" in table
+
+
+def test_incomplete_file_keeps_previous_directory(refresh, server):
+    """A file without footer is reported and the previous download is kept."""
+    refresh()
+    local_file = refresh.data_api / "otherlisted.csv"
+    previous = local_file.read_text()
+    server["otherlisted.txt"] = (other_listed("IBM", footer=False), "20210209154300")
+    diff, _ = refresh()
+    assert "otherlisted.txt" in diff.failed
+    assert "footer" in diff.failed["otherlisted.txt"]
+    assert not diff.changed and diff.removed == []
+    assert local_file.read_text() == previous
+    assert not list(refresh.data_api.glob("*.tmp"))
+    # the failed file is retrieved again on the next refresh
+    server["otherlisted.txt"] = (other_listed("IBM"), "20210209154300")
+    diff, ftp = refresh()
+    assert ftp.retrieved == ["otherlisted.txt"]
+    assert diff.removed == ["KO"]
+
+
+def test_connection_failure_is_reported(refresh):
+    """Files are reported as failed if no session can be opened."""
+
+    def unreachable():
+        raise OSError("connection refused")
+
+    diff = refresh_symbol_directory(unreachable, refresh.data_api, refresh.folder)
+    assert sorted(diff.failed) == ["nasdaqlisted.txt", "otherlisted.txt"]
+    assert not diff.changed
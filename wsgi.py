@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""Production entry point for WSGI servers.
+
+Run the app with `gunicorn -c gunicorn.conf.py wsgi:server` and visit
+http://127.0.0.1:8050/. Worker processes share cached figures and job states through
+the SQLite file configured by SHARED_CACHE_PATH and the OHLC partitions in
+OHLC_FOLDER. Their metrics are summed through the same file, so /metrics reports
+the totals of all workers.
+"""
+
+from fin.io.run_app import app
+
+server = app.server